@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+"""Compares the ways of loading a metadata template file into a DataFrame
+
+`load_template_to_dataframe` used to rewrite the whole file to a temporary
+file to strip the whitespace of the values and then parse it again, using
+python converters for some columns. That path is reproduced here as 'legacy'
+and compared with the current single-pass loader, reading at once and in
+chunks. The synthetic templates have whitespace around some of the values, so
+all the paths have something to strip, and are kept in memory so the timings
+are not dominated by the disk.
+
+Usage: python benchmarks/bench_load_template.py --rows 1000 --rows 10000
+"""
+
+from __future__ import division
+from os import close, remove
+from tempfile import mkstemp
+from time import time
+
+import click
+import pandas as pd
+from six import StringIO
+
+from qiita_db.metadata_template import load_template_to_dataframe
+
+
+def _synthetic_template(rows, columns):
+    """Generates a template with str, float and boolean columns"""
+    headers = ['sample_name', 'description', 'latitude', 'longitude',
+               'has_physical_specimen']
+    headers.extend('col_%d' % j for j in range(columns))
+    lines = ['\t'.join(headers)]
+    for i in range(rows):
+        values = ['Sample.%d ' % i, ' Sample %d' % i, str(i % 90 + 0.5),
+                  str(i % 180 + 0.25), 'True']
+        values.extend('value %d' % j if j % 2 else str(i * 0.5 + j)
+                      for j in range(columns))
+        lines.append('\t'.join(values))
+    return '\n'.join(lines) + '\n'
+
+
+def _legacy_load(contents):
+    fd, fp = mkstemp()
+    close(fd)
+    try:
+        with open(fp, 'w') as new_f:
+            for line in StringIO(contents):
+                line_elements = [x.strip()
+                                 for x in line.rstrip('\n').split('\t')]
+                new_f.write('\t'.join(line_elements) + '\n')
+        return pd.read_csv(fp, sep='\t', keep_default_na=False,
+                           na_values=[''], index_col=False, comment='\t',
+                           converters={'sample_name': lambda x: str(x).strip(),
+                                       'description': str})
+    finally:
+        remove(fp)
+
+
+@click.command()
+@click.option('--rows', default=[1000, 10000, 100000], type=int,
+              multiple=True, show_default=True,
+              help='Number of samples (rows) of the templates')
+@click.option('--columns', default=50, type=int, show_default=True,
+              help='Number of extra metadata columns of the templates')
+@click.option('--chunksize', default=10000, type=int, show_default=True,
+              help='Number of rows per chunk of the chunked path')
+@click.option('--repeats', default=3, type=int, show_default=True,
+              help='Number of times each path is timed')
+def bench(rows, columns, chunksize, repeats):
+    paths = (
+        ('legacy (temp file)', _legacy_load),
+        ('single pass', lambda c: load_template_to_dataframe(StringIO(c))),
+        ('single pass, chunked',
+         lambda c: load_template_to_dataframe(StringIO(c),
+                                              chunksize=chunksize)))
+    for n in rows:
+        contents = _synthetic_template(n, columns)
+        for name, path in paths:
+            timings = []
+            for _ in range(repeats):
+                start = time()
+                loaded = path(contents)
+                timings.append(time() - start)
+            assert len(loaded) == n
+            click.echo("%-22s best %.3fs  mean %.3fs  (%d samples x %d "
+                       "columns)" % (name, min(timings),
+                                     sum(timings) / repeats, n,
+                                     columns + 5))
+
+
+if __name__ == '__main__':
+    bench()
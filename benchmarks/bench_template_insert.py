@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+"""Compares the two ways of loading the rows of a metadata template
+
+The rows of a template used to be inserted with `add_to_queue(..., many=True)`,
+which runs one INSERT per row, and are now loaded with `copy_rows`, which
+streams all of them in a single COPY. Both paths load the same synthetic
+template in a scratch table of the database pointed by the qiita
+configuration, inside a queue, as the metadata templates do.
+
+Usage: python benchmarks/bench_template_insert.py --samples 10000 --columns 200
+"""
+
+from __future__ import division
+from time import time
+
+import click
+
+from qiita_db.sql_connection import SQLConnectionHandler
+
+
+_TABLE = 'qiita.bench_template_insert'
+
+
+def _synthetic_rows(samples, columns):
+    """Generates the rows of a template with varchar and float8 columns"""
+    for i in range(samples):
+        row = ['Sample.%d' % i]
+        for j in range(columns):
+            row.append('value %d.%d' % (i, j) if j % 2 else i * 0.5 + j)
+        yield tuple(row)
+
+
+def _insert_path(conn_handler, headers, rows):
+    queue_name = conn_handler.get_temp_queue()
+    conn_handler.add_to_queue(
+        queue_name,
+        "INSERT INTO {0} (sample_id, {1}) VALUES (%s, {2})".format(
+            _TABLE, ', '.join(headers), ', '.join(['%s'] * len(headers))),
+        list(rows), many=True)
+    conn_handler.execute_queue(queue_name)
+
+
+def _copy_path(conn_handler, headers, rows):
+    queue_name = conn_handler.get_temp_queue()
+    conn_handler.copy_rows(_TABLE, ['sample_id'] + headers, rows,
+                           queue=queue_name)
+    conn_handler.execute_queue(queue_name)
+
+
+@click.command()
+@click.option('--samples', default=1000, type=int, show_default=True,
+              help='Number of samples (rows) of the template')
+@click.option('--columns', default=50, type=int, show_default=True,
+              help='Number of metadata columns of the template')
+@click.option('--repeats', default=3, type=int, show_default=True,
+              help='Number of times each path is timed')
+def bench(samples, columns, repeats):
+    conn_handler = SQLConnectionHandler()
+    headers = ['col_%d' % j for j in range(columns)]
+    column_datatype = ['%s %s' % (h, 'varchar' if j % 2 else 'float8')
+                       for j, h in enumerate(headers)]
+    conn_handler.execute(
+        "CREATE TABLE {0} (sample_id varchar NOT NULL, {1})".format(
+            _TABLE, ', '.join(column_datatype)))
+
+    try:
+        for name, path in (('INSERT (many=True)', _insert_path),
+                           ('COPY (copy_rows)', _copy_path)):
+            timings = []
+            for _ in range(repeats):
+                conn_handler.execute("TRUNCATE {0}".format(_TABLE))
+                start = time()
+                path(conn_handler, headers, _synthetic_rows(samples, columns))
+                timings.append(time() - start)
+            loaded = conn_handler.execute_fetchone(
+                "SELECT COUNT(*) FROM {0}".format(_TABLE))[0]
+            assert loaded == samples
+            click.echo("%-20s best %.3fs  mean %.3fs  (%d samples x %d "
+                       "columns)" % (name, min(timings),
+                                     sum(timings) / repeats, samples,
+                                     columns))
+    finally:
+        conn_handler.execute("DROP TABLE {0}".format(_TABLE))
+
+
+if __name__ == '__main__':
+    bench()
@@ -53,6 +53,20 @@ class ConfigurationManager(object):
         The host where the database lives
     port : int
         The port used to connect to the postgres database in the previous host
+    pool_size : int
+        The maximum number of connections kept by each postgres connection
+        pool. If 0, connections are not pooled
+    pool_max_idle : int
+        Number of seconds a pooled connection can stay idle before it is
+        closed
+    pool_timeout : int
+        Number of seconds to wait for a pooled connection to become available
+    slow_query_threshold : float
+        Number of seconds after which an SQL statement is logged as slow. If
+        0, slow statements are not logged
+    slow_query_log : str
+        Path to the file where the slow statements are logged. If empty, they
+        are sent to the handlers of the qiita_db.slow_queries logger
     ipyc_demo : str
         The IPython demo cluster profile
     ipyc_demo_n : int
@@ -181,6 +195,29 @@ class ConfigurationManager(object):
         self.host = config.get('postgres', 'HOST')
         self.port = config.getint('postgres', 'PORT')
 
+        # The pool options are optional, so configuration files that were
+        # written before the pool existed keep working (with no pooling)
+        self.pool_size = 0
+        if config.has_option('postgres', 'POOL_SIZE'):
+            self.pool_size = config.getint('postgres', 'POOL_SIZE')
+
+        self.pool_max_idle = 300
+        if config.has_option('postgres', 'POOL_MAX_IDLE'):
+            self.pool_max_idle = config.getint('postgres', 'POOL_MAX_IDLE')
+
+        self.pool_timeout = 30
+        if config.has_option('postgres', 'POOL_TIMEOUT'):
+            self.pool_timeout = config.getint('postgres', 'POOL_TIMEOUT')
+
+        self.slow_query_threshold = 0
+        if config.has_option('postgres', 'SLOW_QUERY_THRESHOLD'):
+            self.slow_query_threshold = config.getfloat(
+                'postgres', 'SLOW_QUERY_THRESHOLD')
+
+        self.slow_query_log = ''
+        if config.has_option('postgres', 'SLOW_QUERY_LOG'):
+            self.slow_query_log = config.get('postgres', 'SLOW_QUERY_LOG')
+
     def _get_redis(self, config):
         """Get the configuration of the redis section"""
         sec_get = partial(config.get, 'redis')
@@ -0,0 +1,65 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import TestCase, main
+from tempfile import mkstemp
+from os import close, remove, environ
+from os.path import join, dirname, abspath
+
+from qiita_core.configuration_manager import ConfigurationManager
+
+
+class ConfigurationManagerTests(TestCase):
+    def setUp(self):
+        self.old_conf_fp = environ.get('QIITA_CONFIG_FP')
+        fd, self.conf_fp = mkstemp(suffix='.txt')
+        close(fd)
+
+        test_conf_fp = join(dirname(abspath(__file__)), '..',
+                            'support_files', 'config_test.txt')
+        with open(test_conf_fp, 'U') as f:
+            self.conf_lines = f.readlines()
+
+    def tearDown(self):
+        if self.old_conf_fp is None:
+            del environ['QIITA_CONFIG_FP']
+        else:
+            environ['QIITA_CONFIG_FP'] = self.old_conf_fp
+        remove(self.conf_fp)
+
+    def _load(self, skip):
+        """Loads the test configuration without the options in `skip`"""
+        with open(self.conf_fp, 'w') as f:
+            f.writelines(l for l in self.conf_lines
+                         if l.split('=')[0].strip() not in skip)
+        environ['QIITA_CONFIG_FP'] = self.conf_fp
+        return ConfigurationManager()
+
+    def test_get_postgres(self):
+        obs = self._load(set())
+        self.assertEqual(obs.pool_size, 10)
+        self.assertEqual(obs.pool_max_idle, 300)
+        self.assertEqual(obs.pool_timeout, 30)
+        self.assertEqual(obs.slow_query_threshold, 1)
+        self.assertEqual(obs.slow_query_log, '')
+
+    def test_get_postgres_no_pool_options(self):
+        obs = self._load({'POOL_SIZE', 'POOL_MAX_IDLE', 'POOL_TIMEOUT'})
+        self.assertEqual(obs.pool_size, 0)
+        self.assertEqual(obs.pool_max_idle, 300)
+        self.assertEqual(obs.pool_timeout, 30)
+        self.assertEqual(obs.database, 'qiita_test')
+
+    def test_get_postgres_no_slow_query_options(self):
+        obs = self._load({'SLOW_QUERY_THRESHOLD', 'SLOW_QUERY_LOG'})
+        self.assertEqual(obs.slow_query_threshold, 0)
+        self.assertEqual(obs.slow_query_log, '')
+
+
+if __name__ == '__main__':
+    main()
@@ -141,10 +141,7 @@ class Analysis(QiitaStatusObject):
         str
             Name of the Analysis
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT email FROM qiita.{0} WHERE "
-               "analysis_id = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('email')
 
     @property
     def name(self):
@@ -155,10 +152,7 @@ class Analysis(QiitaStatusObject):
         str
             Name of the Analysis
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT name FROM qiita.{0} WHERE "
-               "analysis_id = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('name')
 
     @property
     def timestamp(self):
@@ -169,18 +163,12 @@ class Analysis(QiitaStatusObject):
         datetime
             Timestamp of the Analysis
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT timestamp FROM qiita.{0} WHERE "
-               "analysis_id = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('timestamp')
 
     @property
     def description(self):
         """Returns the description of the analysis"""
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT description FROM qiita.{0} WHERE "
-               "analysis_id = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('description')
 
     @description.setter
     def description(self, description):
@@ -410,11 +398,7 @@ class Analysis(QiitaStatusObject):
         str or None
             returns the PMID or None if none is attached
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT pmid FROM qiita.{0} WHERE "
-               "analysis_id = %s".format(self._table))
-        pmid = conn_handler.execute_fetchone(sql, (self._id, ))[0]
-        return pmid
+        return self._row_value('pmid')
 
     @pmid.setter
     def pmid(self, pmid):
@@ -548,25 +532,22 @@ class Analysis(QiitaStatusObject):
         self._lock_check(conn_handler)
         if proc_data and samples:
             sql = ("DELETE FROM qiita.analysis_sample WHERE analysis_id = %s "
-                   "AND processed_data_id = %s AND sample_id = %s")
-            remove = []
-            # build tuples for what samples to remove from what processed data
-            for proc_id in proc_data:
-                for sample_id in samples:
-                    remove.append((self._id, proc_id, sample_id))
+                   "AND processed_data_id IN %s AND sample_id IN %s")
+            # remove all the given samples from all the given processed data
+            args = (self._id, tuple(proc_data), tuple(samples))
         elif proc_data:
             sql = ("DELETE FROM qiita.analysis_sample WHERE analysis_id = %s "
-                   "AND processed_data_id = %s")
-            remove = [(self._id, p) for p in proc_data]
+                   "AND processed_data_id IN %s")
+            args = (self._id, tuple(proc_data))
         elif samples:
             sql = ("DELETE FROM qiita.analysis_sample WHERE analysis_id = %s "
-                   "AND sample_id = %s")
-            remove = [(self._id, s) for s in samples]
+                   "AND sample_id IN %s")
+            args = (self._id, tuple(samples))
         else:
             raise IncompetentQiitaDeveloperError(
                 "Must provide list of samples and/or proc_data for removal!")
 
-        conn_handler.executemany(sql, remove)
+        conn_handler.execute(sql, args)
 
     def build_files(self, rarefaction_depth=None):
         """Builds biom and mapping files needed for analysis
@@ -852,6 +833,7 @@ class Collection(QiitaStatusObject):
                 "collection_id = %s".format(table), [id_])
 
         conn_handler.execute_queue(queue)
+        cls._forget(id_)
 
     # --- Properties ---
     @property
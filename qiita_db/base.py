@@ -15,6 +15,17 @@ Classes
 
     QiitaObject
     QiitaStatusObject
+
+Functions
+---------
+
+..autosummary::
+    :toctree: generated/
+
+    identity_map
+    open_identity_map
+    close_identity_map
+    prefetch
 """
 
 # -----------------------------------------------------------------------------
@@ -26,12 +37,127 @@ Classes
 # -----------------------------------------------------------------------------
 
 from __future__ import division
+from contextlib import contextmanager
+from threading import local
+from collections import defaultdict
+
+from future.utils import with_metaclass, viewitems
+
 from qiita_core.exceptions import IncompetentQiitaDeveloperError
 from .sql_connection import SQLConnectionHandler
 from .exceptions import QiitaDBNotImplementedError, QiitaDBUnknownIDError
+from .util import get_lookup_table
+
+
+_local = local()
+
+
+def _active_identity_map():
+    return getattr(_local, 'identity_map', None)
+
+
+def open_identity_map():
+    """Starts caching the objects constructed by the current thread
+
+    Returns
+    -------
+    dict or None
+        The new identity map, which has to be passed to `close_identity_map`,
+        or None if there was already one active, in which case that one keeps
+        being used
+
+    Notes
+    -----
+    While an identity map is active, constructing an object with an id that
+    has already been constructed (e.g. ``Study(1)`` twice) returns the same
+    instance, without checking again that the id exists on the database
+    """
+    if _active_identity_map() is not None:
+        return None
+    _local.identity_map = {}
+    return _local.identity_map
 
 
-class QiitaObject(object):
+def close_identity_map(identity_map):
+    """Stops caching the objects constructed by the current thread
+
+    Parameters
+    ----------
+    identity_map : dict or None
+        The value returned by `open_identity_map`
+    """
+    if identity_map is not None and _active_identity_map() is identity_map:
+        _local.identity_map = None
+
+
+@contextmanager
+def identity_map():
+    """Caches the objects constructed by the current thread in the block
+
+    See Also
+    --------
+    open_identity_map
+    """
+    token = open_identity_map()
+    try:
+        yield
+    finally:
+        close_identity_map(token)
+
+
+def prefetch(objects, fields=None):
+    """Loads the rows of several objects with a single query per class
+
+    Parameters
+    ----------
+    objects : iterable of QiitaObject
+        The objects whose rows are going to be read
+    fields : list of str, optional
+        The columns to load. Default: all the columns of the rows
+
+    Notes
+    -----
+    The objects whose rows are already loaded are skipped. If only some
+    `fields` are loaded, reading any other column of the row loads it whole
+    """
+    by_class = defaultdict(list)
+    for obj in objects:
+        if obj._row is None:
+            by_class[type(obj)].append(obj)
+
+    for cls, objs in viewitems(by_class):
+        rows = cls._load_rows([obj.id for obj in objs], fields)
+        for obj in objs:
+            row = rows.get(obj.id)
+            if row is None:
+                raise QiitaDBUnknownIDError(obj.id, cls._table)
+            obj._row = row
+            obj._row_complete = fields is None
+
+
+class _IdentityMapMeta(type):
+    """Returns the cached instance of an object if the identity map is active
+
+    Only the objects constructed from their id alone are cached, e.g. a
+    BaseSample, which also needs its template, is always constructed
+    """
+    def __call__(cls, *args, **kwargs):
+        objects = _active_identity_map()
+        if objects is None or len(args) != 1 or kwargs:
+            return super(_IdentityMapMeta, cls).__call__(*args, **kwargs)
+        try:
+            key = (cls, args[0])
+            obj = objects.get(key)
+        except TypeError:
+            # unhashable id, let the constructor deal with it
+            return super(_IdentityMapMeta, cls).__call__(*args, **kwargs)
+        if obj is None:
+            obj = objects[key] = super(_IdentityMapMeta, cls).__call__(
+                *args, **kwargs)
+        return obj
+
+
+class QiitaObject(with_metaclass(_IdentityMapMeta, object)):
     r"""Base class for any qiita_db object
 
     Parameters
@@ -48,8 +174,17 @@ class QiitaObject(object):
     create
     delete
     exists
+    from_ids
     _check_subclass
     _check_id
+    _existing_ids
+    _forget
+    _row_query
+    _row_id_column
+    _load_rows
+    _get_row
+    _row_value
+    _invalidate_row
     __eq__
     __neq__
 
@@ -61,6 +196,10 @@ class QiitaObject(object):
 
     _table = None
 
+    # The row of the object, loaded on first use by _get_row or prefetch
+    _row = None
+    _row_complete = False
+
     @classmethod
     def create(cls):
         r"""Creates a new object with a new id on the storage system
@@ -139,6 +278,209 @@ class QiitaObject(object):
             "SELECT EXISTS(SELECT * FROM qiita.{0} WHERE "
             "{0}_id=%s)".format(self._table), (id_, ))[0]
 
+    @classmethod
+    def _existing_ids(cls, ids, conn_handler):
+        r"""Returns which of the provided IDs exist on the database
+
+        Parameters
+        ----------
+        ids : list of object
+            The IDs to test
+        conn_handler : SQLConnectionHandler
+            The connection handler object connected to the DB
+
+        Returns
+        -------
+        set of object
+            The IDs in `ids` that exist on the database
+
+        Notes
+        -----
+        As `_check_id`, the subclasses whose sql layout doesn't follow the
+        conventions done in the other classes must override this function.
+        """
+        return {r[0] for r in conn_handler.execute_fetchall(
+            "SELECT {0}_id FROM qiita.{0} WHERE {0}_id = ANY(%s)".format(
+                cls._table), (ids, ))}
+
+    @classmethod
+    def from_ids(cls, ids):
+        r"""Constructs the objects of several ids checking them all at once
+
+        Parameters
+        ----------
+        ids : iterable of object
+            The object identifiers
+
+        Returns
+        -------
+        list of QiitaObject
+            The objects, in the same order as `ids`
+
+        Raises
+        ------
+        QiitaDBUnknownIDError
+            If any of the `ids` does not correspond to an object
+
+        Notes
+        -----
+        The objects are added to the active identity map, if any, and the ids
+        already present on it are not checked again.
+        """
+        cls._check_subclass()
+        ids = list(ids)
+        objects = _active_identity_map()
+        if objects is None:
+            objects = {}
+
+        to_check = list({id_ for id_ in ids if (cls, id_) not in objects})
+        if to_check:
+            conn_handler = SQLConnectionHandler()
+            missing = set(to_check) - cls._existing_ids(to_check,
+                                                        conn_handler)
+            if missing:
+                raise QiitaDBUnknownIDError(
+                    ', '.join(sorted(str(m) for m in missing)), cls._table)
+            for id_ in to_check:
+                obj = cls.__new__(cls)
+                obj._id = id_
+                objects[(cls, id_)] = obj
+
+        return [objects[(cls, id_)] for id_ in ids]
+
+    @classmethod
+    def _forget(cls, id_):
+        r"""Removes the object `id_` from the active identity map, if any
+
+        Parameters
+        ----------
+        id_ : object
+            The object identifier
+
+        Returns
+        -------
+        QiitaObject or None
+            The object removed from the identity map, if any
+
+        Notes
+        -----
+        The subclasses must call it when deleting an object from the storage
+        system, so it can't be constructed again from the identity map
+        """
+        objects = _active_identity_map()
+        if objects is not None:
+            return objects.pop((cls, id_), None)
+
+    @classmethod
+    def _row_query(cls):
+        r"""Returns the columns and the FROM clause used to load the rows
+
+        Returns
+        -------
+        tuple of (str, str)
+            The columns of the SELECT and the tables it reads from. The
+            subclasses can join the lookup tables whose names are commonly
+            needed (e.g. the status) to load them with the row
+        """
+        return "qiita.{0}.*".format(cls._table), "qiita.{0}".format(cls._table)
+
+    @classmethod
+    def _row_id_column(cls):
+        r"""Returns the column that holds the id of the objects"""
+        return "{0}_id".format(cls._table)
+
+    @classmethod
+    def _load_rows(cls, ids, fields=None):
+        r"""Loads the rows of several objects
+
+        Parameters
+        ----------
+        ids : list of object
+            The object identifiers
+        fields : list of str, optional
+            The columns to load. Default: all of them
+
+        Returns
+        -------
+        dict of {object: dict}
+            The rows keyed by object id. Unknown ids are not present
+        """
+        cls._check_subclass()
+        columns, from_clause = cls._row_query()
+        id_column = cls._row_id_column()
+        if fields is not None:
+            # The fields can be any of the columns of the full row, including
+            # those of the joined tables, so select them from it
+            from_clause = "(SELECT {0} FROM {1}) AS r".format(
+                columns, from_clause)
+            columns = ', '.join([id_column] + list(fields))
+        conn_handler = SQLConnectionHandler()
+        rows = conn_handler.execute_fetchall(
+            "SELECT {0} FROM {1} WHERE {2} = ANY(%s)".format(
+                columns, from_clause, id_column), (list(ids), ))
+        return {row[id_column]: dict(row) for row in rows}
+
+    def _get_row(self):
+        r"""Returns the row of the object, loading it on first use
+
+        Returns
+        -------
+        dict
+            The row of the object keyed by column name
+
+        Raises
+        ------
+        QiitaDBUnknownIDError
+            If the object does not exist anymore on the database
+
+        Notes
+        -----
+        The row is cached on the object until any of its properties is set or
+        `_invalidate_row` is called, so the properties that read it don't
+        query the database each time
+        """
+        if self._row is None or not self._row_complete:
+            row = self._load_rows([self._id]).get(self._id)
+            if row is None:
+                raise QiitaDBUnknownIDError(self._id, self._table)
+            self._row = row
+            self._row_complete = True
+        return self._row
+
+    def _row_value(self, column):
+        r"""Returns the value of `column` in the row of the object
+
+        Parameters
+        ----------
+        column : str
+            The column name
+
+        Returns
+        -------
+        object
+            The value of the column
+        """
+        if self._row is None or column not in self._row:
+            return self._get_row()[column]
+        return self._row[column]
+
+    def _invalidate_row(self):
+        r"""Discards the cached row, so it is loaded again on next use
+
+        Notes
+        -----
+        It is called when setting any property of the object. The methods
+        that modify the row of the object must call it as well
+        """
+        self._row = None
+        self._row_complete = False
+
+    def __setattr__(self, name, value):
+        r"""Discards the cached row when setting a property of the object"""
+        super(QiitaObject, self).__setattr__(name, value)
+        if not name.startswith('_'):
+            self._invalidate_row()
+
     def __init__(self, id_):
         r"""Initializes the object
 
@@ -187,19 +529,20 @@ class QiitaStatusObject(QiitaObject):
     _status_setter_checks
     """
 
+    @classmethod
+    def _row_query(cls):
+        r"""Loads the status name with the row of the object"""
+        columns = "qiita.{0}.*, qiita.{0}_status.status"
+        tables = "qiita.{0} JOIN qiita.{0}_status USING ({0}_status_id)"
+        return columns.format(cls._table), tables.format(cls._table)
+
     @property
     def status(self):
         r"""String with the current status of the analysis"""
         # Check that self._table is actually defined
         self._check_subclass()
 
-        # Get the DB status of the object
-        conn_handler = SQLConnectionHandler()
-        return conn_handler.execute_fetchone(
-            "SELECT status FROM qiita.{0}_status WHERE {0}_status_id = "
-            "(SELECT {0}_status_id FROM qiita.{0} WHERE "
-            "{0}_id = %s)".format(self._table),
-            (self._id, ))[0]
+        return self._row_value('status')
 
     def _status_setter_checks(self, conn_handler):
         r"""Perform any extra checks that needed to be done before setting the
@@ -267,9 +610,8 @@ class QiitaStatusObject(QiitaObject):
         # Get all available statuses
         conn_handler = (conn_handler if conn_handler is not None
                         else SQLConnectionHandler())
-        statuses = [x[0] for x in conn_handler.execute_fetchall(
-            "SELECT DISTINCT status FROM qiita.{0}_status".format(self._table),
-            (self._id, ))]
+        statuses = get_lookup_table("{0}_status".format(self._table),
+                                    "status", conn_handler=conn_handler)
 
         # Check that all the provided statuses are valid statuses
         if set(status).difference(statuses):
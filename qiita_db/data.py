@@ -403,6 +403,7 @@ class RawData(BaseData):
         if study_raw_data_count == 0:
             conn_handler.execute("DELETE FROM qiita.raw_data WHERE "
                                  "raw_data_id = {0}".format(raw_data_id))
+            cls._forget(raw_data_id)
 
     @property
     def studies(self):
@@ -645,6 +646,13 @@ class PreprocessedData(BaseData):
     _study_preprocessed_table = "study_preprocessed_data"
     _template_preprocessed_table = "prep_template_preprocessed_data"
 
+    @classmethod
+    def _row_query(cls):
+        r"""Loads the data type name with the row of the object"""
+        columns = "qiita.{0}.*, qiita.data_type.data_type"
+        tables = "qiita.{0} JOIN qiita.data_type USING (data_type_id)"
+        return columns.format(cls._table), tables.format(cls._table)
+
     @classmethod
     def create(cls, study, preprocessed_params_table, preprocessed_params_id,
                filepaths, prep_template=None, data_type=None,
@@ -795,10 +803,7 @@ class PreprocessedData(BaseData):
         str
             The ebi submission accession of this preprocessed data
         """
-        conn_handler = SQLConnectionHandler()
-        return conn_handler.execute_fetchone(
-            "SELECT ebi_submission_accession FROM qiita.{0} "
-            "WHERE preprocessed_data_id=%s".format(self._table), (self.id,))[0]
+        return self._row_value('ebi_submission_accession')
 
     @property
     def ebi_study_accession(self):
@@ -809,10 +814,7 @@ class PreprocessedData(BaseData):
         str
             The ebi study accession of this preprocessed data
         """
-        conn_handler = SQLConnectionHandler()
-        return conn_handler.execute_fetchone(
-            "SELECT ebi_study_accession FROM qiita.{0} "
-            "WHERE preprocessed_data_id=%s".format(self._table), (self.id,))[0]
+        return self._row_value('ebi_study_accession')
 
     @ebi_submission_accession.setter
     def ebi_submission_accession(self, new_ebi_submission_accession):
@@ -857,14 +859,7 @@ class PreprocessedData(BaseData):
         str or int
             string value of data_type or data_type_id
         """
-        conn_handler = SQLConnectionHandler()
-        ret = "_id" if ret_id else ""
-        data_type = conn_handler.execute_fetchone(
-            "SELECT d.data_type{0} FROM qiita.data_type d JOIN "
-            "qiita.{1} p ON p.data_type_id = d.data_type_id WHERE"
-            " p.preprocessed_data_id = %s".format(ret, self._table),
-            (self._id, ))
-        return data_type[0]
+        return self._row_value('data_type_id' if ret_id else 'data_type')
 
     def submitted_to_insdc_status(self):
         r"""Tells if the raw data has been submitted to INSDC
@@ -874,10 +869,7 @@ class PreprocessedData(BaseData):
         str
             One of {'not submitted', 'submitting', 'success', 'failed'}
         """
-        conn_handler = SQLConnectionHandler()
-        return conn_handler.execute_fetchone(
-            "SELECT submitted_to_insdc_status FROM qiita.{0} "
-            "WHERE preprocessed_data_id=%s".format(self._table), (self.id,))[0]
+        return self._row_value('submitted_to_insdc_status')
 
     def update_insdc_status(self, state, study_acc=None, submission_acc=None):
         r"""Update the INSDC submission status
@@ -923,6 +915,7 @@ class PreprocessedData(BaseData):
                 SET submitted_to_insdc_status = %s
                 WHERE preprocessed_data_id=%s""".format(self._table),
                                  (state, self.id))
+        self._invalidate_row()
 
     def submitted_to_vamps_status(self):
         r"""Tells if the raw data has been submitted to VAMPS
@@ -932,10 +925,7 @@ class PreprocessedData(BaseData):
         str
             One of {'not submitted', 'submitting', 'success', 'failed'}
         """
-        conn_handler = SQLConnectionHandler()
-        return conn_handler.execute_fetchone(
-            "SELECT submitted_to_vamps_status FROM qiita.{0} "
-            "WHERE preprocessed_data_id=%s".format(self._table), (self.id,))[0]
+        return self._row_value('submitted_to_vamps_status')
 
     def update_vamps_status(self, status):
         r"""Update the VAMPS submission status
@@ -957,6 +947,7 @@ class PreprocessedData(BaseData):
         conn_handler.execute(
             """UPDATE qiita.{0} SET submitted_to_vamps_status = %s WHERE
             preprocessed_data_id=%s""".format(self._table), (status, self.id))
+        self._invalidate_row()
 
     @property
     def processing_status(self):
@@ -967,10 +958,7 @@ class PreprocessedData(BaseData):
         str
             One of {'not_processed', 'processing', 'processed', 'failed'}
         """
-        conn_handler = SQLConnectionHandler()
-        return conn_handler.execute_fetchone(
-            "SELECT processing_status FROM qiita.{0} WHERE "
-            "preprocessed_data_id=%s".format(self._table), (self.id,))[0]
+        return self._row_value('processing_status')
 
     @processing_status.setter
     def processing_status(self, state):
@@ -1020,6 +1008,13 @@ class ProcessedData(BaseData):
     _study_processed_table = "study_processed_data"
     _preprocessed_processed_table = "preprocessed_processed_data"
 
+    @classmethod
+    def _row_query(cls):
+        r"""Loads the data type name with the row of the object"""
+        columns = "qiita.{0}.*, qiita.data_type.data_type"
+        tables = "qiita.{0} JOIN qiita.data_type USING (data_type_id)"
+        return columns.format(cls._table), tables.format(cls._table)
+
     @classmethod
     def create(cls, processed_params_table, processed_params_id, filepaths,
                preprocessed_data=None, study=None, processed_date=None,
@@ -1157,19 +1152,9 @@ class ProcessedData(BaseData):
         str or int
             string value of data_type or data_type_id
         """
-        conn_handler = SQLConnectionHandler()
-        ret = "_id" if ret_id else ""
-        data_type = conn_handler.execute_fetchone(
-            "SELECT d.data_type{0} FROM qiita.data_type d JOIN "
-            "qiita.{1} p ON p.data_type_id = d.data_type_id WHERE"
-            " p.processed_data_id = %s".format(ret, self._table),
-            (self._id, ))
-        return data_type[0]
+        return self._row_value('data_type_id' if ret_id else 'data_type')
 
     @property
     def processed_date(self):
         """Return the processed date"""
-        conn_handler = SQLConnectionHandler()
-        return conn_handler.execute_fetchone(
-            "SELECT processed_date FROM qiita.{0} WHERE "
-            "processed_data_id=%s".format(self._table), (self.id,))[0]
+        return self._row_value('processed_date')
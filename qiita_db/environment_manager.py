@@ -7,7 +7,8 @@
 # -----------------------------------------------------------------------------
 
 from qiita_db.ontology import Ontology
-from qiita_db.util import convert_to_id
+from qiita_db.util import (convert_to_id, clear_lookup_tables,
+                           clear_table_cols)
 from os.path import abspath, dirname, join, exists, basename, splitext
 from functools import partial
 from os import mkdir
@@ -19,7 +20,7 @@ from future.utils import viewitems
 
 from qiita_core.exceptions import QiitaEnvironmentError
 from qiita_core.qiita_settings import qiita_config
-from .sql_connection import SQLConnectionHandler
+from .sql_connection import SQLConnectionHandler, close_pools
 from .reference import Reference
 from natsort import natsorted
 
@@ -265,6 +266,9 @@ def drop_environment(ask_for_confirmation):
             do_drop = True
 
     if do_drop:
+        # postgres refuses to drop a database with open connections, so make
+        # sure that the pooled ones are closed
+        close_pools()
         admin_conn = SQLConnectionHandler(admin='admin_without_database')
         admin_conn.set_autocommit('on')
         admin_conn.execute('DROP DATABASE %s' % qiita_config.database)
@@ -290,17 +294,22 @@ def drop_and_rebuild_tst_database(conn_handler):
     # Populate the database
     with open(POPULATE_FP, 'U') as f:
         conn_handler.execute(f.read())
+    clear_lookup_tables()
+    clear_table_cols()
 
 
 def reset_test_database(wrapped_fn):
     """Decorator that drops the qiita schema, rebuilds and repopulates the
     schema with test data, then executes wrapped_fn
     """
-    conn_handler = SQLConnectionHandler()
-
     def decorated_wrapped_fn(*args, **kwargs):
-        # Reset the test database
-        drop_and_rebuild_tst_database(conn_handler)
+        # Reset the test database. The handler is only kept while it is used,
+        # so the decorated functions don't hold pooled connections
+        conn_handler = SQLConnectionHandler()
+        try:
+            drop_and_rebuild_tst_database(conn_handler)
+        finally:
+            conn_handler.close()
         # Execute the wrapped function
         return wrapped_fn(*args, **kwargs)
 
@@ -370,6 +379,9 @@ def patch(patches_dir=PATCHES_DIR, verbose=False):
                               [sql_patch_filename])
 
         conn.execute_queue(sql_patch_filename)
+        # The patch may have modified the lookup tables or the schema
+        clear_lookup_tables()
+        clear_table_cols()
 
         if exists(py_patch_fp):
             if verbose:
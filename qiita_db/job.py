@@ -35,7 +35,7 @@ from collections import defaultdict
 
 from .base import QiitaStatusObject
 from .util import (insert_filepaths, convert_to_id, get_db_files_base_dir,
-                   params_dict_to_json, get_mountpoint)
+                   params_dict_to_json, get_mountpoint, get_lookup_table)
 from .sql_connection import SQLConnectionHandler
 from .logger import LogEntry
 from .exceptions import QiitaDBStatusError, QiitaDBDuplicateError
@@ -185,6 +185,7 @@ class Job(QiitaStatusObject):
                              "job_id = %s", [jobid])
         conn_handler.execute("DELETE FROM qiita.job WHERE job_id = %s",
                              [jobid])
+        cls._forget(jobid)
 
         # remove files/folders attached to job
         _, basedir = get_mountpoint("job")[0]
@@ -394,14 +395,14 @@ class Job(QiitaStatusObject):
         log_entry = LogEntry.create('Runtime', msg,
                                     info={'job': self._id})
         self._lock_job(conn_handler)
-        err_id = conn_handler.execute_fetchone(
-            "SELECT job_status_id FROM qiita.job_status WHERE "
-            "status = 'error'")[0]
+        err_id = get_lookup_table("job_status", "status",
+                                  conn_handler=conn_handler)['error']
         # attach the error to the job and set to error
         sql = ("UPDATE qiita.{0} SET log_id = %s, job_status_id = %s WHERE "
                "job_id = %s".format(self._table))
 
         conn_handler.execute(sql, (log_entry.id, err_id, self._id))
+        self._invalidate_row()
 
     def add_results(self, results):
         """Adds a list of results to the results
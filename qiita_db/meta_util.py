@@ -86,8 +86,8 @@ def get_accessible_filepath_ids(user):
         user.shared_studies
 
     filepath_ids = set()
-    for study_id in study_ids:
-        study = Study(study_id)
+    for study in Study.from_ids(set(study_ids)):
+        study_id = study.id
 
         # For each study, there are raw, preprocessed, and processed filepaths
         raw_data_ids = study.raw_data()
@@ -104,8 +104,8 @@ def get_accessible_filepath_ids(user):
 
         # adding prep and sample templates
         prep_fp_ids = []
-        for rdid in study.raw_data():
-            for pt_id in RawData(rdid).prep_templates:
+        for raw_data in RawData.from_ids(raw_data_ids):
+            for pt_id in raw_data.prep_templates:
                 # related to https://github.com/biocore/qiita/issues/596
                 # and https://github.com/biocore/qiita/issues/554
                 if PrepTemplate.exists(pt_id):
@@ -123,9 +123,7 @@ def get_accessible_filepath_ids(user):
     analysis_ids = Analysis.get_by_status('public') + user.private_analyses + \
         user.shared_analyses
 
-    for analysis_id in analysis_ids:
-        analysis = Analysis(analysis_id)
-
+    for analysis in Analysis.from_ids(set(analysis_ids)):
         # For each analysis, there are mapping, biom, and job result filepaths
         filepath_ids.update(analysis.all_associated_filepath_ids)
 
@@ -19,12 +19,17 @@ Classes
     MetadataTemplate
     SampleTemplate
     PrepTemplate
+    TemplateChangeset
+    TemplateValidationReport
 
 Methods
 -------
 
 ..autosummary::
     :toctree: generated/
+
+    template_changeset
+    read_template_backup
 """
 
 # -----------------------------------------------------------------------------
@@ -37,14 +42,22 @@ Methods
 
 from __future__ import division
 from future.builtins import zip
-from future.utils import viewitems, PY3
+from future.utils import viewitems, viewvalues, PY3
+from past.builtins import basestring
 from copy import deepcopy
-from os.path import join
-from os import close
+from math import isnan
+import re
+from datetime import datetime
+from numbers import Number
+from os import remove
+from os.path import join, exists, getsize, getmtime, dirname
 from time import strftime
 from functools import partial
-from tempfile import mkstemp
 from os.path import basename
+from gzip import open as gzopen
+from hashlib import sha1
+from difflib import SequenceMatcher
+from itertools import islice, takewhile
 
 import pandas as pd
 import numpy as np
@@ -58,12 +71,12 @@ from .exceptions import (QiitaDBDuplicateError, QiitaDBColumnError,
                          QiitaDBDuplicateHeaderError, QiitaDBError,
                          QiitaDBWarning, QiitaDBExecutionError)
 from .base import QiitaObject
-from .sql_connection import SQLConnectionHandler
+from .sql_connection import SQLConnectionHandler, transaction
 from .ontology import Ontology
-from .util import (exists_table, get_table_cols, get_emp_status,
-                   get_required_sample_info_status, convert_to_id,
-                   convert_from_id, get_mountpoint,
-                   insert_filepaths, scrub_data)
+from .util import (exists_table, get_table_cols, get_table_cols_w_type,
+                   get_emp_status, get_required_sample_info_status,
+                   convert_to_id, convert_from_id, get_mountpoint,
+                   insert_filepaths, scrub_data, compute_checksum)
 from .study import Study
 from .data import RawData
 from .logger import LogEntry
@@ -140,6 +153,26 @@ def _as_python_types(metadata_map, headers):
     return values
 
 
+def _as_python_value(value):
+    r"""Converts value from a numpy type to the closest python type
+
+    Parameters
+    ----------
+    value : object
+        The value to convert
+
+    Returns
+    -------
+    object
+        The value, cast to a python type if it was a numpy type
+    """
+    if isinstance(value, np.datetime64):
+        return pd.to_datetime(value)
+    elif isinstance(value, np.generic):
+        return np.asscalar(value)
+    return value
+
+
 def _prefix_sample_names_with_id(md_template, study_id):
     r"""prefix the sample_names in md_template with the study id
 
@@ -175,6 +208,316 @@ def _prefix_sample_names_with_id(md_template, study_id):
         md_template.index.name = None
 
 
+def _comparable(value, parse=None):
+    r"""Normalizes value so equal values stored with different types compare
+    equal
+
+    Parameters
+    ----------
+    value : object
+        A metadata value
+    parse : callable, optional
+        If given, strings are converted with it before being normalized, and
+        kept as they are if it fails
+
+    Returns
+    -------
+    object
+        None for missing values, float for numbers (other than booleans),
+        pandas.Timestamp for datetimes and value otherwise
+    """
+    if parse is not None and isinstance(value, basestring):
+        try:
+            return _comparable(parse(value.strip()))
+        except (ValueError, TypeError, OverflowError):
+            return value
+    value = _as_python_value(value)
+    if value is None or (not isinstance(value, (list, tuple)) and
+                         pd.isnull(value)):
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, Number):
+        return float(value)
+    if isinstance(value, datetime):
+        return pd.Timestamp(value)
+    return value
+
+
+def _string_parser(*columns):
+    r"""Returns the parser for the strings of a category in two versions of a
+    template, so they compare equal to the values of the other version
+
+    Parameters
+    ----------
+    columns : lists of object
+        The values of the category in each version
+
+    Returns
+    -------
+    callable or None
+        pandas.Timestamp if any value is a datetime (e.g. the timestamps
+        stored in the DB, while the uploaded file holds strings), float if
+        any value is a number (other than booleans) and None otherwise
+    """
+    values = [v for column in columns for v in column]
+    if any(isinstance(v, (datetime, np.datetime64)) for v in values):
+        return pd.Timestamp
+    if any(isinstance(v, (Number, np.number)) and
+           not isinstance(v, (bool, np.bool_)) for v in values):
+        return float
+    return None
+
+
+class TemplateChangeset(object):
+    r"""Cell level differences between two versions of a metadata template
+
+    Attributes
+    ----------
+    added : dict of {(str, str): object}
+        The (sample id, category) cells only present in the new version, with
+        their values
+    changed : dict of {(str, str): (object, object)}
+        The cells present in both versions whose value changed, with their
+        (current, new) values
+    removed : dict of {(str, str): object}
+        The cells only present in the current version, with their values
+
+    See Also
+    --------
+    template_changeset
+    """
+    def __init__(self):
+        self.added = {}
+        self.changed = {}
+        self.removed = {}
+
+    def __len__(self):
+        r"""Returns the number of cells that differ"""
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+    def _cells(self):
+        return set(self.added).union(self.changed, self.removed)
+
+    @property
+    def samples(self):
+        r"""The set of sample ids with any cell that differs"""
+        return {sample_id for sample_id, _ in self._cells()}
+
+    @property
+    def categories(self):
+        r"""The set of categories with any cell that differs"""
+        return {category for _, category in self._cells()}
+
+    def changed_by_category(self):
+        r"""Returns the new values of the changed cells grouped by category
+
+        Returns
+        -------
+        dict of {str: dict of {str: object}}
+            The new values, as {category: {sample_id: value}}
+        """
+        result = {}
+        for (sample_id, category), (_, value) in viewitems(self.changed):
+            result.setdefault(category, {})[sample_id] = value
+        return result
+
+
+def template_changeset(current_map, new_map):
+    r"""Computes the cells that differ between two versions of a template
+
+    Parameters
+    ----------
+    current_map : DataFrame
+        The current version of the template, indexed by sample id
+    new_map : DataFrame
+        The new version of the template, indexed by sample id
+
+    Returns
+    -------
+    TemplateChangeset
+        The cells added, changed and removed in `new_map`
+
+    Notes
+    -----
+    The values of each sample present in both versions are compared as a
+    row, and only the cells of the samples whose rows differ are compared one
+    by one. The values are normalized before comparing them, so e.g. 1 and
+    1.0, two missing values, or a datetime and a string with the same
+    timestamp, are considered equal.
+    """
+    changes = TemplateChangeset()
+    current_samples = set(current_map.index)
+    new_samples = set(new_map.index)
+    common_samples = sorted(current_samples.intersection(new_samples))
+    categories = sorted(set(current_map.columns).intersection(new_map.columns))
+
+    # Samples and categories only present in one of the versions
+    for df, samples, other, cells in (
+            (new_map, new_samples, current_map, changes.added),
+            (current_map, current_samples, new_map, changes.removed)):
+        for category in df.columns:
+            column = df[category]
+            if category in other:
+                sample_ids = samples.difference(other.index)
+            else:
+                sample_ids = samples
+            for sample_id in sample_ids:
+                cells[(sample_id, category)] = column[sample_id]
+
+    if not common_samples or not categories:
+        return changes
+
+    current_columns = [current_map[c].loc[common_samples].tolist()
+                       for c in categories]
+    new_columns = [new_map[c].loc[common_samples].tolist()
+                   for c in categories]
+    parsers = [_string_parser(current, new)
+               for current, new in zip(current_columns, new_columns)]
+
+    def rows(columns):
+        columns = [[_comparable(v, parse) for v in values]
+                   for values, parse in zip(columns, parsers)]
+        return zip(*columns)
+
+    for sample_id, current, new in zip(common_samples, rows(current_columns),
+                                       rows(new_columns)):
+        if current == new:
+            continue
+        for category, current_value, new_value in zip(categories, current,
+                                                      new):
+            if current_value != new_value:
+                changes.changed[(sample_id, category)] = (
+                    current_map[category][sample_id],
+                    new_map[category][sample_id])
+
+    return changes
+
+
+class TemplateValidationReport(object):
+    r"""The problems found validating a metadata template
+
+    Parameters
+    ----------
+    template_type : str
+        The type of the template ('sample' or 'prep'), used in the messages
+
+    Attributes
+    ----------
+    invalid_sample_names : list of str
+        The sample names with characters other than alphanumeric characters
+        or periods
+    duplicated_sample_names : list of str
+        The sample names present more than once
+    duplicated_columns : set of str
+        The (lowercased) column names present more than once
+    missing_columns : set of str
+        The required columns that are not present
+    invalid_values : dict of {str: list of str}
+        For each column with values that can't be cast to the type of the
+        column, the sample names with those values
+
+    See Also
+    --------
+    MetadataTemplate.validate
+    """
+    def __init__(self, template_type):
+        self.template_type = template_type
+        self.invalid_sample_names = []
+        self.duplicated_sample_names = []
+        self.duplicated_columns = set()
+        self.missing_columns = set()
+        self.invalid_values = {}
+
+    def __len__(self):
+        r"""Returns the number of problems found"""
+        return len(self.messages())
+
+    def messages(self):
+        r"""Returns a message describing each problem found
+
+        Returns
+        -------
+        list of str
+            The messages, empty if the template is valid
+        """
+        messages = []
+        if self.invalid_sample_names:
+            messages.append(
+                "The following sample names in the %s template contain "
+                "invalid characters (only alphanumeric characters or periods "
+                "are allowed): %s." % (self.template_type,
+                                       ", ".join(self.invalid_sample_names)))
+        if self.duplicated_sample_names:
+            messages.append(
+                "The following sample names in the %s template are "
+                "duplicated: %s." % (self.template_type,
+                                     ", ".join(self.duplicated_sample_names)))
+        if self.duplicated_columns:
+            messages.append("Duplicate headers found in the %s template: "
+                            "%s." % (self.template_type,
+                                     ", ".join(sorted(
+                                         self.duplicated_columns))))
+        if self.missing_columns:
+            messages.append("Missing columns: %s"
+                            % ', '.join(sorted(self.missing_columns)))
+        for column, sample_names in sorted(viewitems(self.invalid_values)):
+            messages.append("The '%s' column includes values that cannot be "
+                            "cast into its type in samples: %s."
+                            % (column, ", ".join(sample_names)))
+        return messages
+
+    def raise_errors(self):
+        r"""Raises an error describing all the problems found, if any
+
+        Raises
+        ------
+        QiitaDBDuplicateHeaderError
+            If the only problem found are duplicated columns
+        QiitaDBColumnError
+            If any other problem was found
+        """
+        messages = self.messages()
+        if not messages:
+            return
+        if self.duplicated_columns and len(messages) == 1:
+            raise QiitaDBDuplicateHeaderError(self.duplicated_columns)
+        raise QiitaDBColumnError(' '.join(messages))
+
+
+def _coerce_column(values, column_type):
+    r"""Casts values to the python type of the SQL column_type
+
+    Parameters
+    ----------
+    values : pandas.Series
+        The values of a column of a template
+    column_type : str
+        The SQL type of the column, as reported by information_schema
+
+    Returns
+    -------
+    pandas.Series
+        The cast values, or the original values if any of them can't be cast
+    pandas.Series of bool
+        Which of the values can't be cast. Missing values are not checked
+    """
+    checked = values.notnull()
+    invalid = pd.Series(False, index=values.index)
+    if column_type in ('double precision', 'real', 'numeric'):
+        if not np.issubdtype(values.dtype, np.number):
+            valid = values.astype(str).str.contains(_FLOAT_RE)
+            invalid = checked & ~valid
+            if not invalid.any():
+                values = values.astype(float)
+    elif column_type == 'boolean':
+        if values.dtype != bool:
+            invalid = checked & ~values.isin(list(_BOOL_VALUES_WITH_BOOLS))
+            if not invalid.any():
+                values = values.map(_BOOL_VALUES_WITH_BOOLS)
+    return values, invalid
+
+
 class BaseSample(QiitaObject):
     r"""Sample object that accesses the db to get the information of a sample
     belonging to a PrepTemplate or a SampleTemplate.
@@ -294,6 +637,60 @@ class BaseSample(QiitaObject):
             "{1}=%s)".format(cls._table, cls._id_column),
             (sample_id, md_template.id))[0]
 
+    @classmethod
+    def _from_template(cls, sample_id, md_template):
+        r"""Constructs the object of a sample known to be in `md_template`
+
+        Parameters
+        ----------
+        sample_id : str
+            The sample id
+        md_template : MetadataTemplate
+            The metadata template in which the sample is present
+
+        Returns
+        -------
+        BaseSample
+            The sample object
+
+        Notes
+        -----
+        It does not check that the sample is present in the template, so it
+        should only be used with sample ids retrieved from the template
+        """
+        obj = cls.__new__(cls)
+        obj._id = sample_id
+        obj._md_template = md_template
+        obj._dynamic_table = "%s%d" % (cls._table_prefix, md_template.id)
+        return obj
+
+    def _get_row(self):
+        r"""Returns the metadata of the sample from the row buffer of its
+        template
+
+        Returns
+        -------
+        dict of {str: object}
+            The metadata of the sample of the form {category: value}, with
+            the *_id columns translated to their string values
+
+        Raises
+        ------
+        QiitaDBUnknownIDError
+            If the sample is not present in the template anymore
+        """
+        row = self._md_template._get_sample_row(self._id)
+        if row is None:
+            raise QiitaDBUnknownIDError(self._id, self.__class__.__name__)
+        return row
+
+    def _invalidate_row(self):
+        r"""Discards the metadata of the sample from the row buffer of its
+        template, so it is loaded again on next use"""
+        md_template = getattr(self, '_md_template', None)
+        if md_template is not None:
+            md_template._invalidate_sample_rows([self._id])
+
     def _get_categories(self, conn_handler):
         r"""Returns all the available metadata categories for the sample
 
@@ -307,30 +704,7 @@ class BaseSample(QiitaObject):
         set of str
             The set of all available metadata categories
         """
-        # Get all the required columns
-        required_cols = get_table_cols(self._table, conn_handler)
-        # Get all the the columns in the dynamic table
-        dynamic_cols = get_table_cols(self._dynamic_table, conn_handler)
-        # Get the union of the two previous lists
-        cols = set(required_cols).union(dynamic_cols)
-        # Remove the sample_id column and the study_id/raw_data_id columns,
-        # as this columns are used internally for data storage and they don't
-        # actually belong to the metadata
-        cols.remove('sample_id')
-        cols.remove(self._id_column)
-        try:
-            # study_id could be potentially removed by _id_column, so wrap
-            # in a try except
-            cols.remove('study_id')
-        except KeyError:
-            pass
-        # Change the *_id columns, as this is for convenience internally,
-        # and add the original categories
-        for key, value in viewitems(self._md_template.translate_cols_dict):
-            cols.remove(key)
-            cols.add(value)
-
-        return cols
+        return set(self._get_row())
 
     def _to_dict(self):
         r"""Returns the categories and their values in a dictionary
@@ -340,25 +714,7 @@ class BaseSample(QiitaObject):
         dict of {str: str}
             A dictionary of the form {category: value}
         """
-        conn_handler = SQLConnectionHandler()
-        d = dict(conn_handler.execute_fetchone(
-            "SELECT * FROM qiita.{0} WHERE {1}=%s AND "
-            "sample_id=%s".format(self._table, self._id_column),
-            (self._md_template.id, self._id)))
-        dynamic_d = dict(conn_handler.execute_fetchone(
-            "SELECT * from qiita.{0} WHERE "
-            "sample_id=%s".format(self._dynamic_table),
-            (self._id, )))
-        d.update(dynamic_d)
-        del d['sample_id']
-        del d[self._id_column]
-        d.pop('study_id', None)
-
-        # Modify all the *_id columns to include the string instead of the id
-        for k, v in viewitems(self._md_template.translate_cols_dict):
-            d[v] = self._md_template.str_cols_handlers[k][d[k]]
-            del d[k]
-        return d
+        return dict(self._get_row())
 
     def __len__(self):
         r"""Returns the number of metadata categories
@@ -368,9 +724,7 @@ class BaseSample(QiitaObject):
         int
             The number of metadata categories
         """
-        conn_handler = SQLConnectionHandler()
-        # return the number of columns
-        return len(self._get_categories(conn_handler))
+        return len(self._get_row())
 
     def __getitem__(self, key):
         r"""Returns the value of the metadata category `key`
@@ -394,35 +748,10 @@ class BaseSample(QiitaObject):
         --------
         get
         """
-        conn_handler = SQLConnectionHandler()
         key = key.lower()
-        if key in self._get_categories(conn_handler):
-            # It's possible that the key is asking for one of the *_id columns
-            # that we have to do the translation
-            def handler(x):
-                return x
-
-            # prevent flake8 from complaining about the function not being
-            # used and a redefinition happening in the next few lines
-            handler(None)
-
-            if key in self._md_template.translate_cols_dict.values():
-                handler = (
-                    lambda x: self._md_template.str_cols_handlers[key][x])
-                key = "%s_id" % key
-            # Check if we have either to query the table with required columns
-            # or the dynamic table
-            if key in get_table_cols(self._table, conn_handler):
-                result = conn_handler.execute_fetchone(
-                    "SELECT {0} FROM qiita.{1} WHERE {2}=%s AND "
-                    "sample_id=%s".format(key, self._table, self._id_column),
-                    (self._md_template.id, self._id))[0]
-                return handler(result)
-            else:
-                return conn_handler.execute_fetchone(
-                    "SELECT {0} FROM qiita.{1} WHERE "
-                    "sample_id=%s".format(key, self._dynamic_table),
-                    (self._id, ))[0]
+        row = self._get_row()
+        if key in row:
+            return row[key]
         else:
             # The key is not available for the sample, so raise a KeyError
             raise KeyError("Metadata category %s does not exists for sample %s"
@@ -463,8 +792,7 @@ class BaseSample(QiitaObject):
         --------
         keys
         """
-        conn_handler = SQLConnectionHandler()
-        return iter(self._get_categories(conn_handler))
+        return iter(self._get_row())
 
     def __contains__(self, key):
         r"""Checks if the metadata category `key` is present
@@ -479,8 +807,7 @@ class BaseSample(QiitaObject):
         bool
             True if the metadata category `key` is present, false otherwise
         """
-        conn_handler = SQLConnectionHandler()
-        return key.lower() in self._get_categories(conn_handler)
+        return key.lower() in self._get_row()
 
     def keys(self):
         r"""Iterator over the metadata categories
@@ -640,13 +967,18 @@ class Sample(BaseSample):
 
         if exists_dynamic:
             # catching error so we can check if the error is due to different
-            # column type or something else
+            # column type or something else. The update runs in its own
+            # (nested) transaction, so the check can be executed even if this
+            # is part of a larger transaction
             try:
-                conn_handler.execute("""
-                    UPDATE qiita.{0}
-                    SET {1}=%s
-                    WHERE sample_id=%s""".format(self._dynamic_table,
-                                                 column), (value, self._id))
+                with transaction():
+                    conn_handler.execute(
+                        "UPDATE qiita.{0} SET {1}=%s "
+                        "WHERE sample_id=%s".format(self._dynamic_table,
+                                                    column),
+                        (value, self._id))
+                    self._md_template._index_metadata(
+                        conn_handler, samples=[self._id], columns=[column])
             except Exception as e:
                 column_type = conn_handler.execute_fetchone("""
                     SELECT data_type
@@ -675,6 +1007,7 @@ class Sample(BaseSample):
         else:
             raise QiitaDBColumnError("Column %s does not exist in %s" %
                                      (column, self._dynamic_table))
+        self._invalidate_row()
 
 
 class MetadataTemplate(QiitaObject):
@@ -689,6 +1022,7 @@ class MetadataTemplate(QiitaObject):
     -------
     create
     exists
+    validate
     __len__
     __getitem__
     __setitem__
@@ -700,6 +1034,7 @@ class MetadataTemplate(QiitaObject):
     items
     get
     to_file
+    to_dataframe
     add_filepath
 
     See Also
@@ -714,6 +1049,12 @@ class MetadataTemplate(QiitaObject):
     _column_table = None
     _id_column = None
     _sample_cls = None
+    # The metadata of the samples keyed by sample id, loaded on first use by
+    # _get_sample_row and shared by all the sample objects of the template
+    _sample_rows = None
+    # The ids of the samples of the template, loaded on first use by
+    # _get_sample_ids
+    _sample_ids = None
 
     def _check_id(self, id_, conn_handler=None):
         r"""Checks that the MetadataTemplate id_ exists on the database"""
@@ -725,6 +1066,13 @@ class MetadataTemplate(QiitaObject):
             "{1}=%s)".format(self._table, self._id_column),
             (id_, ))[0]
 
+    @classmethod
+    def _existing_ids(cls, ids, conn_handler):
+        r"""Returns which of the MetadataTemplate ids exist on the database"""
+        return {r[0] for r in conn_handler.execute_fetchall(
+            "SELECT DISTINCT {1} FROM qiita.{0} WHERE {1} = ANY(%s)".format(
+                cls._table, cls._id_column), (ids, ))}
+
     @classmethod
     def _table_name(cls, obj_id):
         r"""Returns the dynamic table name
@@ -766,15 +1114,111 @@ class MetadataTemplate(QiitaObject):
         if not missing:
             # Change any *_id column to its str column
             for key, value in viewitems(cls.translate_cols_dict):
-                handler = cls.id_cols_handlers[key]
-                md_template[key] = pd.Series(
-                    [handler[i] for i in md_template[value]],
-                    index=md_template.index)
+                md_template[key] = md_template[value].map(
+                    cls.id_cols_handlers[key])
                 del md_template[value]
 
         return missing.union(
             cls._check_template_special_columns(md_template, obj))
 
+    @classmethod
+    def _validate_template(cls, md_template, obj, conn_handler=None):
+        r"""Validates and cleans md_template in place, collecting all the
+        problems found
+
+        Parameters
+        ----------
+        md_template : DataFrame
+            The metadata template file contents indexed by sample ids
+        obj : int or str
+            The object passed to `_check_template_special_columns`: the study
+            id for a SampleTemplate and the data type for a PrepTemplate
+        conn_handler : SQLConnectionHandler, optional
+            The connection handler object connected to the DB
+
+        Returns
+        -------
+        TemplateValidationReport
+            The problems found
+
+        Notes
+        -----
+        The column names are lowercased, the values of the boolean and float
+        required columns are cast to their type and the *_id columns are
+        translated to their ids. Each check runs over whole columns, so all
+        the problems are found in a single pass.
+        """
+        report = TemplateValidationReport(cls._table_prefix.rstrip('_'))
+
+        # Check the sample names
+        sample_names = pd.Series(md_template.index, index=md_template.index)
+        report.invalid_sample_names = get_invalid_sample_names(sample_names)
+        report.duplicated_sample_names = sorted(
+            set(sample_names[sample_names.duplicated()]))
+
+        # In the database, all the column headers are lowercase
+        md_template.columns = [c.lower() for c in md_template.columns]
+
+        # Check that we don't have duplicate columns. The rest of the checks
+        # need to access the columns by name
+        report.duplicated_columns = set(find_duplicates(md_template.columns))
+        if report.duplicated_columns:
+            return report
+
+        # Check that the values of the *_id columns are known
+        for key, value in viewitems(cls.translate_cols_dict):
+            if value in md_template:
+                invalid = ~md_template[value].isin(
+                    list(cls.id_cols_handlers[key]))
+                if invalid.any():
+                    report.invalid_values[value] = sorted(
+                        md_template.index[invalid.values])
+
+        # We need to check for some special columns, that are not present on
+        # the database, but depending on the data type are required.
+        missing = cls._check_special_columns(md_template, obj)
+
+        # Check that md_template has the required columns, and cast their
+        # values to the types of the columns
+        conn_handler = conn_handler if conn_handler else SQLConnectionHandler()
+        for column, column_type in get_table_cols_w_type(cls._table,
+                                                         conn_handler):
+            if column in ('sample_id', cls._id_column):
+                continue
+            if column not in md_template:
+                missing.add(column)
+                continue
+            values, invalid = _coerce_column(md_template[column],
+                                             column_type)
+            if invalid.any():
+                report.invalid_values[column] = sorted(
+                    md_template.index[invalid.values])
+            else:
+                md_template[column] = values
+
+        report.missing_columns = missing.difference(cls.translate_cols_dict)
+        return report
+
+    @classmethod
+    def validate(cls, md_template, obj):
+        r"""Validates md_template without modifying the database
+
+        Parameters
+        ----------
+        md_template : DataFrame
+            The metadata template file contents indexed by sample ids
+        obj : int or str
+            The study id for a SampleTemplate, the data type for a
+            PrepTemplate
+
+        Returns
+        -------
+        TemplateValidationReport
+            All the problems found in md_template, which is not modified
+        """
+        cls._check_subclass()
+        return cls._validate_template(deepcopy(md_template), obj)
+
     @classmethod
     def delete(cls, id_):
         r"""Deletes the table from the database
@@ -810,6 +1254,7 @@ class MetadataTemplate(QiitaObject):
             "DELETE FROM qiita.{0} where {1} = %s".format(cls._column_table,
                                                           cls._id_column),
             (id_,))
+        cls._forget(id_)
 
     @classmethod
     def exists(cls, obj_id):
@@ -838,14 +1283,39 @@ class MetadataTemplate(QiitaObject):
 
         Returns
         -------
-        set of str
+        frozenset of str
             The set of all available sample ids
+
+        Notes
+        -----
+        The set is cached on the object, so the container methods of the
+        template don't query the database each time. The methods that add or
+        remove samples from the template must discard it with
+        `_invalidate_sample_ids`
         """
-        sample_ids = conn_handler.execute_fetchall(
-            "SELECT sample_id FROM qiita.{0} WHERE "
-            "{1}=%s".format(self._table, self._id_column),
-            (self._id, ))
-        return set(sample_id[0] for sample_id in sample_ids)
+        if self._sample_ids is None:
+            sample_ids = conn_handler.execute_fetchall(
+                "SELECT sample_id FROM qiita.{0} WHERE "
+                "{1}=%s".format(self._table, self._id_column),
+                (self._id, ))
+            self._sample_ids = frozenset(sample_id[0]
+                                         for sample_id in sample_ids)
+        return self._sample_ids
+
+    def _invalidate_sample_ids(self):
+        r"""Discards the cached sample ids, so they are loaded again on next
+        use"""
+        self._sample_ids = None
+
+    @classmethod
+    def _forget(cls, id_):
+        r"""Removes the template `id_` from the active identity map, if any,
+        discarding the samples cached on it"""
+        md_template = super(MetadataTemplate, cls)._forget(id_)
+        if md_template is not None:
+            md_template._invalidate_sample_ids()
+            md_template._invalidate_sample_rows()
+        return md_template
 
     def __len__(self):
         r"""Returns the number of samples in the metadata template
@@ -881,7 +1351,7 @@ class MetadataTemplate(QiitaObject):
         get
         """
         if key in self:
-            return self._sample_cls(key, self)
+            return self._sample_cls._from_template(key, self)
         else:
             raise KeyError("Sample id %s does not exists in template %d"
                            % (key, self._id))
@@ -936,9 +1406,15 @@ class MetadataTemplate(QiitaObject):
         bool
             True if the sample id `key` is in the metadata template, false
             otherwise
+
+        Notes
+        -----
+        If the sample ids of the template have not been loaded, only the
+        sample `key` is looked up in the database
         """
-        conn_handler = SQLConnectionHandler()
-        return key in self._get_sample_ids(conn_handler)
+        if self._sample_ids is None:
+            return self._sample_cls.exists(key, self)
+        return key in self._sample_ids
 
     def keys(self):
         r"""Iterator over the sorted sample ids
@@ -963,7 +1439,7 @@ class MetadataTemplate(QiitaObject):
             Iterator over Sample obj
         """
         conn_handler = SQLConnectionHandler()
-        return iter(self._sample_cls(sample_id, self)
+        return iter(self._sample_cls._from_template(sample_id, self)
                     for sample_id in self._get_sample_ids(conn_handler))
 
     def items(self):
@@ -975,7 +1451,8 @@ class MetadataTemplate(QiitaObject):
             Iterator over (sample_ids, values) tuples
         """
         conn_handler = SQLConnectionHandler()
-        return iter((sample_id, self._sample_cls(sample_id, self))
+        return iter((sample_id,
+                     self._sample_cls._from_template(sample_id, self))
                     for sample_id in self._get_sample_ids(conn_handler))
 
     def get(self, key):
@@ -1002,33 +1479,7 @@ class MetadataTemplate(QiitaObject):
         except KeyError:
             return None
 
-    def _transform_to_dict(self, values):
-        r"""Transforms `values` to a dict keyed by sample id
-
-        Parameters
-        ----------
-        values : object
-            The object returned from a execute_fetchall call
-
-        Returns
-        -------
-        dict
-        """
-        result = {}
-        for row in values:
-            # Transform the row to a dictionary
-            values_dict = dict(row)
-            # Get the sample id of this row
-            sid = values_dict['sample_id']
-            del values_dict['sample_id']
-            # Remove _id_column from this row (if present)
-            if self._id_column in values_dict:
-                del values_dict[self._id_column]
-            result[sid] = values_dict
-
-        return result
-
-    def to_file(self, fp, samples=None):
+    def to_file(self, fp, samples=None, compress=False):
         r"""Writes the MetadataTemplate to the file `fp` in tab-delimited
         format
 
@@ -1039,39 +1490,235 @@ class MetadataTemplate(QiitaObject):
         samples : set, optional
             If supplied, only the specified samples will be written to the
             file
+        compress : bool, optional
+            If True, the file is gzip compressed. Default: False
+
+        Notes
+        -----
+        The metadata is read with a single query over the required and the
+        dynamic tables, ordered by sample id, and each row is written as soon
+        as it is fetched from the server, so the memory used does not depend
+        on the size of the template.
         """
         conn_handler = SQLConnectionHandler()
-        metadata_map = self._transform_to_dict(conn_handler.execute_fetchall(
-            "SELECT * FROM qiita.{0} WHERE {1}=%s".format(self._table,
-                                                          self._id_column),
-            (self.id,)))
-        dyn_vals = self._transform_to_dict(conn_handler.execute_fetchall(
-            "SELECT * FROM qiita.{0}".format(self._table_name(self.id))))
-
-        for k in metadata_map:
-            for key, value in viewitems(self.translate_cols_dict):
-                id_ = metadata_map[k][key]
-                metadata_map[k][value] = self.str_cols_handlers[key][id_]
-                del metadata_map[k][key]
-            metadata_map[k].update(dyn_vals[k])
-            metadata_map[k].pop('study_id', None)
-
-        # Remove samples that are not in the samples list, if it was supplied
-        if samples is not None:
-            for sid, d in metadata_map.items():
-                if sid not in samples:
-                    metadata_map.pop(sid)
-
-        # Write remaining samples to file
-        headers = sorted(list(metadata_map.values())[0].keys())
-        with open(fp, 'w') as f:
+        headers, _, rows = self._fetch_sample_rows(
+            conn_handler, samples, stream=True, sort_columns=True)
+        with (gzopen if compress else open)(fp, 'w') as f:
             # First write the headers
             f.write("sample_name\t%s\n" % '\t'.join(headers))
             # Write the values for each sample id
-            for sid, d in sorted(metadata_map.items()):
-                values = [str(d[h]) for h in headers]
-                values.insert(0, sid)
-                f.write("%s\n" % '\t'.join(values))
+            for row in rows:
+                f.write("%s\n" % '\t'.join(str(v) for v in row))
+
+    def to_dataframe(self, samples=None, columns=None):
+        r"""Returns the metadata of the template as a DataFrame
+
+        The table with the required columns and the dynamic table are joined
+        in a single query and the *_id columns are translated to their string
+        values in bulk
+
+        Parameters
+        ----------
+        samples : iterable of str, optional
+            If supplied, only the specified samples are returned. Samples not
+            present in the template are ignored
+        columns : iterable of str, optional
+            If supplied, only the specified metadata categories are returned,
+            in the given order
+
+        Returns
+        -------
+        pandas.DataFrame
+            The metadata indexed by sample id, with one column per metadata
+            category. The timestamp columns are converted to datetime64 and
+            the dtype of the rest is inferred from their values
+
+        Raises
+        ------
+        QiitaDBColumnError
+            If any of `columns` is not a metadata category of the template
+        """
+        conn_handler = SQLConnectionHandler()
+        columns, datetime_cats, rows = self._fetch_sample_rows(
+            conn_handler, samples, columns)
+        df = pd.DataFrame([list(row[1:]) for row in rows],
+                          index=[row[0] for row in rows], columns=columns)
+        for category in datetime_cats.intersection(df):
+            df[category] = pd.to_datetime(df[category])
+        return df
+
+    def _metadata_sources(self, conn_handler):
+        r"""Returns the table and the column that store each metadata category
+
+        Parameters
+        ----------
+        conn_handler : SQLConnectionHandler
+            The connection handler object connected to the DB
+
+        Returns
+        -------
+        list of str, dict of {str: (str, str)}, set of str
+            The metadata categories of the template, in table order, the alias
+            of the table ('r' for the table with the required columns and 'd'
+            for the dynamic table) and the column that store each of them, and
+            the categories holding dates or timestamps
+        """
+        dynamic_table = self._table_name(self.id)
+        internal_cols = {'sample_id', self._id_column, 'study_id'}
+
+        sources = {}
+        categories = []
+        datetime_cats = set()
+        for alias, table in (('r', self._table), ('d', dynamic_table)):
+            for col, dtype in get_table_cols_w_type(table, conn_handler):
+                if col in internal_cols:
+                    continue
+                category = self.translate_cols_dict.get(col, col)
+                sources[category] = (alias, col)
+                categories.append(category)
+                if dtype.startswith('timestamp') or dtype == 'date':
+                    datetime_cats.add(category)
+        return categories, sources, datetime_cats
+
+    def _fetch_sample_rows(self, conn_handler, samples=None, columns=None,
+                           stream=False, sort_columns=False):
+        r"""Fetches the metadata of the samples in a single query
+
+        Parameters
+        ----------
+        conn_handler : SQLConnectionHandler
+            The connection handler object connected to the DB
+        samples : iterable of str, optional
+            If supplied, only the specified samples are fetched
+        columns : iterable of str, optional
+            If supplied, only the specified metadata categories are fetched,
+            in the given order
+        stream : bool, optional
+            If True, the rows are fetched from the server in batches with a
+            server-side cursor while they are iterated, instead of all at
+            once. Default: False
+        sort_columns : bool, optional
+            If True and `columns` is not supplied, the metadata categories are
+            fetched in alphabetical order instead of in table order. Default:
+            False
+
+        Returns
+        -------
+        list of str, set of str, list or generator of tuple
+            The metadata categories fetched, the ones holding dates or
+            timestamps, and the rows of the form (sample_id, value, ...),
+            ordered by the codepoints of the sample ids and with the *_id
+            columns translated to their string values
+
+        Raises
+        ------
+        QiitaDBColumnError
+            If any of `columns` is not a metadata category of the template
+
+        See Also
+        --------
+        qiita_db.sql_connection.SQLConnectionHandler.execute_iter
+        """
+        categories, sources, datetime_cats = self._metadata_sources(
+            conn_handler)
+        if columns is None:
+            columns = sorted(categories) if sort_columns else categories
+        else:
+            columns = [c.lower() for c in columns]
+            missing = set(columns).difference(sources)
+            if missing:
+                raise QiitaDBColumnError(
+                    "Columns %s do not exist in template %d"
+                    % (', '.join(sorted(missing)), self.id))
+
+        sql = ("SELECT r.sample_id{0} FROM qiita.{1} r JOIN qiita.{2} d "
+               "USING (sample_id) WHERE r.{3} = %s".format(
+                   ''.join(', %s.%s' % sources[c] for c in columns),
+                   self._table, self._table_name(self.id), self._id_column))
+        sql_args = [self.id]
+        if samples is not None:
+            sql += " AND r.sample_id = ANY(%s)"
+            sql_args.append(list(samples))
+        # sorted by codepoint, so the rows are in the same order whatever the
+        # locale of the server
+        sql += ' ORDER BY r.sample_id COLLATE "C"'
+
+        # Positions of the *_id columns, with the lookup used to translate them
+        handlers = [(i, self.str_cols_handlers[sources[c][1]])
+                    for i, c in enumerate(columns, 1)
+                    if sources[c][1] in self.translate_cols_dict]
+
+        def translate(row):
+            row = list(row)
+            for i, handler in handlers:
+                row[i] = handler[row[i]]
+            return tuple(row)
+
+        if stream:
+            rows = (translate(row) for row in conn_handler.execute_iter(
+                sql, sql_args, row_factory='tuple'))
+        else:
+            rows = [translate(row)
+                    for row in conn_handler.execute_fetchall(sql, sql_args)]
+        return columns, datetime_cats, rows
+
+    def _get_sample_row(self, sample_id):
+        r"""Returns the metadata of a sample from the row buffer of the
+        template
+
+        Parameters
+        ----------
+        sample_id : str
+            The sample id
+
+        Returns
+        -------
+        dict of {str: object} or None
+            The metadata of the sample of the form {category: value}, or None
+            if the sample is not present in the template
+
+        Notes
+        -----
+        The first time it is called, the rows of all the samples are loaded
+        with a single query, joining the required and the dynamic tables, so
+        iterating over the samples of the template does not query the
+        database for each of them. The rows discarded by
+        `_invalidate_sample_rows` are loaded again individually
+        """
+        if self._sample_rows is None:
+            self._load_sample_rows()
+        elif sample_id not in self._sample_rows:
+            self._load_sample_rows([sample_id])
+        return self._sample_rows.get(sample_id)
+
+    def _load_sample_rows(self, samples=None):
+        r"""Loads the rows of `samples` (default: all of them) in the buffer"""
+        categories, _, rows = self._fetch_sample_rows(SQLConnectionHandler(),
+                                                      samples)
+        if samples is None or self._sample_rows is None:
+            self._sample_rows = {}
+        for row in rows:
+            self._sample_rows[row[0]] = dict(zip(categories, row[1:]))
+
+    def _invalidate_sample_rows(self, samples=None):
+        r"""Discards rows of the buffer, so they are loaded again on next use
+
+        Parameters
+        ----------
+        samples : iterable of str, optional
+            The samples whose rows are discarded. Default: all of them, which
+            is needed when the metadata categories of the template change
+
+        Notes
+        -----
+        The methods that modify the metadata of the template or of its
+        samples must call it
+        """
+        if samples is None or self._sample_rows is None:
+            self._sample_rows = None
+        else:
+            for sample_id in samples:
+                self._sample_rows.pop(sample_id, None)
 
     def add_filepath(self, filepath, conn_handler=None):
         r"""Populates the DB tables for storing the filepath and connects the
@@ -1237,51 +1884,16 @@ class SampleTemplate(MetadataTemplate):
         md_template : DataFrame
             Cleaned copy of the input md_template
         """
-        invalid_ids = get_invalid_sample_names(md_template.index)
-        if invalid_ids:
-            raise QiitaDBColumnError("The following sample names in the sample"
-                                     " template contain invalid characters "
-                                     "(only alphanumeric characters or periods"
-                                     " are allowed): %s." %
-                                     ", ".join(invalid_ids))
         # We are going to modify the md_template. We create a copy so
         # we don't modify the user one
         md_template = deepcopy(md_template)
 
+        report = cls._validate_template(md_template, study_id, conn_handler)
+        report.raise_errors()
+
         # Prefix the sample names with the study_id
         _prefix_sample_names_with_id(md_template, study_id)
 
-        # In the database, all the column headers are lowercase
-        md_template.columns = [c.lower() for c in md_template.columns]
-
-        # Check that we don't have duplicate columns
-        if len(set(md_template.columns)) != len(md_template.columns):
-            raise QiitaDBDuplicateHeaderError(
-                find_duplicates(md_template.columns))
-
-        # We need to check for some special columns, that are not present on
-        # the database, but depending on the data type are required.
-        missing = cls._check_special_columns(md_template, study_id)
-
-        conn_handler = conn_handler if conn_handler else SQLConnectionHandler()
-
-        # Get the required columns from the DB
-        db_cols = get_table_cols(cls._table, conn_handler)
-
-        # Remove the sample_id and study_id columns
-        db_cols.remove('sample_id')
-        db_cols.remove(cls._id_column)
-
-        # Retrieve the headers of the metadata template
-        headers = list(md_template.keys())
-
-        # Check that md_template has the required columns
-        remaining = set(db_cols).difference(headers)
-        missing = missing.union(remaining)
-        missing = missing.difference(cls.translate_cols_dict)
-        if missing:
-            raise QiitaDBColumnError("Missing columns: %s"
-                                     % ', '.join(missing))
         return md_template
 
     @classmethod
@@ -1324,14 +1936,9 @@ class SampleTemplate(MetadataTemplate):
         values = _as_python_types(md_template, db_cols)
         values.insert(0, sample_ids)
         values.insert(0, [study.id] * num_samples)
-        values = [v for v in zip(*values)]
-        conn_handler.add_to_queue(
-            queue_name,
-            "INSERT INTO qiita.{0} ({1}, sample_id, {2}) "
-            "VALUES (%s, %s, {3})".format(cls._table, cls._id_column,
-                                          ', '.join(db_cols),
-                                          ', '.join(['%s'] * len(db_cols))),
-            values, many=True)
+        conn_handler.copy_rows(
+            "qiita.%s" % cls._table, [cls._id_column, 'sample_id'] + db_cols,
+            zip(*values), queue=queue_name)
 
         # Insert rows on *_columns table
         headers = list(set(headers).difference(db_cols))
@@ -1360,24 +1967,16 @@ class SampleTemplate(MetadataTemplate):
         # Insert values on custom table
         values = _as_python_types(md_template, headers)
         values.insert(0, sample_ids)
-        values = [v for v in zip(*values)]
-        conn_handler.add_to_queue(
-            queue_name,
-            "INSERT INTO qiita.{0} (sample_id, {1}) "
-            "VALUES (%s, {2})".format(table_name, ", ".join(headers),
-                                      ', '.join(["%s"] * len(headers))),
-            values, many=True)
+        conn_handler.copy_rows(
+            "qiita.%s" % table_name, ['sample_id'] + headers, zip(*values),
+            queue=queue_name)
         conn_handler.execute_queue(queue_name)
 
-        # figuring out the filepath of the backup
-        _id, fp = get_mountpoint('templates')[0]
-        fp = join(fp, '%d_%s.txt' % (study.id, strftime("%Y%m%d-%H%M%S")))
-        # storing the backup
         st = cls(study.id)
-        st.to_file(fp)
+        st._index_metadata(conn_handler)
 
-        # adding the fp to the object
-        st.add_filepath(fp)
+        # storing the backup
+        st._backup()
 
         return st
 
@@ -1409,9 +2008,7 @@ class SampleTemplate(MetadataTemplate):
 
         # Raise warning and filter out existing samples
         sample_ids = md_template.index.tolist()
-        sql = ("SELECT sample_id FROM qiita.required_sample_info WHERE "
-               "study_id = %d" % self.id)
-        curr_samples = set(s[0] for s in conn_handler.execute_fetchall(sql))
+        curr_samples = self._get_sample_ids(conn_handler)
         existing_samples = curr_samples.intersection(sample_ids)
         if existing_samples:
             warnings.warn(
@@ -1435,14 +2032,9 @@ class SampleTemplate(MetadataTemplate):
         values = _as_python_types(md_template, db_cols)
         values.insert(0, sample_ids)
         values.insert(0, [self.study_id] * num_samples)
-        values = [v for v in zip(*values)]
-        conn_handler.add_to_queue(
-            queue_name,
-            "INSERT INTO qiita.{0} ({1}, sample_id, {2}) "
-            "VALUES (%s, %s, {3})".format(self._table, self._id_column,
-                                          ', '.join(db_cols),
-                                          ', '.join(['%s'] * len(db_cols))),
-            values, many=True)
+        conn_handler.copy_rows(
+            "qiita.%s" % self._table, [self._id_column, 'sample_id'] + db_cols,
+            zip(*values), queue=queue_name)
 
         # Add missing columns to the sample template dynamic table
         headers = list(set(headers).difference(db_cols))
@@ -1468,23 +2060,197 @@ class SampleTemplate(MetadataTemplate):
         # Insert values on custom table
         values = _as_python_types(md_template, headers)
         values.insert(0, sample_ids)
-        values = [v for v in zip(*values)]
-        conn_handler.add_to_queue(
-            queue_name,
-            "INSERT INTO qiita.{0} (sample_id, {1}) "
-            "VALUES (%s, {2})".format(table_name, ", ".join(headers),
-                                      ', '.join(["%s"] * len(headers))),
-            values, many=True)
+        conn_handler.copy_rows(
+            "qiita.%s" % table_name, ['sample_id'] + headers, zip(*values),
+            queue=queue_name)
         conn_handler.execute_queue(queue_name)
+        self._invalidate_sample_ids()
+        self._invalidate_sample_rows()
+        self._index_metadata(conn_handler, samples=sample_ids)
 
-        # figuring out the filepath of the backup
-        _id, fp = get_mountpoint('templates')[0]
-        fp = join(fp, '%d_%s.txt' % (self.id, strftime("%Y%m%d-%H%M%S")))
         # storing the backup
+        self._backup()
+
+    def _backup(self):
+        r"""Stores a backup of the template under the templates mountpoint
+
+        Returns
+        -------
+        str or None
+            The filepath of the backup, or None if the template has not
+            changed since the last backup
+
+        Notes
+        -----
+        No backup is stored if the template is identical to the last one, as
+        told by the SHA-1 of their contents. The new backup is always stored
+        in full, as it is the one listed and served to the users, and the
+        previous one is then stored as a gzip compressed delta against the
+        last backup stored in full before it (the snapshot), up to
+        `_MAX_BACKUP_DELTAS` consecutive deltas, unless the delta is not
+        smaller than the template. Use `read_template_backup` to read them.
+        """
+        conn_handler = SQLConnectionHandler()
+        _, base_fp = get_mountpoint('templates', conn_handler)[0]
+        name = join(base_fp, '%d_%s' % (self.id, strftime("%Y%m%d-%H%M%S")))
+        # more than one backup can be stored in the same second
+        suffix = 0
+        fp = name
+        while exists(fp + '.txt') or exists(fp + _DELTA_SUFFIX):
+            suffix += 1
+            fp = '%s_%d' % (name, suffix)
+        fp += '.txt'
+
         self.to_file(fp)
+        with open(fp, 'U') as f:
+            digest = sha1(f.read()).hexdigest()
 
-        # adding the fp to the object
-        self.add_filepath(fp)
+        # newest first
+        backups = self.get_filepaths(conn_handler)
+        if backups and _backup_digest(backups[0][1]) == digest:
+            remove(fp)
+            return None
+
+        with transaction():
+            self.add_filepath(fp, conn_handler)
+            compacted_fp = (self._compact_backup(conn_handler, backups)
+                            if backups else None)
+        if compacted_fp is not None:
+            remove(compacted_fp)
+        return fp
+
+    def _compact_backup(self, conn_handler, backups):
+        r"""Stores the newest of `backups` as a delta against its snapshot
+
+        Parameters
+        ----------
+        conn_handler : SQLConnectionHandler
+            The connection handler object connected to the DB
+        backups : list of (int, str)
+            The filepath ids and filepaths of the backups, newest first
+
+        Returns
+        -------
+        str or None
+            The filepath of the full backup replaced by the delta, to be
+            removed once the transaction is committed, or None if the backup
+            is kept in full
+        """
+        fp_id, fp = backups[0]
+        older = [bfp for _, bfp in backups[1:]]
+        deltas = list(takewhile(lambda bfp: bfp.endswith(_DELTA_SUFFIX),
+                                older))
+        if (fp.endswith(_DELTA_SUFFIX) or
+                len(deltas) >= min(len(older), _MAX_BACKUP_DELTAS) or
+                not exists(older[len(deltas)])):
+            # fp is kept in full as the snapshot of the next backups
+            return None
+
+        snapshot_fp = older[len(deltas)]
+        with open(snapshot_fp, 'U') as f:
+            snapshot_lines = f.readlines()
+        with open(fp, 'U') as f:
+            contents = f.read()
+        digest = sha1(contents).hexdigest()
+        delta_fp = fp[:-len('.txt')] + _DELTA_SUFFIX
+        with gzopen(delta_fp, 'w') as f:
+            f.write('%s\t%s\t%s\n' % (_DELTA_HEADER, digest,
+                                      basename(snapshot_fp)))
+            f.writelines(_template_delta(snapshot_lines,
+                                         contents.splitlines(True)))
+        if getsize(delta_fp) >= getsize(fp):
+            remove(delta_fp)
+            return None
+
+        conn_handler.execute(
+            "UPDATE qiita.filepath SET filepath = %s, checksum = %s "
+            "WHERE filepath_id = %s",
+            (basename(delta_fp), compute_checksum(delta_fp), fp_id))
+        return fp
+
+    @classmethod
+    def delete(cls, id_):
+        r"""Deletes the sample template and its sample metadata index entries
+
+        Parameters
+        ----------
+        id_ : int
+            The study id of the sample template
+
+        Raises
+        ------
+        QiitaDBUnknownIDError
+            If no sample template exists for the study id_
+        """
+        conn_handler = SQLConnectionHandler()
+        with transaction():
+            conn_handler.execute(
+                "DELETE FROM qiita.sample_metadata_index WHERE study_id = %s",
+                (id_, ))
+            super(SampleTemplate, cls).delete(id_)
+
+    def _index_metadata(self, conn_handler, samples=None, columns=None):
+        r"""Refreshes the entries of the template in the sample metadata index
+
+        Parameters
+        ----------
+        conn_handler : SQLConnectionHandler
+            The connection handler object connected to the DB
+        samples : list of str, optional
+            The samples to refresh. Default: all the samples of the template
+        columns : list of str, optional
+            The columns of the study-specific table to refresh. Default: all
+            of them
+
+        Notes
+        -----
+        The entries are deleted and inserted again from the study-specific
+        table in a single transaction, so the index holds the values as they
+        are stored in the DB. The columns that are not in the table anymore
+        are only deleted, and the NULL values are not indexed.
+        """
+        table_name = self._table_name(self.study_id)
+        sample_filter = ""
+        sample_args = []
+        if samples is not None:
+            sample_filter = " AND sample_id = ANY(%s)"
+            sample_args = [list(samples)]
+
+        table_cols = [(col, col_type) for col, col_type in
+                      get_table_cols_w_type(table_name, conn_handler)
+                      if col != 'sample_id']
+        column_filter = ""
+        column_args = []
+        if columns is not None:
+            columns = {c.lower() for c in columns}
+            table_cols = [c for c in table_cols if c[0] in columns]
+            column_filter = " AND column_name = ANY(%s)"
+            column_args = [list(columns)]
+
+        with transaction():
+            conn_handler.execute(
+                "DELETE FROM qiita.sample_metadata_index WHERE study_id = %s"
+                "{0}{1}".format(sample_filter, column_filter),
+                [self.study_id] + sample_args + column_args)
+            if not table_cols:
+                return
+            # unpivot the columns of the table, one row per non-null value
+            values = ', '.join(
+                "(%s, s.{0}::varchar, {1})".format(
+                    col, "s.%s::float8" % col if col_type in _NUMERIC_TYPES
+                    else "NULL::float8")
+                for col, col_type in table_cols)
+            conn_handler.execute(
+                "INSERT INTO qiita.sample_metadata_index (study_id, "
+                "sample_id, column_name, value_varchar, value_float) "
+                "SELECT %s, s.sample_id, v.column_name, v.value_varchar, "
+                "v.value_float FROM qiita.{0} s, LATERAL (VALUES {1}) AS v "
+                "(column_name, value_varchar, value_float) "
+                "WHERE v.value_varchar IS NOT NULL{2}".format(
+                    table_name, values, sample_filter.replace(
+                        'sample_id', 's.sample_id')),
+                [self.study_id] + [col for col, _ in table_cols] +
+                sample_args)
 
     def update(self, md_template):
         r"""Update values in the sample template
@@ -1494,6 +2260,11 @@ class SampleTemplate(MetadataTemplate):
         md_template : DataFrame
             The metadata template file contents indexed by samples Ids
 
+        Returns
+        -------
+        TemplateChangeset
+            The cells of the template changed by md_template
+
         Raises
         ------
         QiitaDBError
@@ -1505,66 +2276,47 @@ class SampleTemplate(MetadataTemplate):
         # Clean and validate the metadata template given
         new_map = self._clean_validate_template(md_template, self.id,
                                                 conn_handler)
-        # Retrieving current metadata
-        current_map = self._transform_to_dict(conn_handler.execute_fetchall(
-            "SELECT * FROM qiita.{0} WHERE {1}=%s".format(self._table,
-                                                          self._id_column),
-            (self.id,)))
-        dyn_vals = self._transform_to_dict(conn_handler.execute_fetchall(
-            "SELECT * FROM qiita.{0}".format(self._table_name(self.id))))
-
-        for k in current_map:
-            current_map[k].update(dyn_vals[k])
-            current_map[k].pop('study_id', None)
-
-        # converting sql results to dataframe
-        current_map = pd.DataFrame.from_dict(current_map, orient='index')
+        # Retrieving current metadata, with the *_id columns holding the ids
+        # as in new_map
+        current_map = self.to_dataframe()
+        for key, value in viewitems(self.translate_cols_dict):
+            current_map[key] = current_map.pop(value).map(
+                self.id_cols_handlers[key])
 
         # simple validations of sample ids and column names
-        samples_diff = set(
-            new_map.index.tolist()) - set(current_map.index.tolist())
+        samples_diff = set(new_map.index).difference(current_map.index)
         if samples_diff:
             raise QiitaDBError('The new sample template differs from what is '
                                'stored in database by these samples names: %s'
                                % ', '.join(samples_diff))
-        columns_diff = set(new_map.columns) - set(current_map.columns)
+        columns_diff = set(new_map.columns).difference(current_map.columns)
         if columns_diff:
             raise QiitaDBError('The new sample template differs from what is '
                                'stored in database by these columns names: %s'
                                % ', '.join(columns_diff))
 
-        # here we are comparing two dataframes following:
-        # http://stackoverflow.com/a/17095620/4228285
-        current_map.sort(axis=0, inplace=True)
-        current_map.sort(axis=1, inplace=True)
-        new_map.sort(axis=0, inplace=True)
-        new_map.sort(axis=1, inplace=True)
-        map_diff = (current_map != new_map).stack()
-        map_diff = map_diff[map_diff]
-        map_diff.index.names = ['id', 'column']
-        changed_cols = map_diff.index.get_level_values('column').unique()
+        # The cells that are not in the new template are left untouched, so
+        # only the changed cells are applied
+        changes = template_changeset(current_map, new_map)
+        with transaction():
+            for category, values in viewitems(changes.changed_by_category()):
+                self.update_category(category, values)
 
-        for col in changed_cols:
-            self.update_category(col, new_map[col].to_dict())
-
-        # figuring out the filepath of the backup
-        _id, fp = get_mountpoint('templates')[0]
-        fp = join(fp, '%d_%s.txt' % (self.id, strftime("%Y%m%d-%H%M%S")))
         # storing the backup
-        self.to_file(fp)
-
-        # adding the fp to the object
-        self.add_filepath(fp)
+        self._backup()
 
-        # generating all new QIIME mapping files
+        # generating the QIIME mapping files that include any of the changed
+        # samples, as they hold all the sample template columns
+        changed_samples = {sample_id for sample_id, _ in changes.changed}
+        if not changed_samples:
+            return changes
         for rd_id in Study(self.id).raw_data():
             for pt_id in RawData(rd_id).prep_templates:
                 pt = PrepTemplate(pt_id)
-                for _, fp in pt.get_filepaths():
-                    # the difference between a prep and a qiime template is the
-                    # word qiime within the name of the file
-                    if '_qiime_' not in basename(fp):
-                        pt.create_qiime_mapping_file(fp)
+                if not changed_samples.isdisjoint(pt.keys()):
+                    pt.create_qiime_mapping_file()
+
+        return changes
 
     def remove_category(self, category):
         """Remove a category from the sample template
@@ -1588,9 +2340,15 @@ class SampleTemplate(MetadataTemplate):
 
         # This operation may invalidate another user's perspective on the
         # table
-        conn_handler.execute("""
-            ALTER TABLE qiita.{0} DROP COLUMN {1}""".format(table_name,
-                                                            category))
+        try:
+            with transaction():
+                conn_handler.execute("""
+                    ALTER TABLE qiita.{0} DROP COLUMN {1}""".format(
+                    table_name, category))
+                self._index_metadata(conn_handler, columns=[category])
+        finally:
+            # The column is kept if its index entries can't be removed
+            self._invalidate_sample_rows()
 
     def update_category(self, category, samples_and_values):
         """Update an existing column
@@ -1607,17 +2365,83 @@ class SampleTemplate(MetadataTemplate):
         QiitaDBUnknownIDError
             If a sample_id is included in values that is not in the template
         QiitaDBColumnError
-            If the column does not exist in the table. This is implicit, and
-            can be thrown by the contained Samples.
+            If the column does not exist in the table
+        ValueError
+            If any of the values can't be stored in the column because of its
+            type
+
+        Notes
+        -----
+        The whole column is updated with a single UPDATE ... FROM (VALUES ...)
+        statement, so either all the samples are updated or none is.
         """
-        if not set(self.keys()).issuperset(samples_and_values):
-            missing = set(self.keys()) - set(samples_and_values)
-            table_name = self._table_name(self.study_id)
+        table_name = self._table_name(self.study_id)
+        conn_handler = SQLConnectionHandler()
+
+        missing = set(samples_and_values).difference(
+            self._get_sample_ids(conn_handler))
+        if missing:
             raise QiitaDBUnknownIDError(missing, table_name)
 
-        for k, v in viewitems(samples_and_values):
-            sample = self[k]
-            sample[category] = v
+        # Find the table that stores the column: the dynamic table or the
+        # table with the required columns
+        dynamic_cols = dict(get_table_cols_w_type(table_name, conn_handler))
+        required_cols = dict(get_table_cols_w_type(self._table, conn_handler))
+        if category in dynamic_cols:
+            table = table_name
+            column_type = dynamic_cols[category]
+            where = ""
+            sql_args = []
+        elif (category in required_cols and
+                category not in ('sample_id', self._id_column)):
+            table = self._table
+            column_type = required_cols[category]
+            where = " AND t.{0} = %s".format(self._id_column)
+            sql_args = [self.id]
+        else:
+            raise QiitaDBColumnError("Column %s does not exist in %s" %
+                                     (category, table_name))
+
+        if not samples_and_values:
+            return
+
+        # Each value is cast to the type of the column, so the VALUES list has
+        # a single type and the values are converted as in an assignment
+        # (e.g. the floats pandas produces for an integer column with missing
+        # values are stored as integers)
+        values = []
+        for sample_id, value in viewitems(samples_and_values):
+            values.extend((sample_id, _as_python_value(value)))
+        sql = ("UPDATE qiita.{0} AS t SET {1} = v.value "
+               "FROM (VALUES {2}) AS v (sample_id, value) "
+               "WHERE t.sample_id = v.sample_id{3}".format(
+                   table, category,
+                   ', '.join(['(%s, %s::{0})'.format(column_type)] *
+                             len(samples_and_values)),
+                   where))
+
+        # The update runs in its own (nested) transaction, so the error can
+        # be handled even if this is part of a larger transaction
+        try:
+            with transaction():
+                conn_handler.execute(sql, values + sql_args)
+                if table == table_name:
+                    self._index_metadata(conn_handler,
+                                         samples=list(samples_and_values),
+                                         columns=[category])
+        except QiitaDBExecutionError as e:
+            if column_type in ('character varying', 'text'):
+                raise e
+            value_types = sorted({type(v).__name__
+                                  for v in viewvalues(samples_and_values)})
+            raise ValueError(
+                'The new values being added to column: "{0}" (types: "{1}") '
+                'can\'t be stored in a column of type "{2}" in the DB. Please '
+                'change the values in your updated template or reprocess your '
+                'sample template.'.format(category, ', '.join(value_types),
+                                          column_type))
+        finally:
+            self._invalidate_sample_rows(samples_and_values)
 
     def add_category(self, category, samples_and_values, dtype, default):
         """Add a metadata category
@@ -1645,13 +2469,20 @@ class SampleTemplate(MetadataTemplate):
         if category in self.categories():
             raise QiitaDBDuplicateError(category, "N/A")
 
-        conn_handler.execute("""
-            ALTER TABLE qiita.{0}
-            ADD COLUMN {1} {2}
-            NOT NULL DEFAULT '{3}'""".format(table_name, category, dtype,
-                                             default))
+        try:
+            with transaction():
+                conn_handler.execute("""
+                    ALTER TABLE qiita.{0}
+                    ADD COLUMN {1} {2}
+                    NOT NULL DEFAULT '{3}'""".format(table_name, category,
+                                                     dtype, default))
 
-        self.update_category(category, samples_and_values)
+                self.update_category(category, samples_and_values)
+                # the samples not in samples_and_values hold the default
+                self._index_metadata(conn_handler, columns=[category])
+        finally:
+            # The new column is rolled back if the update fails
+            self._invalidate_sample_rows()
 
 
 class PrepTemplate(MetadataTemplate):
@@ -1705,29 +2536,6 @@ class PrepTemplate(MetadataTemplate):
         if investigation_type is not None:
             cls.validate_investigation_type(investigation_type)
 
-        invalid_ids = get_invalid_sample_names(md_template.index)
-        if invalid_ids:
-            raise QiitaDBColumnError("The following sample names in the prep"
-                                     " template contain invalid characters "
-                                     "(only alphanumeric characters or periods"
-                                     " are allowed): %s." %
-                                     ", ".join(invalid_ids))
-
-        # We are going to modify the md_template. We create a copy so
-        # we don't modify the user one
-        md_template = deepcopy(md_template)
-
-        # Prefix the sample names with the study_id
-        _prefix_sample_names_with_id(md_template, study.id)
-
-        # In the database, all the column headers are lowercase
-        md_template.columns = [c.lower() for c in md_template.columns]
-
-        # Check that we don't have duplicate columns
-        if len(set(md_template.columns)) != len(md_template.columns):
-            raise QiitaDBDuplicateHeaderError(
-                find_duplicates(md_template.columns))
-
         # Get a connection handler
         conn_handler = SQLConnectionHandler()
         queue_name = "CREATE_PREP_TEMPLATE_%d" % raw_data.id
@@ -1742,9 +2550,16 @@ class PrepTemplate(MetadataTemplate):
             data_type_id = convert_to_id(data_type, "data_type", conn_handler)
             data_type_str = data_type
 
-        # We need to check for some special columns, that are not present on
-        # the database, but depending on the data type are required.
-        missing = cls._check_special_columns(md_template, data_type_str)
+        # We are going to modify the md_template. We create a copy so
+        # we don't modify the user one
+        md_template = deepcopy(md_template)
+
+        report = cls._validate_template(md_template, data_type_str,
+                                        conn_handler)
+        report.raise_errors()
+
+        # Prefix the sample names with the study_id
+        _prefix_sample_names_with_id(md_template, study.id)
 
         # Get some useful information from the metadata template
         sample_ids = md_template.index.tolist()
@@ -1760,14 +2575,6 @@ class PrepTemplate(MetadataTemplate):
         # Retrieve the headers of the metadata template
         headers = list(md_template.keys())
 
-        # Check that md_template has the required columns
-        remaining = set(db_cols).difference(headers)
-        missing = missing.union(remaining)
-        missing = missing.difference(cls.translate_cols_dict)
-        if missing:
-            raise QiitaDBColumnError("Missing columns: %s"
-                                     % ', '.join(missing))
-
         # Insert the metadata template
         # We need the prep_id for multiple calls below, which currently is not
         # supported by the queue system. Thus, executing this outside the queue
@@ -1781,14 +2588,9 @@ class PrepTemplate(MetadataTemplate):
         values = _as_python_types(md_template, db_cols)
         values.insert(0, sample_ids)
         values.insert(0, [prep_id] * num_samples)
-        values = [v for v in zip(*values)]
-        conn_handler.add_to_queue(
-            queue_name,
-            "INSERT INTO qiita.{0} ({1}, sample_id, {2}) "
-            "VALUES (%s, %s, {3})".format(
-                cls._table, cls._id_column, ', '.join(db_cols),
-                ', '.join(['%s'] * len(db_cols))),
-            values, many=True)
+        conn_handler.copy_rows(
+            "qiita.%s" % cls._table, [cls._id_column, 'sample_id'] + db_cols,
+            zip(*values), queue=queue_name)
 
         # Insert rows on *_columns table
         headers = list(set(headers).difference(db_cols))
@@ -1817,13 +2619,9 @@ class PrepTemplate(MetadataTemplate):
         # Insert values on custom table
         values = _as_python_types(md_template, headers)
         values.insert(0, sample_ids)
-        values = [v for v in zip(*values)]
-        conn_handler.add_to_queue(
-            queue_name,
-            "INSERT INTO qiita.{0} (sample_id, {1}) "
-            "VALUES (%s, {2})".format(table_name, ", ".join(headers),
-                                      ', '.join(["%s"] * len(headers))),
-            values, many=True)
+        conn_handler.copy_rows(
+            "qiita.%s" % table_name, ['sample_id'] + headers, zip(*values),
+            queue=queue_name)
 
         try:
             conn_handler.execute_queue(queue_name)
@@ -1861,7 +2659,7 @@ class PrepTemplate(MetadataTemplate):
         pt.add_filepath(fp)
 
         # creating QIIME mapping file
-        pt.create_qiime_mapping_file(fp)
+        pt.create_qiime_mapping_file()
 
         return pt
 
@@ -1977,6 +2775,7 @@ class PrepTemplate(MetadataTemplate):
         conn_handler.execute(
             "DELETE FROM qiita.prep_template where "
             "{0} = %s".format(cls._id_column), (id_,))
+        cls._forget(id_)
 
     def data_type(self, ret_id=False):
         """Returns the data_type or the data_type id
@@ -2104,24 +2903,34 @@ class PrepTemplate(MetadataTemplate):
             raise QiitaDBError("No studies found associated with prep "
                                "template ID %d" % self._id)
 
-    def create_qiime_mapping_file(self, prep_template_fp):
+    def create_qiime_mapping_file(self, prep_template_fp=None):
         """This creates the QIIME mapping file and links it in the db.
 
         Parameters
         ----------
-        prep_template_fp : str
-            The prep template filepath that should be concatenated to the
-            sample template go used to generate a new  QIIME mapping file
+        prep_template_fp : str, optional
+            Not used, the mapping file is generated from the metadata stored
+            in the database. Kept for backwards compatibility
 
         Returns
         -------
         filepath : str
-            The filepath of the created QIIME mapping file
+            The filepath of the created QIIME mapping file, or of the last one
+            if the mapping has not changed
 
         Raises
         ------
         ValueError
             If the prep template is not a subset of the sample template
+
+        Notes
+        -----
+        The prep and the sample metadata are read with a single query over
+        the tables with the required columns and the dynamic tables of both
+        templates, and the mapping file is written as the rows are fetched.
+        If the mapping is identical to the last one generated for the prep
+        template, as told by the SHA-1 of their contents, the new file is
+        discarded and the last one is returned.
         """
         rename_cols = {
             'barcode': 'BarcodeSequence',
@@ -2130,62 +2939,330 @@ class PrepTemplate(MetadataTemplate):
             'linkerprimersequence': 'LinkerPrimerSequence',
             'description': 'Description',
         }
-
-        # getting the latest sample template
-        _, sample_template_fp = SampleTemplate(
-            self.study_id).get_filepaths()[0]
-
-        # reading files via pandas
-        st = load_template_to_dataframe(sample_template_fp)
-        pt = load_template_to_dataframe(prep_template_fp)
-        st_sample_names = set(st.index)
-        pt_sample_names = set(pt.index)
-
-        if not pt_sample_names.issubset(st_sample_names):
-            raise ValueError(
-                "Prep template is not a sub set of the sample template, files:"
-                "%s %s - samples: %s" % (sample_template_fp, prep_template_fp,
-                                         str(pt_sample_names-st_sample_names)))
-
-        mapping = pt.join(st, lsuffix="_prep")
-        mapping.rename(columns=rename_cols, inplace=True)
+        conn_handler = SQLConnectionHandler()
+        st = SampleTemplate(self.study_id)
+
+        # The columns of both templates, the prep ones first, renaming the
+        # prep columns also present in the sample template
+        aliases = {'r': 'pr', 'd': 'pd'}
+        categories, sources, _ = self._metadata_sources(conn_handler)
+        st_categories, st_sources, _ = st._metadata_sources(conn_handler)
+        columns = []
+        selected = []
+        handlers = []
+        for template, cats, srcs, suffix in (
+                (self, sorted(categories), sources, '_prep'),
+                (st, sorted(st_categories), st_sources, '')):
+            for category in cats:
+                alias, col = srcs[category]
+                if suffix and category in st_sources:
+                    category += suffix
+                columns.append(rename_cols.get(category, category))
+                selected.append('%s.%s' % (aliases[alias], col))
+                if col in template.translate_cols_dict:
+                    handlers.append((len(selected) + 1,
+                                     template.str_cols_handlers[col]))
+            aliases = {'r': 'sr', 'd': 'sd'}
 
         # Gets the orginal mapping columns and readjust the order to comply
         # with QIIME requirements
-        cols = mapping.columns.values.tolist()
-        cols.remove('BarcodeSequence')
-        cols.remove('LinkerPrimerSequence')
-        cols.remove('Description')
         new_cols = ['BarcodeSequence', 'LinkerPrimerSequence']
-        new_cols.extend(cols)
+        new_cols.extend(c for c in columns if c not in
+                        ('BarcodeSequence', 'LinkerPrimerSequence',
+                         'Description'))
         new_cols.append('Description')
-        mapping = mapping[new_cols]
-
-        # figuring out the filepath for the QIIME map file
-        _id, fp = get_mountpoint('templates')[0]
-        filepath = join(fp, '%d_prep_%d_qiime_%s.txt' % (self.study_id,
-                        self.id, strftime("%Y%m%d-%H%M%S")))
+        # position of each column in the rows, after the sample ids of the
+        # prep and the sample template
+        order = [columns.index(c) + 2 for c in new_cols]
+
+        sql = ("SELECT pr.sample_id, sr.sample_id, {0} "
+               "FROM qiita.{1} pr JOIN qiita.{2} pd USING (sample_id) "
+               "LEFT JOIN qiita.{3} sr ON sr.sample_id = pr.sample_id "
+               "AND sr.{4} = %s "
+               "LEFT JOIN qiita.{5} sd ON sd.sample_id = pr.sample_id "
+               'WHERE pr.{6} = %s ORDER BY pr.sample_id COLLATE "C"'.format(
+                   ', '.join(selected), self._table,
+                   self._table_name(self.id), st._table, st._id_column,
+                   st._table_name(st.id), self._id_column))
+
+        # figuring out the filepath for the QIIME map file, more than one
+        # can be created in the same second
+        _id, fp = get_mountpoint('templates', conn_handler)[0]
+        name = join(fp, '%d_prep_%d_qiime_%s' % (self.study_id, self.id,
+                                                 strftime("%Y%m%d-%H%M%S")))
+        filepath = name + '.txt'
+        suffix = 0
+        while exists(filepath):
+            suffix += 1
+            filepath = '%s_%d.txt' % (name, suffix)
 
         # Save the mapping file
-        mapping.to_csv(filepath, index_label='#SampleID', na_rep='unknown',
-                       sep='\t')
+        digest = sha1()
+        missing = []
+        with open(filepath, 'w') as f:
+            line = '#SampleID\t%s\n' % '\t'.join(new_cols)
+            f.write(line)
+            digest.update(line)
+            for row in conn_handler.execute_iter(
+                    sql, [st.id, self.id], row_factory='tuple'):
+                if row[1] is None:
+                    missing.append(row[0])
+                    continue
+                row = list(row)
+                for i, handler in handlers:
+                    if row[i] is not None:
+                        row[i] = handler[row[i]]
+                line = '%s\t%s\n' % (row[0], '\t'.join(
+                    _mapping_value(row[i]) for i in order))
+                f.write(line)
+                digest.update(line)
+
+        if missing:
+            remove(filepath)
+            raise ValueError(
+                "Prep template is not a sub set of the sample template, "
+                "templates: %d %d - samples: %s"
+                % (self.id, st.id, ', '.join(missing)))
+
+        # The mapping files are only stored if they change
+        digest = digest.hexdigest()
+        last_fp = next((mfp for _, mfp in self.get_filepaths(conn_handler)
+                        if '_qiime_' in basename(mfp)), None)
+        if last_fp is not None and _mapping_digest(last_fp) == digest:
+            remove(filepath)
+            return last_fp
 
         # adding the fp to the object
-        self.add_filepath(filepath)
+        self.add_filepath(filepath, conn_handler)
+        _QIIME_MAPPING_DIGESTS[filepath] = (getmtime(filepath), digest)
 
         return filepath
 
 
-def load_template_to_dataframe(fn, strip_whitespace=True):
+# The modification time and the SHA-1 of the QIIME mapping files already
+# generated, keyed by filepath, so they are not read again to check if a new
+# mapping has changed
+_QIIME_MAPPING_DIGESTS = {}
+
+
+def _mapping_digest(fp):
+    r"""Returns the SHA-1 of the QIIME mapping file `fp`, or None if it does
+    not exist"""
+    if not exists(fp):
+        return None
+    mtime = getmtime(fp)
+    cached_mtime, digest = _QIIME_MAPPING_DIGESTS.get(fp, (None, None))
+    if cached_mtime != mtime:
+        with open(fp, 'U') as f:
+            digest = sha1(f.read()).hexdigest()
+        _QIIME_MAPPING_DIGESTS[fp] = (mtime, digest)
+    return digest
+
+
+def _mapping_value(value):
+    r"""Formats a metadata value for the QIIME mapping files, writing the
+    missing values as 'unknown'"""
+    if value is None:
+        return 'unknown'
+    if isinstance(value, float):
+        return 'unknown' if isnan(value) else repr(value)
+    return str(value)
+
+
+# Columns that are always loaded as str, so pandas doesn't infer their type
+_STR_COLUMNS = {'sample_name',
+                # required_sample_info
+                'physical_location', 'sample_type', 'host_subject_id',
+                'description',
+                # common_prep_info
+                'center_name', 'center_project_name'}
+_BOOL_COLUMNS = {'has_physical_specimen', 'has_extracted_data'}
+_BOOL_VALUES = {'True': True, 'TRUE': True, 'true': True,
+                'False': False, 'FALSE': False, 'false': False}
+_BOOL_VALUES_WITH_BOOLS = dict(_BOOL_VALUES)
+_BOOL_VALUES_WITH_BOOLS.update({True: True, False: False})
+_FLOAT_RE = r'^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$'
+_INVALID_SAMPLE_NAME_RE = r'[^%s]' % re.escape(letters + digits + '.')
+
+
+# Types of the columns of the study-specific sample tables that are also
+# indexed as numbers in the sample metadata index, see
+# SampleTemplate._index_metadata
+_NUMERIC_TYPES = {'smallint', 'integer', 'bigint', 'real', 'double precision',
+                  'numeric'}
+
+# Backups of the sample templates stored as deltas against a previous backup,
+# see SampleTemplate._backup
+_DELTA_SUFFIX = '.delta.gz'
+_DELTA_HEADER = 'qiita-template-delta'
+_MAX_BACKUP_DELTAS = 10
+
+
+def _template_delta(snapshot_lines, lines):
+    r"""Returns the delta to rebuild `lines` from `snapshot_lines`
+
+    The delta is a list of lines: '=\t<start>\t<end>\n' copies the lines
+    [start, end) of the snapshot and '+\t<n>\n' is followed by n new lines
+    """
+    delta = []
+    matcher = SequenceMatcher(None, snapshot_lines, lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append('=\t%d\t%d\n' % (i1, i2))
+        elif j2 > j1:
+            delta.append('+\t%d\n' % (j2 - j1))
+            delta.extend(lines[j1:j2])
+    return delta
+
+
+def _apply_template_delta(snapshot_lines, delta):
+    r"""Rebuilds the lines of a template from a snapshot and a delta"""
+    lines = []
+    delta = iter(delta)
+    for op in delta:
+        fields = op.rstrip('\n').split('\t')
+        if fields[0] == '=':
+            lines.extend(snapshot_lines[int(fields[1]):int(fields[2])])
+        else:
+            lines.extend(islice(delta, int(fields[1])))
+    return lines
+
+
+def is_template_delta(fp):
+    r"""Returns whether the backup `fp` is stored as a delta
+
+    Parameters
+    ----------
+    fp : str
+        The filepath of the backup, as returned by
+        `MetadataTemplate.get_filepaths`
+
+    Returns
+    -------
+    bool
+        Whether the backup has to be rebuilt with `read_template_backup`
+    """
+    return fp.endswith(_DELTA_SUFFIX)
+
+
+def _backup_digest(fp):
+    r"""Returns the SHA-1 of the template stored in the backup `fp`"""
+    if fp.endswith(_DELTA_SUFFIX):
+        with gzopen(fp) as f:
+            return f.readline().rstrip('\n').split('\t')[1]
+    with open(fp, 'U') as f:
+        return sha1(f.read()).hexdigest()
+
+
+def read_template_backup(fp):
+    r"""Returns the contents of a backup of a metadata template
+
+    Parameters
+    ----------
+    fp : str
+        The filepath of the backup, as returned by
+        `MetadataTemplate.get_filepaths`
+
+    Returns
+    -------
+    str
+        The template in tab-delimited format. The backups stored as deltas
+        are rebuilt from the snapshot they were computed against
+
+    See Also
+    --------
+    SampleTemplate
+    """
+    if not fp.endswith(_DELTA_SUFFIX):
+        with open(fp, 'U') as f:
+            return f.read()
+    with gzopen(fp) as f:
+        header = f.readline().rstrip('\n').split('\t')
+        delta = f.readlines()
+    with open(join(dirname(fp), header[2]), 'U') as f:
+        snapshot_lines = f.readlines()
+    return ''.join(_apply_template_delta(snapshot_lines, delta))
+
+
+def _strip_values(template):
+    r"""Strips the whitespace of the str values of template, in place
+
+    Parameters
+    ----------
+    template : DataFrame
+        The template, as parsed by pandas
+
+    Returns
+    -------
+    set of str
+        The columns that had any value with leading or trailing whitespace
+    """
+    padded = set()
+    for column in template.columns[(template.dtypes == object).values]:
+        values = template[column]
+        # the object columns can also hold booleans and missing values
+        is_str = values.map(lambda v: isinstance(v, basestring))
+        if not is_str.any():
+            continue
+        stripped = values.where(~is_str, values.str.strip())
+        # the values that only had whitespace are empty
+        stripped[stripped == ''] = np.nan
+        if not stripped.equals(values):
+            padded.add(column)
+            template[column] = stripped
+    return padded
+
+
+def _as_bool(values):
+    r"""Casts values to bool if all of them are boolean strings"""
+    cast = values.map(_BOOL_VALUES)
+    return cast.astype(bool) if cast.notnull().all() else values
+
+
+def _as_numeric(values):
+    r"""Casts values to int or float if all of them are numbers"""
+    for dtype in (np.int64, np.float64):
+        try:
+            return values.astype(dtype)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return values
+
+
+def _infer_values(values):
+    r"""Casts str values to the type the parser infers for a whole column
+
+    The column is cast to int or float if all its values are numbers, and to
+    bool if all its values are boolean strings (object, if some are missing)
+    """
+    present = values.dropna()
+    if present.str.contains(_FLOAT_RE).all():
+        return _as_numeric(values)
+    cast = present.map(_BOOL_VALUES)
+    if cast.notnull().all():
+        if len(present) == len(values):
+            return cast.astype(bool)
+        return values.map(_BOOL_VALUES)
+    return values
+
+
+def load_template_to_dataframe(fn, strip_whitespace=True, chunksize=None):
     """Load a sample or a prep template into a data frame
 
     Parameters
     ----------
-    fn : str
-        filename of the template to load
+    fn : str or file-like
+        filename of the template to load, or an open file or in-memory buffer
+        with its contents
     strip_whitespace : bool, optional
         Defaults to True. Whether or not to strip whitespace from values in the
         input file
+    chunksize : int, optional
+        If supplied, the file is parsed and stripped in chunks of this number
+        of rows, which bounds the memory used by the parser on very large
+        templates. The values are parsed as str and the type of each column
+        is inferred once the whole file is read, so the result is the same as
+        parsing the file at once. Defaults to parsing the file at once
 
     Returns
     -------
@@ -2208,6 +3285,10 @@ def load_template_to_dataframe(fn, strip_whitespace=True):
     character will be ignored and columns that are empty will be removed. Empty
     sample names will be removed from the DataFrame.
 
+    The file is parsed in a single pass: the whitespace is stripped while
+    parsing and from the str columns afterwards, so no temporary copy of the
+    file is written.
+
     The following table describes the data type per column that will be
     enforced in `fn`.
 
@@ -2234,54 +3315,74 @@ def load_template_to_dataframe(fn, strip_whitespace=True):
     +-----------------------+--------------+
     """
 
-    # First, strip all values from the cells in the input file, if requested
-    if strip_whitespace:
-        fd, fp = mkstemp()
-        close(fd)
-
-        with open_file(fn, 'U') as input_f, open(fp, 'w') as new_f:
-            for line in input_f:
-                line_elements = [x.strip()
-                                 for x in line.rstrip('\n').split('\t')]
-                new_f.write('\t'.join(line_elements) + '\n')
-
-        fn = fp
-
-    # index_col:
-    #   is set as False, otherwise it is cast as a float and we want a string
-    # keep_default:
-    #   is set as False, to avoid inferring empty/NA values with the defaults
-    #   that Pandas has.
-    # na_values:
-    #   the values that should be considered as empty, in this case only empty
-    #   strings.
-    # converters:
-    #   ensure that sample names are not converted into any other types but
-    #   strings and remove any trailing spaces. Don't let pandas try to guess
-    #   the dtype of the other columns, force them to be a str.
-    # comment:
-    #   using the tab character as "comment" we remove rows that are
-    #   constituted only by delimiters i. e. empty rows.
-    template = pd.read_csv(fn, sep='\t', infer_datetime_format=True,
-                           keep_default_na=False, na_values=[''],
-                           parse_dates=True, index_col=False, comment='\t',
-                           mangle_dupe_cols=False, converters={
-                               'sample_name': lambda x: str(x).strip(),
-                               # required_sample_info
-                               'physical_location': str,
-                               'sample_type': str,
-                               # collection_timestamp is not added here
-                               'host_subject_id': str,
-                               'description': str,
-                               # common_prep_info
-                               'center_name': str,
-                               'center_projct_name': str})
+    with open_file(fn, 'U') as f:
+        # The header is read here so the column names can be stripped and
+        # matched to their dtypes. The columns are parsed by position, so
+        # duplicated column names are kept
+        names = f.readline().rstrip('\r\n').split('\t')
+        if strip_whitespace:
+            names = [n.strip() for n in names]
+        positions = ['column_%d' % i for i in range(len(names))]
+        dtypes = {p: str for p, n in zip(positions, names)
+                  if n in _STR_COLUMNS}
+        # Each chunk would be inferred from its own values, so in chunks all
+        # the columns are parsed as str and inferred below
+        parse_dtypes = dtypes if chunksize is None else dict.fromkeys(
+            positions, str)
+
+        # keep_default_na:
+        #   is set as False, to avoid inferring empty/NA values with the
+        #   defaults that Pandas has.
+        # na_values:
+        #   the values that should be considered as empty, in this case only
+        #   empty strings.
+        # dtype:
+        #   ensure that sample names and the str required columns are not
+        #   converted into any other type.
+        # comment:
+        #   using the tab character as "comment" we remove rows that are
+        #   constituted only by delimiters i. e. empty rows.
+        # skipinitialspace:
+        #   the leading whitespace is skipped by the parser, so the numeric
+        #   and boolean values are inferred; trailing whitespace is stripped
+        #   from the str values below.
+        reader = pd.read_csv(f, sep='\t', header=None, names=positions,
+                             dtype=parse_dtypes, keep_default_na=False,
+                             na_values=[''], index_col=False, comment='\t',
+                             skipinitialspace=strip_whitespace,
+                             low_memory=False, chunksize=chunksize)
+        chunks = [reader] if chunksize is None else reader
+
+        padded = set()
+        frames = []
+        for chunk in chunks:
+            if strip_whitespace:
+                padded.update(_strip_values(chunk))
+            frames.append(chunk)
+
+    if not frames:
+        template = pd.DataFrame(columns=positions)
+    elif len(frames) == 1:
+        template = frames[0]
+    else:
+        template = pd.concat(frames)
+
+    # The values of these columns were not inferred by the parser because of
+    # their whitespace (or because the file was parsed in chunks), so they
+    # are inferred now that they are stripped
+    for p, n in zip(positions, names):
+        if template[p].dtype != object or p in dtypes:
+            continue
+        if n in _BOOL_COLUMNS and chunksize is None:
+            template[p] = _as_bool(template[p])
+        elif chunksize is not None or p in padded:
+            template[p] = _infer_values(template[p])
+    template.columns = names
 
     # let pandas infer the dtypes of these columns, if the inference is
     # not correct, then we have to raise an error
     columns_to_dtype = [(['latitude', 'longitude'], np.float),
-                        (['has_physical_specimen', 'has_extracted_data'],
-                         np.bool)]
+                        (list(_BOOL_COLUMNS), np.bool)]
     for columns, c_dtype in columns_to_dtype:
         for n in columns:
             if n in template.columns and not np.issubdtype(template[n].dtype,
@@ -2335,12 +3436,10 @@ def get_invalid_sample_names(sample_names):
     http://qiime.org/documentation/file_formats.html#mapping-file-overview.
     """
 
-    # from the QIIME mapping file documentation
-    valid = set(letters+digits+'.')
-    inv = []
-
-    for s in sample_names:
-        if set(s) - valid:
-            inv.append(s)
-
-    return inv
+    # from the QIIME mapping file documentation, only letters, digits and
+    # periods are valid
+    sample_names = pd.Series(list(sample_names), dtype=object)
+    if sample_names.empty:
+        return []
+    invalid = sample_names.str.contains(_INVALID_SAMPLE_NAME_RE, na=True)
+    return sample_names[invalid.values].tolist()
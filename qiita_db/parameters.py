@@ -140,6 +140,19 @@ class BaseParameters(QiitaObject):
                 self._table, self._column_id),
             (id_, ))[0]
 
+    @classmethod
+    def _existing_ids(cls, ids, conn_handler):
+        r"""Returns which of the provided IDs exist in the database
+
+        Notes
+        -----
+        This function overwrites the base function, as sql layout doesn't
+        follow the same conventions done in the other classes.
+        """
+        return {r[0] for r in conn_handler.execute_fetchall(
+            "SELECT {1} FROM qiita.{0} WHERE {1} = ANY(%s)".format(
+                cls._table, cls._column_id), (ids, ))}
+
     def _get_values_as_dict(self, conn_handler):
         r""""""
         return dict(conn_handler.execute_fetchone(
@@ -16,16 +16,24 @@ Classes
 
     QiitaStudySearch
 
+Functions
+---------
+
+..autosummary::
+    :toctree: generated/
+
+    clear_search_cache
+
 Examples
 --------
 Searches are done using boolean language, with AND, OR, and NOT supported,
 as well as ordering through parenthesis. You can search over metadata using the
 following operators::
 
->  <  =  <=  >=  includes
+>  <  =  <=  >=  includes  startswith
 
-The operators act as they normally do, with includes used for substring
-searches.
+The operators act as they normally do, with includes and startswith used for
+case insensitive substring and prefix searches.
 
 The object itself is used to search using the call method. In this
 example, we will use the complex query::
@@ -62,16 +70,27 @@ headers returned.
 #
 # The full license is in the file LICENSE, distributed with this software.
 # -----------------------------------------------------------------------------
-from pyparsing import (alphas, nums, Word, dblQuotedString, oneOf, Optional,
-                       opAssoc, CaselessLiteral, removeQuotes, Group,
+from collections import OrderedDict
+from itertools import groupby
+from operator import itemgetter
+from threading import Lock
+import re
+
+from pyparsing import (alphas, nums, Word, dblQuotedString, oneOf, opAssoc,
+                       CaselessLiteral, removeQuotes, Group,
                        operatorPrecedence, stringEnd)
 
-from qiita_db.util import scrub_data, typecast_string, get_table_cols
+from qiita_db.util import typecast_string, get_table_cols
 from qiita_db.sql_connection import SQLConnectionHandler
-from qiita_db.study import Study
 from qiita_db.exceptions import QiitaDBIncompatibleDatatypeError
 
 
+def _escape_like(value):
+    """Escapes the LIKE wildcards of value, so they match literally"""
+    value = value.replace('\\', '\\\\')
+    return value.replace('%', '\\%').replace('_', '\\_')
+
+
 # classes to be constructed at parse time, from intermediate ParseResults
 class UnaryOperation(object):
     def __init__(self, t):
@@ -85,26 +104,28 @@ class BinaryOperation(object):
 
 
 class SearchAnd(BinaryOperation):
-    def generate_sql(self):
-        return "(%s)" % " AND ".join(oper.generate_sql()
-                                     for oper in self.operands)
+    def generate_sql(self, sql_args, index_aliases):
+        return "(%s)" % " AND ".join(
+            oper.generate_sql(sql_args, index_aliases)
+            for oper in self.operands)
 
     def __repr__(self):
         return "AND:(%s)" % (",".join(str(oper) for oper in self.operands))
 
 
 class SearchOr(BinaryOperation):
-    def generate_sql(self):
-        return "(%s)" % " OR ".join(oper.generate_sql()
-                                    for oper in self.operands)
+    def generate_sql(self, sql_args, index_aliases):
+        return "(%s)" % " OR ".join(
+            oper.generate_sql(sql_args, index_aliases)
+            for oper in self.operands)
 
     def __repr__(self):
         return "OR:(%s)" % (",".join(str(oper) for oper in self.operands))
 
 
 class SearchNot(UnaryOperation):
-    def generate_sql(self):
-        return "NOT %s" % self.a.generate_sql()
+    def generate_sql(self, sql_args, index_aliases):
+        return "NOT %s" % self.a.generate_sql(sql_args, index_aliases)
 
     def __repr__(self):
         return "NOT:(%s)" % str(self.a)
@@ -118,15 +139,31 @@ class SearchTerm(object):
 
     def __init__(self, tokens):
         self.term = tokens[0]
-        # clean all the inputs
-        for pos, term in enumerate(self.term):
-            self.term[pos] = scrub_data(term)
 
-    def generate_sql(self):
+    def generate_sql(self, sql_args, index_aliases):
+        """Generates the SQL condition of the term
+
+        Parameters
+        ----------
+        sql_args : list
+            The arguments of the query being generated. The value of the term
+            is appended to it, in the same order as its placeholder
+        index_aliases : dict of {str: str}
+            The alias of the sample metadata index join of each study-specific
+            column, keyed by the lower case column name
+
+        Returns
+        -------
+        str
+            The SQL condition, with a %s placeholder for the value
+        """
         # we can assume that the metadata is either in required_sample_info
-        # or the study-specific table
+        # or the study-specific tables, which are searched through the sample
+        # metadata index. The column name is safe to use in the SQL, as the
+        # grammar only allows alphanumeric characters and _
         column_name, operator, argument = self.term
-        argument_type = type(typecast_string(argument))
+        argument = typecast_string(argument)
+        argument_type = type(argument)
 
         allowable_types = {int: {'<', '<=', '=', '>=', '>'},
                            float: {'<', '<=', '=', '>=', '>'},
@@ -140,25 +177,110 @@ class SearchTerm(object):
         elif column_name in self.study_cols:
             column_name = "st.%s" % column_name.lower()
         else:
-            column_name = "sa.%s" % column_name.lower()
-
-        if operator == "includes":
-            # substring search, so create proper query for it
-            return "LOWER(%s) LIKE '%%%s%%'" % (column_name, argument.lower())
+            # numbers are compared with the numeric values of the index
+            column_name = "%s.value_%s" % (
+                index_aliases[column_name.lower()],
+                'varchar' if argument_type == str else 'float')
+
+        if operator in ("includes", "startswith"):
+            # case insensitive substring and prefix searches. They are written
+            # as LIKE over LOWER(column) so they can use the trigram and
+            # prefix indexes of the searched columns
+            pattern = _escape_like(argument.lower())
+            if operator == "includes":
+                sql_args.append("%%%s%%" % pattern)
+            else:
+                sql_args.append("%s%%" % pattern)
+            return "LOWER(%s) LIKE %%s" % column_name
         else:
-            # standard query so just return it, adding quotes if string
-            if argument_type == str:
-                argument = ''.join(("'", argument, "'"))
-            return ' '.join([column_name, operator, argument])
+            # standard query, the value is passed as argument
+            sql_args.append(argument)
+            return "%s %s %%s" % (column_name, operator)
 
     def __repr__(self):
         column_name, operator, argument = self.term
         if operator == "includes":
             return "LOWER(%s) LIKE '%%%s%%')" % (column_name, argument.lower())
+        elif operator == "startswith":
+            return "LOWER(%s) LIKE '%s%%'" % (column_name, argument.lower())
         else:
             return ' '.join(self.term)
 
 
+# the search grammar, built once as its construction is much more expensive
+# than parsing the (short) search strings
+_category = Word(alphas + nums + "_")
+_seperator = oneOf("> < = >= <= !=") | CaselessLiteral("includes") | \
+    CaselessLiteral("startswith")
+_value = Word(alphas + nums + "_" + ":" + ".") | \
+    dblQuotedString().setParseAction(removeQuotes)
+_criterion = Group(_category + _seperator + _value)
+_criterion.setParseAction(SearchTerm)
+
+# create the grammar for parsing operators AND, OR, NOT
+_search_grammar = operatorPrecedence(
+    _criterion, [
+        (CaselessLiteral("not"), 1, opAssoc.RIGHT, SearchNot),
+        (CaselessLiteral("and"), 2, opAssoc.LEFT, SearchAnd),
+        (CaselessLiteral("or"), 2, opAssoc.LEFT, SearchOr)]) + stringEnd
+
+
+def _search_terms(node):
+    """Yields the SearchTerm objects of a parsed search, from left to right"""
+    if isinstance(node, SearchTerm):
+        yield node
+    elif isinstance(node, BinaryOperation):
+        for operand in node.operands:
+            for term in _search_terms(operand):
+                yield term
+    else:
+        for term in _search_terms(node.a):
+            yield term
+
+
+# Cache of the parsed searches, keyed by the normalized search string and
+# whether only studies with processed data are searched. The least recently
+# used search is dropped when it holds more than _MAX_PARSED_SEARCHES of them
+_MAX_PARSED_SEARCHES = 500
+_parsed_searches = OrderedDict()
+_parsed_searches_lock = Lock()
+_QUOTED_RE = re.compile(r'("(?:[^"\\\n]|\\.)*")')
+_SPACES_RE = re.compile(r"\s+")
+
+
+def _normalize_search_string(searchstr):
+    """Collapses the whitespace of a search string outside of quoted values
+
+    Parameters
+    ----------
+    searchstr : str
+        The search string
+
+    Returns
+    -------
+    str
+        The search string with the leading and trailing whitespace removed
+        and the runs of whitespace outside of double quotes collapsed to a
+        single space
+    """
+    parts = _QUOTED_RE.split(searchstr)
+    # the quoted values are in the odd positions
+    parts[::2] = [_SPACES_RE.sub(' ', p) for p in parts[::2]]
+    return ''.join(parts).strip()
+
+
+def clear_search_cache():
+    """Clears the cache of parsed searches
+
+    Notes
+    -----
+    The parsed searches depend on the columns of the required_sample_info and
+    study tables, so the cache should be cleared if they change.
+    """
+    with _parsed_searches_lock:
+        _parsed_searches.clear()
+
+
 class QiitaStudySearch(object):
     """QiitaStudySearch object to parse and run searches on studies."""
 
@@ -193,25 +315,63 @@ class QiitaStudySearch(object):
 
         Metadata column names and string searches are case-sensitive
         """
-        study_sql, sample_sql, meta_headers = \
+        meta_headers = self._parse_study_search_string(searchstr, True)[4]
+        results = {}
+        for sid, samples in self.iter_studies(searchstr, user):
+            # only studies with samples in the results are yielded
+            results.setdefault(sid, []).extend(samples)
+        return results, meta_headers
+
+    def iter_studies(self, searchstr, user):
+        """Runs a Study query and yields the matching samples of each study
+
+        Parameters
+        ----------
+        searchstr : str
+            Search string to use
+        user : User object
+            User making the search. Needed for permissions checks.
+
+        Yields
+        ------
+        int
+            The study id
+        list
+            The matching samples of the study, in format
+            [[samp_id1, meta1, meta2, ...], [samp_id2, meta1, meta2, ...], ...]
+
+        Notes
+        -----
+        The studies are yielded in ascending order of id, and the samples of
+        each study in ascending order of sample id. The metadata of the samples
+        is in the same order as the metadata columns list returned by calling
+        the object.
+
+        The metadata of the study-specific sample tables is searched through
+        the sample metadata index (qiita.sample_metadata_index), so all the
+        studies the user can access are searched with a single query. It is
+        executed as a prepared statement, so repeating a search, even with
+        different values, doesn't have to plan it again.
+        """
+        study_sql, study_args, sample_sql, sample_args, _ = \
             self._parse_study_search_string(searchstr, True)
-        conn_handler = SQLConnectionHandler()
-        # get all studies containing the metadata headers requested
-        study_ids = {x[0] for x in conn_handler.execute_fetchall(study_sql)}
-        # strip to only studies user has access to
+        # only the studies containing the metadata headers requested that
+        # the user has access to are searched
         if user.level not in {'admin', 'dev', 'superuser'}:
-            study_ids = study_ids.intersection(Study.get_by_status('public') +
-                                               user.user_studies +
-                                               user.shared_studies)
+            study_sql = ("SELECT study_id FROM ({0}) AS matching WHERE "
+                         "study_id IN (SELECT study_id FROM qiita.study s "
+                         "JOIN qiita.study_status ss ON "
+                         "s.study_status_id = ss.study_status_id WHERE "
+                         "ss.status = 'public' OR s.email = %s UNION "
+                         "SELECT study_id FROM qiita.study_users WHERE "
+                         "email = %s)".format(study_sql))
+            study_args = study_args + [user.id, user.id]
 
-        results = {}
-        # run search on each study to get out the matching samples
-        for sid in study_ids:
-            study_res = conn_handler.execute_fetchall(sample_sql.format(sid))
-            if study_res:
-                # only add study to results if actually has samples in results
-                results[sid] = study_res
-        return results, meta_headers
+        conn_handler = SQLConnectionHandler()
+        rows = conn_handler.execute_prepared(sample_sql.format(study_sql),
+                                             sample_args + study_args)
+        for sid, study_rows in groupby(rows, itemgetter(0)):
+            yield sid, [list(row[1:]) for row in study_rows]
 
     def _parse_study_search_string(self, searchstr,
                                    only_with_processed_data=False):
@@ -228,8 +388,13 @@ class QiitaStudySearch(object):
         -------
         study_sql : str
             SQL query for selecting studies with the required metadata columns
+        study_args : list
+            The arguments of study_sql
         sample_sql : str
-            SQL query for each study to get the sample ids that mach the query
+            SQL query to get the study and sample ids that match the query,
+            with a {0} placeholder for the SQL query of the studies to search
+        sample_args : list
+            The arguments of sample_sql
         meta_headers : list
             metadata categories in the query string in alphabetical order
 
@@ -237,46 +402,37 @@ class QiitaStudySearch(object):
         -----
         All searches are case-sensitive
 
+        The values searched for are not part of the SQL, they are passed as
+        arguments with %s placeholders
+
         References
         ----------
         .. [1] McGuire P (2007) Getting started with pyparsing.
         """
-        # build the parse grammar
-        category = Word(alphas + nums + "_")
-        seperator = oneOf("> < = >= <= !=") | CaselessLiteral("includes") | \
-            CaselessLiteral("startswith")
-        value = Word(alphas + nums + "_" + ":" + ".") | \
-            dblQuotedString().setParseAction(removeQuotes)
-        criterion = Group(category + seperator + value)
-        criterion.setParseAction(SearchTerm)
-        and_ = CaselessLiteral("and")
-        or_ = CaselessLiteral("or")
-        not_ = CaselessLiteral("not")
-        optional_seps = Optional(and_ | or_ | not_)
-
-        # create the grammar for parsing operators AND, OR, NOT
-        search_expr = operatorPrecedence(
-            criterion, [
-                (not_, 1, opAssoc.RIGHT, SearchNot),
-                (and_, 2, opAssoc.LEFT, SearchAnd),
-                (or_, 2, opAssoc.LEFT, SearchOr)])
-
-        # parse the search string to get out the SQL WHERE formatted query
-        eval_stack = (search_expr + stringEnd).parseString(searchstr)[0]
-        sql_where = eval_stack.generate_sql()
+        key = (_normalize_search_string(searchstr),
+               bool(only_with_processed_data))
+        with _parsed_searches_lock:
+            plan = _parsed_searches.pop(key, None)
+            if plan is not None:
+                # re-insert it, so it is the most recently used
+                _parsed_searches[key] = plan
+        if plan is not None:
+            return tuple(list(x) if isinstance(x, list) else x for x in plan)
+        searchstr = key[0]
+
+        # parse the search string
+        eval_stack = _search_grammar.parseString(searchstr)[0]
 
         # this lookup will be used to select only studies with columns
         # of the correct type
         type_lookup = {int: 'integer', float: 'float8', str: 'varchar'}
 
-        # parse out all metadata headers we need to have in a study, and
-        # their corresponding types
-        all_headers = [c[0][0].term[0] for c in
-                       (criterion + optional_seps).scanString(searchstr)]
+        # collect all metadata headers we need to have in a study, and
+        # their corresponding types, from the terms of the parsed query
+        terms = [t.term for t in _search_terms(eval_stack)]
+        all_headers = [t[0] for t in terms]
         meta_headers = set(all_headers)
-        all_types = [c[0][0].term[2] for c in
-                     (criterion + optional_seps).scanString(searchstr)]
-        all_types = [type_lookup[type(typecast_string(s))] for s in all_types]
+        all_types = [type_lookup[type(typecast_string(t[2]))] for t in terms]
 
         # sort headers and types so they return in same order every time.
         # Should be a relatively short list so very quick
@@ -309,6 +465,7 @@ class QiitaStudySearch(object):
 
         # get all study ids that contain all metadata categories searched for
         sql = []
+        study_args = []
         if meta_headers:
             # have study-specific metadata, so need to find specific studies
             for meta in meta_headers:
@@ -318,9 +475,9 @@ class QiitaStudySearch(object):
                     allowable_types = "('varchar')"
 
                 sql.append("SELECT study_id FROM qiita.study_sample_columns "
-                           "WHERE lower(column_name) = lower('%s') and "
-                           "column_type in %s" %
-                           (scrub_data(meta), allowable_types))
+                           "WHERE lower(column_name) = lower(%%s) and "
+                           "column_type in %s" % allowable_types)
+                study_args.append(meta)
         else:
             # no study-specific metadata, so need all studies
             sql.append("SELECT study_id FROM qiita.study_sample_columns")
@@ -330,7 +487,14 @@ class QiitaStudySearch(object):
             sql.append('SELECT study_id FROM qiita.study_processed_data')
         study_sql = ' INTERSECT '.join(sql)
 
-        # create  the sample finding SQL, getting both sample id and values
+        # create the sample finding SQL, getting both sample id and values.
+        # Each study-specific column is joined from the sample metadata index
+        index_columns = sorted({meta.lower() for meta in meta_headers})
+        index_aliases = {col: "m%d" % pos
+                         for pos, col in enumerate(index_columns)}
+        sample_args = list(index_columns)
+        sql_where = eval_stack.generate_sql(sample_args, index_aliases)
+
         # build the sql formatted list of metadata headers
         header_info = []
         for meta in meta_header_type_lookup:
@@ -339,11 +503,25 @@ class QiitaStudySearch(object):
             elif meta in self.study_cols:
                 header_info.append("st.%s" % meta)
             else:
-                header_info.append("sa.%s" % meta)
-        # build the SQL query
-        sample_sql = ("SELECT r.sample_id,%s FROM qiita.required_sample_info "
-                      "r JOIN qiita.sample_{0} sa ON sa.sample_id = "
-                      "r.sample_id JOIN qiita.study st ON st.study_id = "
-                      "r.study_id WHERE %s" %
-                      (','.join(header_info), sql_where))
-        return study_sql, sample_sql, meta_header_type_lookup.keys()
+                header_info.append("%s.value_%s" % (
+                    index_aliases[meta.lower()],
+                    'varchar' if meta_header_type_lookup[meta] == 'varchar'
+                    else 'float'))
+        joins = ''.join(
+            " LEFT JOIN qiita.sample_metadata_index {0} ON {0}.sample_id = "
+            "r.sample_id AND {0}.column_name = %s".format(index_aliases[col])
+            for col in index_columns)
+        # build the SQL query. The braces of the study query placeholder are
+        # the only ones in the SQL, as the values are passed as arguments
+        sample_sql = ("SELECT r.study_id,r.sample_id,%s FROM "
+                      "qiita.required_sample_info r JOIN qiita.study st ON "
+                      "st.study_id = r.study_id%s WHERE %s AND r.study_id IN "
+                      "({0}) ORDER BY r.study_id,r.sample_id" %
+                      (','.join(header_info), joins, sql_where))
+        plan = (study_sql, study_args, sample_sql, sample_args,
+                list(meta_header_type_lookup))
+        with _parsed_searches_lock:
+            _parsed_searches[key] = plan
+            if len(_parsed_searches) > _MAX_PARSED_SEARCHES:
+                _parsed_searches.popitem(last=False)
+        return tuple(list(x) if isinstance(x, list) else x for x in plan)
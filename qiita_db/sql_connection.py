@@ -15,6 +15,16 @@ Classes
 
    SQLConnectionHandler
 
+Functions
+---------
+
+.. autosummary::
+   :toctree: generated/
+
+   transaction
+   pool_stats
+   close_pools
+
 Examples
 --------
 Transaction blocks are created by first creating a queue of SQL commands, then
@@ -68,6 +78,51 @@ conn_handler.execute_fetchall(
     "SELECT * from qiita.qiita_user WHERE email = %s", ['insert@foo.bar'])
 [['insert@foo.bar', 1, 'pass', 'Toy', None, None, '222-222-2221', None, None,
   None]] # doctest: +SKIP
+
+Large sets of rows can be loaded with `copy_rows`, which streams them in a
+single COPY instead of running one INSERT per row. If a queue is given, the
+COPY is executed in the same transaction as the rest of the queue:
+
+conn_handler.create_queue("example_queue") # doctest: +SKIP
+conn_handler.copy_rows(
+    "qiita.qiita_user", ['email', 'name', 'password'],
+    [('p1@foo.bar', 'p1', 'pass1'), ('p2@foo.bar', 'p2', 'pass2')],
+    queue="example_queue") # doctest: +SKIP
+conn_handler.execute_queue("example_queue") # doctest: +SKIP
+
+Queries that are run many times with different values can be executed with
+`execute_prepared`, which prepares them once per connection so postgres
+doesn't have to parse and plan them again:
+
+conn_handler.execute_prepared(
+    "SELECT name FROM qiita.qiita_user WHERE email = %s",
+    ['insert@foo.bar']) # doctest: +SKIP
+[['Toy']]
+
+If the POOL_SIZE option of the qiita configuration is greater than 0, the
+connections are not opened by each SQLConnectionHandler. Instead, they are
+borrowed from a process-wide pool (one per admin mode) and returned to it when
+the handler is closed or garbage collected. The pool counters can be checked
+with `pool_stats`:
+
+from qiita_db.sql_connection import pool_stats
+pool_stats() # doctest: +SKIP
+{'no_admin': {'max_size': 10, 'size': 1, 'idle': 1, 'in_use': 0, ...}}
+
+Several operations can be grouped in a single transaction, regardless of the
+SQLConnectionHandler objects they use, with the `transaction` context manager.
+All the handlers used by the current thread inside the block share the same
+connection, and nothing is committed until the outermost block finishes.
+Nested blocks use savepoints, so an error only rolls back the innermost block:
+
+from qiita_db.sql_connection import transaction
+with transaction(): # doctest: +SKIP
+    template.update_category('ph', {'1.SKB8.640193': 7.5}) # doctest: +SKIP
+    template.update_category('ph', {'1.SKD8.640184': 7.2}) # doctest: +SKIP
+
+Every statement executed by an SQLConnectionHandler is recorded by
+`qiita_db.sql_instrumentation`, which aggregates them per fingerprint and per
+unit of work (web request or job) and logs the slow ones.
 """
 # -----------------------------------------------------------------------------
 # Copyright (c) 2014--, The Qiita Development Team.
@@ -78,15 +133,25 @@ conn_handler.execute_fetchall(
 # -----------------------------------------------------------------------------
 from __future__ import division
 from contextlib import contextmanager
-from itertools import chain
+import re
+from collections import OrderedDict
+from itertools import chain, count
 from tempfile import mktemp
+from threading import Condition, Lock, local
+from time import time
+from os import getpid
+from uuid import uuid4
+from datetime import datetime, date
 
+from future.utils.six import text_type, binary_type
 from psycopg2 import connect, ProgrammingError, Error as PostgresError
 from psycopg2.extras import DictCursor
 from psycopg2.extensions import (
-    ISOLATION_LEVEL_AUTOCOMMIT, ISOLATION_LEVEL_READ_COMMITTED)
+    ISOLATION_LEVEL_AUTOCOMMIT, ISOLATION_LEVEL_READ_COMMITTED, STATUS_READY,
+    connection as PostgresConnection)
 
 from .exceptions import QiitaDBExecutionError, QiitaDBConnectionError
+from .sql_instrumentation import record_query
 from qiita_core.qiita_settings import qiita_config
 
 
@@ -96,6 +161,722 @@ def flatten(listOfLists):
     return chain.from_iterable(listOfLists)
 
 
+# Characters that have to be escaped in the text format of COPY
+_COPY_ESCAPES = {u'\\': u'\\\\', u'\t': u'\\t', u'\n': u'\\n',
+                 u'\r': u'\\r'}
+
+
+def _copy_text(value):
+    """Formats a value as a field of the text format of COPY
+
+    Parameters
+    ----------
+    value : object
+        The value to format
+
+    Returns
+    -------
+    unicode
+        The value formatted as psycopg2 would render it in a query, with the
+        COPY special characters escaped. None is formatted as NULL.
+    """
+    if value is None:
+        return u'\\N'
+    if isinstance(value, bool):
+        return u'true' if value else u'false'
+    if isinstance(value, float):
+        if value != value:
+            return u'NaN'
+        if value in (float('inf'), float('-inf')):
+            return u'Infinity' if value > 0 else u'-Infinity'
+        # repr keeps all the precision, as psycopg2 does
+        return text_type(repr(value))
+    if isinstance(value, datetime):
+        value = text_type(value.isoformat(' '))
+    elif isinstance(value, date):
+        value = text_type(value.isoformat())
+    elif isinstance(value, binary_type):
+        value = value.decode('utf-8')
+    elif not isinstance(value, text_type):
+        value = text_type(value)
+    return u''.join(_COPY_ESCAPES.get(c, c) for c in value) \
+        if any(c in value for c in _COPY_ESCAPES) else value
+
+
+class _CopyRows(object):
+    """File-like object that serializes rows in the text format of COPY
+
+    The rows are serialized lazily, as `copy_expert` reads from the object, so
+    the full COPY payload is never held in memory
+
+    Parameters
+    ----------
+    rows : iterable of tuples
+        The rows to serialize
+    """
+    def __init__(self, rows):
+        self._lines = (u'\t'.join(_copy_text(v) for v in row).encode('utf-8')
+                       + b'\n' for row in rows)
+        self._buffer = b''
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            try:
+                line = next(self._lines)
+            except StopIteration:
+                break
+            chunks.append(line)
+            length += len(line)
+        data = b''.join(chunks)
+        if size < 0:
+            self._buffer = b''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+    def __repr__(self):
+        return '<COPY rows>'
+
+
+# INSERT statements with a single VALUES row of simple placeholders, which
+# can be folded in a multi-row INSERT. Statements with RETURNING, SELECT or
+# function calls in the values are not matched, so they are never folded.
+_VALUES_RE = re.compile(
+    r'^(\s*INSERT\s+INTO\s+[^()%]+(?:\([^()%]*\))?\s*VALUES\s*)'
+    r'(\([^()]*\))\s*;?\s*$', re.IGNORECASE | re.DOTALL)
+
+
+def _split_values(sql):
+    """Splits an INSERT ... VALUES (...) statement in its prefix and the
+    template of its values
+
+    Parameters
+    ----------
+    sql : str
+        The SQL statement
+
+    Returns
+    -------
+    tuple of (str, str) or None
+        The statement up to the VALUES keyword (included) and the template of
+        the row of values, or None if the statement can't be folded in a
+        multi-row INSERT
+    """
+    match = _VALUES_RE.match(sql)
+    if match is None:
+        return None
+    return match.groups()
+
+
+def _is_result_reference(arg):
+    """Whether a queue argument references the result of a previous query"""
+    return isinstance(arg, str) and arg[:1] == "{" and arg[-1:] == "}"
+
+
+def _execute_values(cur, sql, args_list, page_size):
+    """Executes an INSERT statement for all args_list using multi-row VALUES
+
+    Parameters
+    ----------
+    cur : psycopg2.cursor
+        The cursor in which to execute the statements
+    sql : str
+        An INSERT ... VALUES (...) statement accepted by `_split_values`
+    args_list : list of tuples or lists
+        The arguments of each of the rows to insert
+    page_size : int
+        The maximum number of rows inserted by each statement
+
+    Notes
+    -----
+    This is what psycopg2.extras.execute_values does: each page of rows is
+    sent to the server in a single statement, instead of one per row as
+    cursor.executemany does.
+    """
+    prefix, template = _split_values(sql)
+    if isinstance(prefix, text_type):
+        prefix = prefix.encode('utf-8')
+    for i in range(0, len(args_list), page_size):
+        page = args_list[i:i + page_size]
+        values = b','.join(cur.mogrify(template, args) for args in page)
+        cur.execute(prefix + values)
+
+
+def _fold_queue(entries, page_size):
+    """Groups the consecutive entries of a queue that insert rows in the
+    same way
+
+    Parameters
+    ----------
+    entries : list of tuples of (str, object)
+        The (sql, sql_args) entries of the queue
+    page_size : int
+        The maximum number of entries in a group. If lower than 2, entries are
+        not grouped
+
+    Yields
+    ------
+    tuple of (str, object, bool)
+        The sql, the sql_args, and whether the entry is a group. If it is a
+        group, sql_args is the list of the sql_args of the grouped entries
+
+    Notes
+    -----
+    Only INSERT ... VALUES entries with a list or tuple of arguments are
+    grouped. They don't return results, so grouping them doesn't change the
+    results available to the {#} placeholders. Entries with {#} placeholders
+    are not grouped, as the placeholders are resolved when the entry is
+    executed.
+    """
+    group_sql, group = None, []
+    for sql, sql_args in entries:
+        foldable = (page_size > 1 and
+                    isinstance(sql_args, (list, tuple)) and
+                    not any(_is_result_reference(a) for a in sql_args) and
+                    (sql == group_sql or _split_values(sql) is not None))
+        if foldable and sql == group_sql and len(group) < page_size:
+            group.append(sql_args)
+            continue
+
+        if group:
+            if len(group) == 1:
+                yield group_sql, group[0], False
+            else:
+                yield group_sql, group, True
+        group_sql, group = None, []
+
+        if foldable:
+            group_sql, group = sql, [sql_args]
+        else:
+            yield sql, sql_args, False
+
+    if group:
+        if len(group) == 1:
+            yield group_sql, group[0], False
+        else:
+            yield group_sql, group, True
+
+
+# Maximum number of prepared statements kept by each connection. The least
+# recently used one is deallocated when a connection goes over it
+_MAX_PREPARED_STATEMENTS = 100
+
+_PLACEHOLDER_RE = re.compile(r"%([%s])")
+
+
+class _QiitaConnection(PostgresConnection):
+    """psycopg2 connection that keeps track of its prepared statements
+
+    Attributes
+    ----------
+    prepared_statements : OrderedDict of {str: str}
+        The name of the prepared statement of each SQL query, from the least
+        to the most recently executed
+    """
+    def __init__(self, *args, **kwargs):
+        super(_QiitaConnection, self).__init__(*args, **kwargs)
+        self.prepared_statements = OrderedDict()
+
+
+def _positional_placeholders(sql):
+    """Converts the psycopg2 placeholders of a query to positional parameters
+
+    Parameters
+    ----------
+    sql : str
+        The SQL query, with %s placeholders
+
+    Returns
+    -------
+    str
+        The query with its %s placeholders replaced by $1, $2... and its
+        escaped percent signs (%%) unescaped, as expected by PREPARE
+    """
+    positions = count(1)
+    return _PLACEHOLDER_RE.sub(
+        lambda m: '%' if m.group(1) == '%' else '$%d' % next(positions), sql)
+
+
+def _connection_args(admin):
+    """Returns the psycopg2 connection arguments for the given admin mode
+
+    Parameters
+    ----------
+    admin : {'no_admin', 'admin_with_database', 'admin_without_database'}
+        The admin mode of the connection
+
+    Returns
+    -------
+    dict
+        The keyword arguments for psycopg2.connect
+    """
+    # connection string arguments for a normal user
+    args = {
+        'user': qiita_config.user,
+        'password': qiita_config.password,
+        'database': qiita_config.database,
+        'host': qiita_config.host,
+        'port': qiita_config.port}
+
+    # if this is an admin user, use the admin credentials
+    if admin != 'no_admin':
+        args['user'] = qiita_config.admin_user
+        args['password'] = qiita_config.admin_password
+
+    # Do not connect to a particular database unless requested
+    if admin == 'admin_without_database':
+        del args['database']
+
+    return args
+
+
+def _connect(admin):
+    """Opens a new connection to the postgres server
+
+    Parameters
+    ----------
+    admin : {'no_admin', 'admin_with_database', 'admin_without_database'}
+        The admin mode of the connection
+
+    Returns
+    -------
+    psycopg2.connection
+        The new connection
+
+    Raises
+    ------
+    RuntimeError
+        If the connection cannot be established
+    """
+    try:
+        return connect(connection_factory=_QiitaConnection,
+                       **_connection_args(admin))
+    except Exception as e:
+        # catch any exception and raise as runtime error
+        raise RuntimeError("Cannot connect to database: %s" % str(e))
+
+
+class _ConnectionPool(object):
+    """Thread-safe, size-bounded pool of postgres connections
+
+    Parameters
+    ----------
+    factory : callable
+        Function with no arguments that returns a new connection
+    max_size : int
+        Maximum number of connections (idle plus borrowed) of the pool
+    max_idle : int or float
+        Number of seconds a connection can stay idle before being closed
+    timeout : int or float
+        Number of seconds to wait for a connection to be returned when the
+        pool is exhausted
+    health_check_interval : int or float, optional
+        Connections that have been idle for more than this number of seconds
+        are pinged before being handed out. Default: 30.
+
+    Notes
+    -----
+    Idle connections are handed out in LIFO order, so the least recently used
+    ones are the ones that reach `max_idle` and get evicted.
+    """
+    def __init__(self, factory, max_size, max_idle, timeout,
+                 health_check_interval=30):
+        self._factory = factory
+        self._max_size = max_size
+        self._max_idle = max_idle
+        self._timeout = timeout
+        self._health_check_interval = health_check_interval
+        self._cond = Condition(Lock())
+        # list of (connection, timestamp of the moment it was returned)
+        self._idle = []
+        # id of the borrowed connections
+        self._in_use = set()
+        # connections opened before the last `close_all` call are closed when
+        # returned instead of going back to the idle list
+        self._stale = set()
+        self._counters = {'borrows': 0, 'waits': 0, 'wait_time': 0.0,
+                          'max_wait_time': 0.0, 'timeouts': 0, 'opened': 0,
+                          'closed': 0, 'evicted': 0,
+                          'health_check_failures': 0}
+
+    def _close(self, conn):
+        """Closes conn ignoring errors. Should be called holding the lock"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._counters['closed'] += 1
+
+    def _evict_idle(self):
+        """Closes the connections idle for too long. Called holding the lock
+        """
+        limit = time() - self._max_idle
+        keep = []
+        for conn, returned in self._idle:
+            if returned < limit or conn.closed:
+                self._close(conn)
+                self._counters['evicted'] += 1
+            else:
+                keep.append((conn, returned))
+        self._idle = keep
+
+    @staticmethod
+    def _is_healthy(conn, ping):
+        """Checks that conn can still be used
+
+        Parameters
+        ----------
+        conn : psycopg2.connection
+            The connection to check
+        ping : bool
+            Whether to issue a query to the server or only check the
+            connection status on the client side
+        """
+        if conn.closed or conn.status != STATUS_READY:
+            return False
+        if ping:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except PostgresError:
+                return False
+        return True
+
+    def get(self):
+        """Borrows a connection from the pool
+
+        Returns
+        -------
+        psycopg2.connection
+            An open connection
+
+        Raises
+        ------
+        QiitaDBConnectionError
+            If no connection is returned to the pool in `timeout` seconds
+        RuntimeError
+            If a new connection cannot be established
+        """
+        start = time()
+        waited = False
+        conn = None
+        with self._cond:
+            self._evict_idle()
+            while not self._idle and len(self._in_use) >= self._max_size:
+                remaining = self._timeout - (time() - start)
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise QiitaDBConnectionError(
+                        "Timed out after %s seconds waiting for a "
+                        "database connection (pool size: %d)"
+                        % (self._timeout, self._max_size))
+                if not waited:
+                    waited = True
+                    self._counters['waits'] += 1
+                self._cond.wait(remaining)
+
+            if self._idle:
+                conn, returned = self._idle.pop()
+                ping = time() - returned > self._health_check_interval
+            else:
+                ping = False
+            # Reserve the slot so other threads can't go over max_size
+            # while we connect or ping outside of the lock
+            slot = object()
+            self._in_use.add(slot)
+
+        if conn is not None and not self._is_healthy(conn, ping):
+            with self._cond:
+                self._counters['health_check_failures'] += 1
+                self._close(conn)
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self._factory()
+            except Exception:
+                with self._cond:
+                    self._in_use.discard(slot)
+                    self._cond.notify()
+                raise
+            opened = True
+        else:
+            opened = False
+
+        with self._cond:
+            self._in_use.discard(slot)
+            self._in_use.add(id(conn))
+            self._counters['borrows'] += 1
+            if opened:
+                self._counters['opened'] += 1
+            wait_time = time() - start
+            if waited:
+                self._counters['wait_time'] += wait_time
+                self._counters['max_wait_time'] = max(
+                    self._counters['max_wait_time'], wait_time)
+        return conn
+
+    def put(self, conn):
+        """Returns a borrowed connection to the pool
+
+        Parameters
+        ----------
+        conn : psycopg2.connection
+            The connection to return
+
+        Notes
+        -----
+        Any open transaction on the connection is rolled back and the
+        isolation level is reset, so the next borrower gets a clean connection
+        """
+        reusable = not conn.closed
+        if reusable:
+            try:
+                conn.rollback()
+                conn.set_isolation_level(ISOLATION_LEVEL_READ_COMMITTED)
+            except PostgresError:
+                reusable = False
+
+        with self._cond:
+            self._in_use.discard(id(conn))
+            if reusable and id(conn) not in self._stale:
+                self._idle.append((conn, time()))
+            else:
+                self._stale.discard(id(conn))
+                self._close(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        """Closes all the idle connections, and the borrowed ones as soon as
+        they are returned"""
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._idle = []
+            self._stale.update(self._in_use)
+
+    def stats(self):
+        """Returns the pool counters
+
+        Returns
+        -------
+        dict
+            The pool counters: max_size, size (open connections), idle,
+            in_use, borrows, waits (number of borrows that had to wait for a
+            connection), wait_time and max_wait_time (in seconds), timeouts,
+            opened, closed, evicted and health_check_failures
+        """
+        with self._cond:
+            stats = dict(self._counters)
+            stats['max_size'] = self._max_size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = len(self._in_use)
+            stats['size'] = stats['idle'] + stats['in_use']
+        return stats
+
+
+# Process-wide pools, keyed by (process id, admin mode). The process id is
+# part of the key so a forked process never reuses the parent's sockets
+_pools = {}
+_pools_lock = Lock()
+
+
+def _get_pool(admin):
+    """Returns the connection pool for the admin mode, creating it if needed
+
+    Parameters
+    ----------
+    admin : {'no_admin', 'admin_with_database', 'admin_without_database'}
+        The admin mode of the connections of the pool
+
+    Returns
+    -------
+    _ConnectionPool or None
+        The pool, or None if pooling is disabled in the configuration
+    """
+    if qiita_config.pool_size <= 0:
+        return None
+
+    key = (getpid(), admin)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = _ConnectionPool(
+                lambda: _connect(admin), qiita_config.pool_size,
+                qiita_config.pool_max_idle, qiita_config.pool_timeout)
+        return _pools[key]
+
+
+def pool_stats():
+    """Returns the counters of the connection pools of this process
+
+    Returns
+    -------
+    dict of {str: dict}
+        The counters of each pool, keyed by admin mode. See
+        `_ConnectionPool.stats` for the available counters
+    """
+    pid = getpid()
+    with _pools_lock:
+        pools = [(admin, pool) for (p, admin), pool in _pools.items()
+                 if p == pid]
+    return {admin: pool.stats() for admin, pool in pools}
+
+
+def close_pools():
+    """Closes all the pooled connections of this process
+
+    Notes
+    -----
+    Connections currently borrowed are closed when they are returned. This is
+    needed, for example, before dropping the database, as postgres doesn't
+    allow dropping a database with open connections.
+    """
+    pid = getpid()
+    with _pools_lock:
+        pools = [pool for (p, _), pool in _pools.items() if p == pid]
+    for pool in pools:
+        pool.close_all()
+
+
+class _Transaction(object):
+    """A transaction in progress in the current thread
+
+    Parameters
+    ----------
+    admin : {'no_admin', 'admin_with_database', 'admin_without_database'}
+        The admin mode of the connection of the transaction
+
+    Attributes
+    ----------
+    connection : psycopg2.connection
+        The connection in which the transaction runs
+    """
+    def __init__(self, admin):
+        self._pool = _get_pool(admin)
+        self.connection = (_connect(admin) if self._pool is None
+                           else self._pool.get())
+        self._savepoints = 0
+
+    def _execute(self, sql):
+        with self.connection.cursor() as cur:
+            cur.execute(sql)
+
+    def savepoint(self):
+        """Creates a new savepoint and returns its name"""
+        self._savepoints += 1
+        name = 'qiita_sp_%d' % self._savepoints
+        self._execute('SAVEPOINT %s' % name)
+        return name
+
+    def release_savepoint(self, name):
+        """Releases the savepoint `name`, keeping its changes"""
+        self._execute('RELEASE SAVEPOINT %s' % name)
+
+    def rollback_to_savepoint(self, name):
+        """Discards the changes done since the savepoint `name`"""
+        self._execute('ROLLBACK TO SAVEPOINT %s' % name)
+        self._execute('RELEASE SAVEPOINT %s' % name)
+
+    def commit(self):
+        """Commits the transaction
+
+        Raises
+        ------
+        QiitaDBExecutionError
+            If the transaction can't be committed (e.g. a deferred constraint
+            is violated), in which case it is rolled back
+        """
+        try:
+            self.connection.commit()
+        except PostgresError as e:
+            self.rollback()
+            raise QiitaDBExecutionError("\nError committing transaction"
+                                        "\nError: %s" % e)
+
+    def rollback(self):
+        """Rolls back the transaction"""
+        if not self.connection.closed:
+            self.connection.rollback()
+
+    def close(self):
+        """Returns the connection to the pool, or closes it if not pooled"""
+        if self._pool is None:
+            self.connection.close()
+        else:
+            self._pool.put(self.connection)
+
+
+_transactions = local()
+
+
+def _current_transaction(admin):
+    """Returns the transaction in progress in the current thread for the
+    admin mode, or None if there is none"""
+    return getattr(_transactions, 'active', {}).get(admin)
+
+
+@contextmanager
+def transaction(admin='no_admin'):
+    """Groups all the SQL executed in the block in a single transaction
+
+    Parameters
+    ----------
+    admin : {'no_admin', 'admin_with_database', 'admin_without_database'},
+            optional
+        The admin mode of the handlers that join the transaction. Default:
+        'no_admin'
+
+    Raises
+    ------
+    QiitaDBExecutionError
+        If the transaction can't be committed
+
+    Notes
+    -----
+    While the block runs, every SQLConnectionHandler of the `admin` mode used
+    by the current thread (no matter when it was created) executes its SQL in
+    the connection of the transaction, and its commits and rollbacks are
+    deferred to the transaction. The transaction is committed when the
+    outermost block finishes, or rolled back if it raises an exception.
+
+    Nested blocks create a savepoint, which is rolled back if the nested
+    block raises an exception, so the enclosing block can handle the error
+    and continue. Queues executed with `execute_queue` are also run in their
+    own savepoint. Any other statement that fails inside a transaction
+    aborts it up to the innermost enclosing block, so an error that has to
+    be recovered from must happen in its own (nested) block.
+    """
+    if not hasattr(_transactions, 'active'):
+        _transactions.active = {}
+    tx = _transactions.active.get(admin)
+
+    if tx is not None:
+        # Nested block
+        name = tx.savepoint()
+        try:
+            yield
+        except BaseException:
+            tx.rollback_to_savepoint(name)
+            raise
+        tx.release_savepoint(name)
+        return
+
+    tx = _transactions.active[admin] = _Transaction(admin)
+    try:
+        try:
+            yield
+        except BaseException:
+            tx.rollback()
+            raise
+        tx.commit()
+    finally:
+        del _transactions.active[admin]
+        tx.close()
+
+
 class SQLConnectionHandler(object):
     """Encapsulates the DB connection with the Postgres DB
 
@@ -108,6 +889,15 @@ class SQLConnectionHandler(object):
         specified in the qiita configuration, but not to a specific database.
         If 'admin_with_database', then a connection will be made to the server
         and database specified in the qiita config.
+
+    Notes
+    -----
+    If connection pooling is enabled in the qiita configuration, the
+    connection is borrowed from the pool of the `admin` mode and returned to
+    it on `close` (or when the handler is garbage collected).
+
+    Inside a `transaction` block of the same `admin` mode, the handler uses the
+    connection of the transaction instead of its own, and doesn't commit.
     """
     def __init__(self, admin='no_admin'):
         if admin not in ('no_admin', 'admin_with_database',
@@ -117,7 +907,12 @@ class SQLConnectionHandler(object):
                                "'admin_without_database'}")
 
         self.admin = admin
-        self._open_connection()
+        self._pool = _get_pool(admin)
+        self._connection = None
+        # Handlers created inside a transaction don't need a connection of
+        # their own, it is opened if they are used outside of it
+        if _current_transaction(admin) is None:
+            self._open_connection()
         # queues for transaction blocks. Format is {str: list} where the str
         # is the queue name and the list is the queue of SQL commands
         self.queues = {}
@@ -126,33 +921,67 @@ class SQLConnectionHandler(object):
         # make sure if connection close fails it doesn't raise error
         # should only error if connection already closed
         try:
-            self._connection.close()
+            self.close()
         except:
             pass
 
     def _open_connection(self):
-        # connection string arguments for a normal user
-        args = {
-            'user': qiita_config.user,
-            'password': qiita_config.password,
-            'database': qiita_config.database,
-            'host': qiita_config.host,
-            'port': qiita_config.port}
-
-        # if this is an admin user, use the admin credentials
-        if self.admin != 'no_admin':
-            args['user'] = qiita_config.admin_user
-            args['password'] = qiita_config.admin_password
-
-        # Do not connect to a particular database unless requested
-        if self.admin == 'admin_without_database':
-            del args['database']
+        if self._pool is None:
+            self._connection = _connect(self.admin)
+        else:
+            if self._connection is not None:
+                # The borrowed connection died, give its slot back
+                self._pool.put(self._connection)
+                self._connection = None
+            self._connection = self._pool.get()
 
-        try:
-            self._connection = connect(**args)
-        except Exception as e:
-            # catch any exception and raise as runtime error
-            raise RuntimeError("Cannot connect to database: %s" % str(e))
+    def close(self):
+        """Closes the connection, or returns it to the pool if pooled
+
+        Notes
+        -----
+        The handler reconnects (or borrows a new connection) if it is used
+        after being closed
+        """
+        conn = self._connection
+        self._connection = None
+        if conn is None:
+            return
+        if self._pool is None:
+            conn.close()
+        else:
+            self._pool.put(conn)
+
+    def _get_connection(self):
+        """Returns the connection of the transaction in progress, if any, or
+        the handler's own connection, reopening it if needed"""
+        tx = _current_transaction(self.admin)
+        if tx is not None:
+            return tx.connection
+        if self._connection is None or self._connection.closed:
+            self._open_connection()
+        return self._connection
+
+    def _commit(self):
+        """Commits, unless a transaction is in progress"""
+        if _current_transaction(self.admin) is None:
+            self._connection.commit()
+
+    def _rollback(self):
+        """Rolls back, unless a transaction is in progress, which is rolled
+        back up to its innermost block when the error reaches it"""
+        if _current_transaction(self.admin) is None:
+            self._connection.rollback()
+
+    @contextmanager
+    def _queue_transaction(self):
+        """Runs the block in its own savepoint if a transaction is in
+        progress"""
+        if _current_transaction(self.admin) is None:
+            yield
+        else:
+            with transaction(self.admin):
+                yield
 
     @contextmanager
     def get_postgres_cursor(self):
@@ -164,12 +993,10 @@ class SQLConnectionHandler(object):
 
         Raises a QiitaDBConnectionError if the cursor cannot be created
         """
-        if self._connection.closed:
-            # Currently defaults to non-admin connection
-            self._open_connection()
+        connection = self._get_connection()
 
         try:
-            with self._connection.cursor(cursor_factory=DictCursor) as cur:
+            with connection.cursor(cursor_factory=DictCursor) as cur:
                 yield cur
         except PostgresError as e:
             raise QiitaDBConnectionError("Cannot get postgres cursor! %s" % e)
@@ -182,16 +1009,26 @@ class SQLConnectionHandler(object):
         on_or_off : {'on', 'off'}
             If 'on', isolation level will be set to autocommit. Otherwise,
             it will be set to read committed.
+
+        Raises
+        ------
+        RuntimeError
+            If a transaction is in progress, as changing the isolation level
+            would commit it
         """
         if on_or_off not in {'on', 'off'}:
             raise ValueError("set_autocommit takes only 'on' or 'off'")
 
+        if _current_transaction(self.admin) is not None:
+            raise RuntimeError("set_autocommit can't be used inside a "
+                               "transaction")
+
         if on_or_off == 'on':
             level = ISOLATION_LEVEL_AUTOCOMMIT
         else:
             level = ISOLATION_LEVEL_READ_COMMITTED
 
-        self._connection.set_isolation_level(level)
+        self._get_connection().set_isolation_level(level)
 
     def _check_sql_args(self, sql_args):
         """ Checks that sql_args have the correct type
@@ -208,7 +1045,7 @@ class SQLConnectionHandler(object):
                             % type(sql_args))
 
     @contextmanager
-    def _sql_executor(self, sql, sql_args=None, many=False):
+    def _sql_executor(self, sql, sql_args=None, many=False, page_size=100):
         """Executes an SQL query
 
         Parameters
@@ -219,6 +1056,10 @@ class SQLConnectionHandler(object):
             The arguments for the SQL query
         many : bool, optional
             If true, performs an execute many call
+        page_size : int, optional
+            If many is true and sql is an INSERT ... VALUES statement, the
+            maximum number of rows inserted by each multi-row statement.
+            Default: 100
 
         Returns
         -------
@@ -240,21 +1081,29 @@ class SQLConnectionHandler(object):
         # Execute the query
         with self.get_postgres_cursor() as cur:
             try:
+                start = time()
                 if many:
-                    cur.executemany(sql, sql_args)
+                    if (page_size > 1 and _split_values(sql) is not None and
+                            all(isinstance(args, (list, tuple))
+                                for args in sql_args)):
+                        _execute_values(cur, sql, list(sql_args), page_size)
+                    else:
+                        cur.executemany(sql, sql_args)
                 else:
                     cur.execute(sql, sql_args)
+                record_query(sql, sql_args, time() - start, cur.rowcount,
+                             many)
                 yield cur
-                self._connection.commit()
+                self._commit()
             except PostgresError as e:
-                self._connection.rollback()
+                self._rollback()
                 raise QiitaDBExecutionError(("\nError running SQL query: %s"
                                              "\nARGS: %s"
                                              "\nError: %s" %
                                              (sql, str(sql_args), e)))
 
     def _rollback_raise_error(self, queue, sql, sql_args, e):
-        self._connection.rollback()
+        self._rollback()
         # wipe out queue since it has an error in it
         del self.queues[queue]
         raise QiitaDBExecutionError(
@@ -262,30 +1111,49 @@ class SQLConnectionHandler(object):
              "\nARGS: %s\nError: %s" % (queue, sql,
                                         str(sql_args), e)))
 
-    def execute_queue(self, queue):
-        """Executes all sql in a queue in a single transaction block
+    def _run_queue(self, queue, page_size):
+        """Executes the statements of a queue without committing them
 
         Parameters
         ----------
         queue : str
             Name of queue to execute
+        page_size : int
+            See `execute_queue`
 
-        Notes
-        -----
-        Does not support executemany command. Instead, enter the multiple
-        SQL commands as multiple entries in the queue.
-
-        Queues are executed in FIFO order
+        Returns
+        -------
+        list
+            The results of the last statements that returned results, as
+            returned by `execute_queue`
         """
         with self.get_postgres_cursor() as cur:
             results = []
             clear_res = False
-            for sql, sql_args in self.queues[queue]:
+            for sql, sql_args, folded in _fold_queue(self.queues[queue],
+                                                     page_size):
+                start = time()
+                if folded:
+                    # Insert all the rows of the group, nothing to fetch
+                    try:
+                        _execute_values(cur, sql, sql_args, page_size)
+                    except Exception as e:
+                        self._rollback_raise_error(queue, sql, sql_args, e)
+                    record_query(sql, sql_args, time() - start, cur.rowcount,
+                                 many=True)
+                    continue
+                if isinstance(sql_args, _CopyRows):
+                    # Stream the rows to the server, nothing to fetch
+                    try:
+                        cur.copy_expert(sql, sql_args)
+                    except Exception as e:
+                        self._rollback_raise_error(queue, sql, sql_args, e)
+                    record_query(sql, None, time() - start, cur.rowcount)
+                    continue
                 if sql_args is not None:
                     for pos, arg in enumerate(sql_args):
                         # check if previous results needed and replace
-                        if isinstance(arg, str) and \
-                                arg[0] == "{" and arg[-1] == "}":
+                        if _is_result_reference(arg):
                             result_pos = int(arg[1:-1])
                             sql_args[pos] = results[result_pos]
                             clear_res = True
@@ -298,6 +1166,7 @@ class SQLConnectionHandler(object):
                     cur.execute(sql, sql_args)
                 except Exception as e:
                     self._rollback_raise_error(queue, sql, sql_args, e)
+                record_query(sql, sql_args, time() - start, cur.rowcount)
 
                 # fetch results if available and append to results list
                 try:
@@ -310,7 +1179,33 @@ class SQLConnectionHandler(object):
                 else:
                     # append all results linearly
                     results.extend(flatten(res))
-        self._connection.commit()
+        return results
+
+    def execute_queue(self, queue, page_size=100):
+        """Executes all sql in a queue in a single transaction block
+
+        Parameters
+        ----------
+        queue : str
+            Name of queue to execute
+        page_size : int, optional
+            The maximum number of consecutive entries of the queue with the
+            same INSERT ... VALUES statement that are executed as a single
+            multi-row INSERT. Use 1 to execute each entry on its own.
+            Default: 100
+
+        Notes
+        -----
+        Does not support executemany command. Instead, enter the multiple
+        SQL commands as multiple entries in the queue.
+
+        Queues are executed in FIFO order. Inside a `transaction` block, the
+        queue is executed in its own savepoint, so if it fails only its
+        statements are rolled back
+        """
+        with self._queue_transaction():
+            results = self._run_queue(queue, page_size)
+            self._commit()
         # wipe out queue since finished
         del self.queues[queue]
         return results
@@ -375,6 +1270,52 @@ class SQLConnectionHandler(object):
             self._check_sql_args(sql_args)
             self.queues[queue].append((sql, sql_args))
 
+    def copy_rows(self, table, columns, rows, queue=None):
+        """Bulk loads rows in a table using COPY ... FROM STDIN
+
+        Parameters
+        ----------
+        table : str
+            The (schema qualified) name of the table to load the rows in
+        columns : list of str
+            The columns of `table` that the values of each row fill, in order
+        rows : iterable of tuples
+            The rows to load. None values are loaded as NULL
+        queue : str, optional
+            If provided, the COPY is added to the end of this queue, so it is
+            executed in the same transaction as the rest of the queue.
+            Otherwise, it is executed (and committed) right away
+
+        Raises
+        ------
+        KeyError
+            queue does not exist
+        QiitaDBExecutionError
+            If there is some error executing the COPY
+
+        Notes
+        -----
+        The rows are sent to the server in a single COPY stream, which is much
+        faster than running an INSERT per row (e.g. with `executemany` or
+        `add_to_queue(..., many=True)`). The values are formatted lazily, when
+        the COPY is executed, so `rows` can be an iterator.
+        """
+        sql = "COPY {0} ({1}) FROM STDIN".format(table, ', '.join(columns))
+        if queue is not None:
+            self.queues[queue].append((sql, _CopyRows(rows)))
+            return
+
+        with self.get_postgres_cursor() as cur:
+            try:
+                start = time()
+                cur.copy_expert(sql, _CopyRows(rows))
+                record_query(sql, None, time() - start, cur.rowcount)
+                self._commit()
+            except PostgresError as e:
+                self._rollback()
+                raise QiitaDBExecutionError(("\nError running SQL query: %s"
+                                             "\nError: %s" % (sql, e)))
+
     def execute_fetchall(self, sql, sql_args=None):
         """ Executes a fetchall SQL query
 
@@ -404,6 +1345,180 @@ class SQLConnectionHandler(object):
             result = pgcursor.fetchall()
         return result
 
+    def execute_prepared(self, sql, sql_args=None):
+        """Executes a query as a prepared statement and returns its results
+
+        Parameters
+        ----------
+        sql : str
+            The SQL query
+        sql_args : tuple or list, optional
+            The arguments for the SQL query
+
+        Returns
+        -------
+        list of tuples
+            The results of the query, as in `execute_fetchall`
+
+        Raises
+        ------
+        TypeError
+            If `sql_args` is a dict, prepared statements only take positional
+            arguments
+        QiitaDBExecutionError
+            If there is some error executing the SQL query
+
+        Notes
+        -----
+        The query is prepared the first time it is executed in a connection,
+        so the following executions in the same connection, with the same or
+        different arguments, skip its parsing and planning. Each connection
+        keeps up to `_MAX_PREPARED_STATEMENTS` prepared statements. Pooled
+        connections keep them while they are idle.
+        """
+        if isinstance(sql_args, dict):
+            raise TypeError("Prepared statements only take positional "
+                            "arguments")
+        self._check_sql_args(sql_args)
+        sql_args = list(sql_args) if sql_args else []
+
+        prepared = self._get_connection().prepared_statements
+        with self.get_postgres_cursor() as cur:
+            try:
+                start = time()
+                name = prepared.pop(sql, None)
+                if name is None:
+                    if len(prepared) >= _MAX_PREPARED_STATEMENTS:
+                        cur.execute("DEALLOCATE %s"
+                                    % prepared.popitem(last=False)[1])
+                    name = 'qiita_%s' % uuid4().hex
+                    cur.execute("PREPARE %s AS %s"
+                                % (name, _positional_placeholders(sql)))
+                # Keep it as the most recently used statement
+                prepared[sql] = name
+                if sql_args:
+                    cur.execute("EXECUTE %s (%s)"
+                                % (name, ', '.join(['%s'] * len(sql_args))),
+                                sql_args)
+                else:
+                    cur.execute("EXECUTE %s" % name)
+                record_query(sql, sql_args, time() - start, cur.rowcount)
+                result = cur.fetchall()
+                self._commit()
+            except PostgresError as e:
+                name = prepared.pop(sql, None)
+                self._rollback()
+                if name is not None:
+                    self._deallocate(cur, prepared, sql, name)
+                raise QiitaDBExecutionError(("\nError running SQL query: %s"
+                                             "\nARGS: %s"
+                                             "\nError: %s" %
+                                             (sql, str(sql_args), e)))
+        return result
+
+    def _deallocate(self, cur, prepared, sql, name):
+        """Deallocates the prepared statement `name` of `sql` after an error
+
+        Outside of a transaction it is deallocated, so it is prepared again
+        on the next execution in case the error left it unusable. Inside a
+        transaction it is kept, as the aborted transaction can't run
+        DEALLOCATE and prepared statements outlive rollbacks.
+        """
+        if _current_transaction(self.admin) is not None:
+            prepared[sql] = name
+            return
+        try:
+            cur.execute("DEALLOCATE %s" % name)
+            self._commit()
+        except PostgresError:
+            self._rollback()
+
+    def execute_iter(self, sql, sql_args=None, batch_size=1000,
+                     row_factory='dict'):
+        """Executes a query and iterates over its results using a server-side
+        cursor
+
+        Parameters
+        ----------
+        sql : str
+            The SQL query
+        sql_args : tuple or list, optional
+            The arguments for the SQL query
+        batch_size : int, optional
+            The number of rows fetched from the server in each round trip.
+            Default: 1000
+        row_factory : {'dict', 'tuple'}, optional
+            Whether the rows are returned as DictRow objects, as in
+            `execute_fetchall`, or as plain tuples. Default: 'dict'
+
+        Returns
+        -------
+        generator
+            The rows of the result, fetched from the server `batch_size` rows
+            at a time
+
+        Raises
+        ------
+        ValueError
+            If `row_factory` is not one of {'dict', 'tuple'}
+        QiitaDBExecutionError
+            If there is some error executing the SQL query
+
+        Notes
+        -----
+        A named cursor only lives inside its transaction, so the handler
+        should not be used to run other queries until the iteration is done
+        (or the generator is closed), as they would commit the transaction.
+        This does not apply inside a `transaction` block, which is only
+        committed when the block finishes.
+
+        Only the current batch of rows is kept in memory, so this method
+        should be preferred over `execute_fetchall` when the result can be
+        large and it is processed row by row.
+        """
+        if row_factory not in ('dict', 'tuple'):
+            raise ValueError("row_factory takes only 'dict' or 'tuple'")
+        self._check_sql_args(sql_args)
+
+        connection = self._get_connection()
+        cursor_factory = DictCursor if row_factory == 'dict' else None
+        finished = False
+        cur = None
+        try:
+            cur = connection.cursor(
+                'qiita_iter_%s' % uuid4().hex, cursor_factory=cursor_factory)
+            cur.itersize = batch_size
+            try:
+                start = time()
+                cur.execute(sql, sql_args)
+                record_query(sql, sql_args, time() - start)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row
+                cur.close()
+                self._commit()
+                finished = True
+            except PostgresError as e:
+                raise QiitaDBExecutionError(("\nError running SQL query: %s"
+                                             "\nARGS: %s"
+                                             "\nError: %s" %
+                                             (sql, str(sql_args), e)))
+        finally:
+            # Only reached without finishing if the query failed or the
+            # caller stopped iterating before consuming all the rows
+            if not finished and not connection.closed:
+                if _current_transaction(self.admin) is None:
+                    connection.rollback()
+                elif cur is not None and not cur.closed:
+                    # The transaction goes on, so the cursor has to be closed
+                    try:
+                        cur.close()
+                    except PostgresError:
+                        pass
+
     def execute_fetchone(self, sql, sql_args=None):
         """ Executes a fetchone SQL query
 
@@ -456,7 +1571,7 @@ class SQLConnectionHandler(object):
         with self._sql_executor(sql, sql_args):
             pass
 
-    def executemany(self, sql, sql_args_list):
+    def executemany(self, sql, sql_args_list, page_size=100):
         """ Executes an executemany SQL query with no results
 
         Parameters
@@ -465,6 +1580,10 @@ class SQLConnectionHandler(object):
             The SQL query
         sql_args : list of tuples
             The arguments for the SQL query
+        page_size : int, optional
+            If sql is an INSERT ... VALUES statement, the rows are inserted
+            with multi-row INSERTs of at most page_size rows, instead of one
+            INSERT per row. Default: 100
 
         Raises
         ------
@@ -476,7 +1595,7 @@ class SQLConnectionHandler(object):
             those elements, ordinary string formatting should be used before
             running execute.
         """
-        with self._sql_executor(sql, sql_args_list, True):
+        with self._sql_executor(sql, sql_args_list, True, page_size):
             pass
 
     def get_temp_queue(self):
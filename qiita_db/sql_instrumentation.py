@@ -0,0 +1,427 @@
+r"""
+SQL instrumentation (:mod:`qiita_db.sql_instrumentation`)
+==========================================================
+
+.. currentmodule:: qiita_db.sql_instrumentation
+
+This module records the SQL statements executed through
+`qiita_db.sql_connection.SQLConnectionHandler`. For each statement it keeps
+its fingerprint (the SQL with the literal values and whitespace normalized),
+the shape of its arguments, the duration, the number of rows and the qiita_db
+function that issued it.
+
+The statements are aggregated process-wide, per fingerprint, with a latency
+histogram, and also by any active `QueryCollector` of the current thread,
+which is how the statements issued by a single web request or job are
+accounted. The statements that take longer than the SLOW_QUERY_THRESHOLD
+option of the qiita configuration are logged to the `qiita_db.slow_queries`
+logger.
+
+Classes
+-------
+
+.. autosummary::
+   :toctree: generated/
+
+   QueryCollector
+
+Functions
+---------
+
+.. autosummary::
+   :toctree: generated/
+
+   fingerprint
+   args_shape
+   record_query
+   start_collecting
+   stop_collecting
+   collect_queries
+   run_collecting_queries
+   record_collector
+   query_stats
+   reset_query_stats
+
+Examples
+--------
+Count the statements issued by a block of code:
+
+from qiita_db.sql_instrumentation import collect_queries
+with collect_queries() as collector: # doctest: +SKIP
+    Study(1).title # doctest: +SKIP
+collector.summary()['count'] # doctest: +SKIP
+1
+"""
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+from __future__ import division
+from contextlib import contextmanager
+from bisect import bisect_left
+from threading import Lock, local
+from logging import getLogger, FileHandler, Formatter
+from sys import _getframe
+from time import time
+import re
+
+from qiita_core.qiita_settings import qiita_config
+
+
+# Upper bounds (in seconds) of the buckets of the latency histograms. The last
+# bucket holds everything slower than the last bound
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%(?:\([^)]*\))?s")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS_RE = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACES_RE = re.compile(r"\s+")
+
+_slow_logger = getLogger('qiita_db.slow_queries')
+if qiita_config.slow_query_log:
+    _handler = FileHandler(qiita_config.slow_query_log)
+    _handler.setFormatter(Formatter('%(asctime)s %(message)s'))
+    _slow_logger.addHandler(_handler)
+
+_stats_lock = Lock()
+_stats = {}
+_collector_stats = {}
+_local = local()
+
+# Cache of the fingerprints of the statements, as most of them are executed
+# many times. It is cleared when it grows over _MAX_FINGERPRINTS statements
+_MAX_FINGERPRINTS = 5000
+_fingerprints = {}
+
+
+def fingerprint(sql):
+    """Normalizes an SQL statement so all its executions are grouped together
+
+    Parameters
+    ----------
+    sql : str
+        The SQL statement
+
+    Returns
+    -------
+    str
+        The statement with the whitespace collapsed, the placeholders and
+        literal values replaced by ?, and the lists of values (e.g. of an IN
+        clause or a multi-row INSERT) collapsed to (...)
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _LIST_RE.sub('(...)', sql)
+    sql = _ROWS_RE.sub('(...)', sql)
+    return _SPACES_RE.sub(' ', sql).strip()
+
+
+def args_shape(sql_args, many=False):
+    """Describes the arguments of a statement without their values
+
+    Parameters
+    ----------
+    sql_args : tuple, list, dict or None
+        The arguments of the statement
+    many : bool, optional
+        Whether sql_args is the list of arguments of an executemany call
+
+    Returns
+    -------
+    str
+        e.g. 'none', 'list[3]', 'dict[3]' or '100x list[3]'
+    """
+    if many:
+        sql_args = list(sql_args)
+        inner = args_shape(sql_args[0]) if sql_args else 'none'
+        return '%dx %s' % (len(sql_args), inner)
+    if sql_args is None:
+        return 'none'
+    if isinstance(sql_args, (tuple, list, dict)):
+        return '%s[%d]' % (type(sql_args).__name__, len(sql_args))
+    return type(sql_args).__name__
+
+
+def _caller():
+    """Returns the qiita_db function that is executing the current statement
+    """
+    frame = _getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if (module.startswith('qiita_db.') and
+                module not in ('qiita_db.sql_connection', __name__)):
+            return '%s.%s' % (module, frame.f_code.co_name)
+        frame = frame.f_back
+    return None
+
+
+class QueryCollector(object):
+    """Aggregates the statements executed while it is active
+
+    Attributes
+    ----------
+    count : int
+        The number of statements executed
+    duration : float
+        The total time (in seconds) spent executing them
+    queries : dict of {str: dict}
+        For each fingerprint, the number of executions ('count'), their total
+        and maximum duration ('duration' and 'max_duration'), the number of
+        rows ('rows'), the shapes of the arguments ('shapes') and the
+        functions that issued it ('callers')
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.queries = {}
+
+    def add(self, fp, shape, duration, rowcount, caller):
+        """Adds an executed statement
+
+        Parameters
+        ----------
+        fp : str
+            The fingerprint of the statement
+        shape : str
+            The shape of its arguments
+        duration : float
+            The time (in seconds) it took to execute
+        rowcount : int
+            The number of rows it returned or modified (-1 if unknown)
+        caller : str or None
+            The qiita_db function that executed it
+        """
+        self.count += 1
+        self.duration += duration
+        query = self.queries.get(fp)
+        if query is None:
+            query = self.queries[fp] = {
+                'count': 0, 'duration': 0, 'max_duration': 0, 'rows': 0,
+                'shapes': set(), 'callers': set()}
+        query['count'] += 1
+        query['duration'] += duration
+        query['max_duration'] = max(query['max_duration'], duration)
+        query['rows'] += max(rowcount, 0)
+        query['shapes'].add(shape)
+        if caller is not None:
+            query['callers'].add(caller)
+
+    def summary(self, top=10):
+        """Summarizes the statements executed
+
+        Parameters
+        ----------
+        top : int, optional
+            The number of fingerprints to include, the most executed first.
+            Default: 10
+
+        Returns
+        -------
+        dict
+            The total 'count' and 'duration', and the 'top' fingerprints
+            with their aggregated values
+        """
+        queries = sorted(self.queries.items(),
+                         key=lambda q: (-q[1]['count'], -q[1]['duration']))
+        return {
+            'count': self.count,
+            'duration': self.duration,
+            'top': [dict(q, fingerprint=fp, shapes=sorted(q['shapes']),
+                         callers=sorted(q['callers']))
+                    for fp, q in queries[:top]]}
+
+
+def _active_collectors():
+    try:
+        return _local.collectors
+    except AttributeError:
+        _local.collectors = []
+        return _local.collectors
+
+
+def start_collecting():
+    """Starts collecting the statements executed by the current thread
+
+    Returns
+    -------
+    QueryCollector
+        The collector, which has to be passed to `stop_collecting`
+    """
+    collector = QueryCollector()
+    _active_collectors().append(collector)
+    return collector
+
+
+def stop_collecting(collector):
+    """Stops collecting statements in collector
+
+    Parameters
+    ----------
+    collector : QueryCollector
+        A collector returned by `start_collecting`
+    """
+    collectors = _active_collectors()
+    if collector in collectors:
+        collectors.remove(collector)
+
+
+@contextmanager
+def collect_queries():
+    """Collects the statements executed by the current thread in the block
+
+    Yields
+    ------
+    QueryCollector
+        The collector of the statements
+    """
+    collector = start_collecting()
+    try:
+        yield collector
+    finally:
+        stop_collecting(collector)
+
+
+def run_collecting_queries(func, job_name, *args, **kwargs):
+    """Runs func collecting its statements and logs a summary of them
+
+    Parameters
+    ----------
+    func : function
+        The function to run
+    job_name : str
+        The name used to identify the run in the log
+    args, kwargs
+        The arguments of func
+
+    Returns
+    -------
+    object
+        The value returned by func
+
+    Notes
+    -----
+    This is used by `qiita_ware.wrapper.ParallelWrapper` to account the
+    statements of each job in the process that executes it. The jobs are
+    aggregated by the name of func, see `record_collector`.
+    """
+    with collect_queries() as collector:
+        start = time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record_collector('job:%s' % func.__name__, collector)
+            summary = collector.summary(top=3)
+            getLogger('qiita_db.sql').info(
+                "Job %s executed %d queries in %.3fs (total %.3fs): %s",
+                job_name, summary['count'], summary['duration'],
+                time() - start,
+                '; '.join('%dx %s' % (q['count'], q['fingerprint'])
+                          for q in summary['top']))
+
+
+def record_collector(name, collector):
+    """Aggregates the statements collected during a unit of work
+
+    Parameters
+    ----------
+    name : str
+        The name used to aggregate similar units of work, e.g. the handler
+        and HTTP method of a web request
+    collector : QueryCollector
+        The collector of the statements executed by the unit of work
+    """
+    with _stats_lock:
+        stats = _collector_stats.get(name)
+        if stats is None:
+            stats = _collector_stats[name] = {
+                'runs': 0, 'queries': 0, 'max_queries': 0, 'duration': 0}
+        stats['runs'] += 1
+        stats['queries'] += collector.count
+        stats['max_queries'] = max(stats['max_queries'], collector.count)
+        stats['duration'] += collector.duration
+
+
+def record_query(sql, sql_args, duration, rowcount=-1, many=False):
+    """Records an executed statement
+
+    Parameters
+    ----------
+    sql : str
+        The SQL statement
+    sql_args : tuple, list, dict or None
+        Its arguments
+    duration : float
+        The time (in seconds) it took to execute
+    rowcount : int, optional
+        The number of rows it returned or modified. Default: -1 (unknown)
+    many : bool, optional
+        Whether sql_args is the list of arguments of an executemany call
+    """
+    fp = _fingerprints.get(sql)
+    if fp is None:
+        if len(_fingerprints) >= _MAX_FINGERPRINTS:
+            _fingerprints.clear()
+        fp = _fingerprints[sql] = fingerprint(sql)
+    shape = args_shape(sql_args, many)
+    caller = _caller()
+
+    with _stats_lock:
+        stats = _stats.get(fp)
+        if stats is None:
+            stats = _stats[fp] = {
+                'count': 0, 'duration': 0, 'max_duration': 0,
+                'histogram': [0] * (len(LATENCY_BUCKETS) + 1),
+                'callers': set()}
+        stats['count'] += 1
+        stats['duration'] += duration
+        stats['max_duration'] = max(stats['max_duration'], duration)
+        stats['histogram'][bisect_left(LATENCY_BUCKETS, duration)] += 1
+        if caller is not None:
+            stats['callers'].add(caller)
+
+    for collector in _active_collectors():
+        collector.add(fp, shape, duration, rowcount, caller)
+
+    threshold = qiita_config.slow_query_threshold
+    if threshold > 0 and duration >= threshold:
+        _slow_logger.warning(
+            "Slow query (%.3fs, %d rows, args %s, called from %s): %s",
+            duration, rowcount, shape, caller, fp)
+
+
+def query_stats():
+    """Returns the statements executed by the process, per fingerprint
+
+    Returns
+    -------
+    dict
+        The 'buckets' of the latency histograms (the upper bound of each
+        bucket, in seconds); for each fingerprint in 'queries', the number of
+        executions ('count'), their total and maximum duration ('duration'
+        and 'max_duration'), the latency 'histogram' and the functions that
+        issued it ('callers'); and for each name in 'collectors', the number
+        of units of work recorded ('runs'), the number of statements they
+        executed ('queries' and 'max_queries' in a single run) and the time
+        spent executing them ('duration')
+    """
+    with _stats_lock:
+        queries = {fp: dict(stats, histogram=list(stats['histogram']),
+                            callers=sorted(stats['callers']))
+                   for fp, stats in _stats.items()}
+        collectors = {name: dict(stats)
+                      for name, stats in _collector_stats.items()}
+    return {'buckets': list(LATENCY_BUCKETS), 'queries': queries,
+            'collectors': collectors}
+
+
+def reset_query_stats():
+    """Clears the statements recorded by the process"""
+    with _stats_lock:
+        _stats.clear()
+        _collector_stats.clear()
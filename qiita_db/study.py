@@ -290,10 +290,7 @@ class Study(QiitaStatusObject):
         str
             Title of study
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT study_title FROM qiita.{0} WHERE "
-               "study_id = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('study_title')
 
     @title.setter
     def title(self, title):
@@ -318,15 +315,14 @@ class Study(QiitaStatusObject):
         dict
             info of study keyed to column names
         """
-        conn_handler = SQLConnectionHandler()
-        sql = "SELECT * FROM qiita.{0} WHERE study_id = %s".format(self._table)
-        info = dict(conn_handler.execute_fetchone(sql, (self._id, )))
+        info = dict(self._get_row())
         # remove non-info items from info
         for item in self._non_info:
             info.pop(item)
         # This is an optional column, but should not be considered part of the
-        # info
+        # info. The status is loaded with the row
         info.pop('study_id')
+        info.pop('status')
         return info
 
     @info.setter
@@ -527,11 +523,7 @@ class Study(QiitaStatusObject):
         str
             The email (id) of the user that owns this study
         """
-        conn_handler = SQLConnectionHandler()
-        sql = """select email from qiita.{} where study_id = %s""".format(
-            self._table)
-
-        return conn_handler.execute_fetchone(sql, [self._id])[0]
+        return self._row_value('email')
 
     @property
     def environmental_packages(self):
@@ -885,10 +877,7 @@ class StudyPerson(QiitaObject):
         str
             Name of person
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT name FROM qiita.{0} WHERE "
-               "study_person_id = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('name')
 
     @property
     def email(self):
@@ -899,10 +888,7 @@ class StudyPerson(QiitaObject):
         str
             Email of person
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT email FROM qiita.{0} WHERE "
-               "study_person_id = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('email')
 
     @property
     def affiliation(self):
@@ -913,10 +899,7 @@ class StudyPerson(QiitaObject):
         str
             Affiliation of person
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT affiliation FROM qiita.{0} WHERE "
-               "study_person_id = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, [self._id])[0]
+        return self._row_value('affiliation')
 
     @property
     def address(self):
@@ -927,10 +910,7 @@ class StudyPerson(QiitaObject):
         str or None
             address or None if no address in database
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT address FROM qiita.{0} WHERE study_person_id ="
-               " %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('address')
 
     @address.setter
     def address(self, value):
@@ -955,10 +935,7 @@ class StudyPerson(QiitaObject):
          str or None
             phone or None if no address in database
         """
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT phone FROM qiita.{0} WHERE "
-               "study_person_id = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('phone')
 
     @phone.setter
     def phone(self, value):
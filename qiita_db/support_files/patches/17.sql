@@ -0,0 +1,56 @@
+--Oct 16, 2026
+--Adds a cross-study index of the sample metadata stored in the study-specific
+--sample tables, so the metadata can be searched without scanning them
+CREATE TABLE qiita.sample_metadata_index ( 
+	study_id             bigint  NOT NULL,
+	sample_id            varchar  NOT NULL,
+	column_name          varchar  NOT NULL,
+	value_varchar        varchar  NOT NULL,
+	value_float          float8  ,
+	CONSTRAINT pk_sample_metadata_index PRIMARY KEY ( sample_id, column_name )
+ ) ;
+
+CREATE INDEX idx_sample_metadata_index ON qiita.sample_metadata_index ( study_id ) ;
+
+CREATE INDEX idx_sample_metadata_index_0 ON qiita.sample_metadata_index ( column_name, value_varchar ) ;
+
+CREATE INDEX idx_sample_metadata_index_1 ON qiita.sample_metadata_index ( column_name, value_float ) ;
+
+COMMENT ON TABLE qiita.sample_metadata_index IS 'Holds a row per non-null value of the study-specific sample tables (sample_<study_id>), so the metadata of all the studies can be searched with a single query. It is kept up to date by SampleTemplate.';
+
+COMMENT ON COLUMN qiita.sample_metadata_index.column_name IS 'The name of the column in the study-specific table, which is lower case';
+
+COMMENT ON COLUMN qiita.sample_metadata_index.value_varchar IS 'The value cast to varchar';
+
+COMMENT ON COLUMN qiita.sample_metadata_index.value_float IS 'The value, if the column is numeric';
+
+ALTER TABLE qiita.sample_metadata_index ADD CONSTRAINT fk_sample_metadata_index FOREIGN KEY ( study_id ) REFERENCES qiita.study( study_id )    ;
+
+--Populates the index with the metadata of the existing sample templates,
+--unpivoting each study-specific table the same way SampleTemplate does
+DO $index_metadata$
+    DECLARE
+        st record;
+        cols varchar;
+    BEGIN
+        FOR st IN SELECT DISTINCT study_id FROM qiita.required_sample_info LOOP
+            SELECT string_agg(format('(%L, s.%I::varchar, %s)',
+                                     column_name, column_name,
+                                     CASE WHEN data_type IN ('smallint', 'integer', 'bigint', 'real', 'double precision', 'numeric')
+                                          THEN format('s.%I::float8', column_name)
+                                          ELSE 'NULL::float8' END), ', ')
+                INTO cols
+                FROM information_schema.columns
+                WHERE table_schema = 'qiita'
+                    AND table_name = 'sample_' || st.study_id
+                    AND column_name <> 'sample_id';
+            IF cols IS NOT NULL THEN
+                EXECUTE format('INSERT INTO qiita.sample_metadata_index (study_id, sample_id, column_name, value_varchar, value_float) '
+                               'SELECT %s, s.sample_id, v.column_name, v.value_varchar, v.value_float '
+                               'FROM qiita.%I s, LATERAL (VALUES %s) AS v (column_name, value_varchar, value_float) '
+                               'WHERE v.value_varchar IS NOT NULL',
+                               st.study_id, 'sample_' || st.study_id, cols);
+            END IF;
+        END LOOP;
+    END;
+    $index_metadata$;
@@ -0,0 +1,18 @@
+--Oct 16, 2026
+--Adds the indexes used by the includes and startswith search operators, which
+--are compiled to LOWER(column) LIKE '%value%' and LOWER(column) LIKE 'value%'.
+--The trigram indexes serve both patterns, and the prefix index also serves the
+--prefixes that are too short to be split in trigrams
+--pg_trgm is a contrib module and, before PostgreSQL 13, only a superuser can
+--create it, see INSTALL.md
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX idx_sample_metadata_index_2 ON qiita.sample_metadata_index USING gin ( lower(value_varchar) gin_trgm_ops ) ;
+
+CREATE INDEX idx_sample_metadata_index_3 ON qiita.sample_metadata_index ( lower(value_varchar) varchar_pattern_ops ) ;
+
+CREATE INDEX idx_required_sample_info_2 ON qiita.required_sample_info USING gin ( lower(sample_type) gin_trgm_ops ) ;
+
+CREATE INDEX idx_required_sample_info_3 ON qiita.required_sample_info USING gin ( lower(host_subject_id) gin_trgm_ops ) ;
+
+CREATE INDEX idx_required_sample_info_4 ON qiita.required_sample_info USING gin ( lower(description) gin_trgm_ops ) ;
@@ -184,6 +184,33 @@ INSERT INTO qiita.sample_1 (sample_id, SEASON_ENVIRONMENT, ASSIGNED_FROM_GEO, TE
 	('1.SKD5.640186', 'winter', 'n', '66 sand, 16.3 silt, 17.7 clay', '939928', 0.15, '3483', 'rhizosphere metagenome', 0.178, 114, 15, 1.51, 7.1, 0, 'ENVO:Temperate grasslands, savannas, and shrubland biome', 'GAZ:United States of America', 6.8, 'SKD5', 4.32, 'Diesel Rhizo', 'ENVO:plant-associated habitat'),
 	('1.SKD1.640179', 'winter', 'n', '66 sand, 16.3 silt, 17.7 clay', '410658', 0.15, '3483', 'soil metagenome', 0.178, 114, 15, 1.51, 7.1, 0, 'ENVO:Temperate grasslands, savannas, and shrubland biome', 'GAZ:United States of America', 6.8, 'SKD1', 4.32, 'Diesel bulk', 'ENVO:plant-associated habitat');
 
+-- Index the sample_1 dynamic table in the sample metadata index
+INSERT INTO qiita.sample_metadata_index (study_id, sample_id, column_name, value_varchar, value_float)
+	SELECT 1, s.sample_id, v.column_name, v.value_varchar, v.value_float
+	FROM qiita.sample_1 s, LATERAL (VALUES
+		('season_environment', s.season_environment, NULL::float8),
+		('assigned_from_geo', s.assigned_from_geo, NULL::float8),
+		('texture', s.texture, NULL::float8),
+		('taxon_id', s.taxon_id, NULL::float8),
+		('depth', s.depth::varchar, s.depth),
+		('host_taxid', s.host_taxid, NULL::float8),
+		('common_name', s.common_name, NULL::float8),
+		('water_content_soil', s.water_content_soil::varchar, s.water_content_soil),
+		('elevation', s.elevation::varchar, s.elevation),
+		('temp', s.temp::varchar, s.temp),
+		('tot_nitro', s.tot_nitro::varchar, s.tot_nitro),
+		('samp_salinity', s.samp_salinity::varchar, s.samp_salinity),
+		('altitude', s.altitude::varchar, s.altitude),
+		('env_biome', s.env_biome, NULL::float8),
+		('country', s.country, NULL::float8),
+		('ph', s.ph::varchar, s.ph),
+		('anonymized_name', s.anonymized_name, NULL::float8),
+		('tot_org_carb', s.tot_org_carb::varchar, s.tot_org_carb),
+		('description_duplicate', s.description_duplicate, NULL::float8),
+		('env_feature', s.env_feature, NULL::float8)
+	) AS v (column_name, value_varchar, value_float)
+	WHERE v.value_varchar IS NOT NULL;
+
 -- Create a new prep template for the added raw data
 INSERT INTO qiita.prep_template (data_type_id, raw_data_id, preprocessing_status, investigation_type) VALUES (2, 1, 'success', 'Metagenomics');
 
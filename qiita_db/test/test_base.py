@@ -10,10 +10,15 @@ from unittest import TestCase, main
 
 from qiita_core.exceptions import IncompetentQiitaDeveloperError
 from qiita_core.util import qiita_test_checker
-from qiita_db.base import QiitaObject, QiitaStatusObject
+from qiita_db.base import (QiitaObject, QiitaStatusObject, identity_map,
+                           prefetch)
 from qiita_db.exceptions import QiitaDBUnknownIDError
 from qiita_db.data import RawData
-from qiita_db.study import Study
+from qiita_db.analysis import Collection
+from qiita_db.study import Study, StudyPerson
+from qiita_db.user import User
+from qiita_db.metadata_template import SampleTemplate
+from qiita_db.sql_instrumentation import collect_queries
 
 
 @qiita_test_checker()
@@ -70,6 +75,138 @@ class QiitaBaseTest(TestCase):
         new = Study(1)
         self.assertNotEqual(self.tester, new)
 
+    def test_identity_map(self):
+        """Objects are constructed once while the identity map is active"""
+        with identity_map():
+            obs = RawData(1)
+            with collect_queries() as collector:
+                self.assertIs(RawData(1), obs)
+            self.assertEqual(collector.count, 0)
+            self.assertIsNot(RawData(2), obs)
+            self.assertIsNot(Study(1), obs)
+        self.assertIsNot(RawData(1), obs)
+        self.assertEqual(RawData(1), obs)
+
+    def test_identity_map_nested(self):
+        """A nested identity map keeps using the outer one"""
+        with identity_map():
+            obs = RawData(1)
+            with identity_map():
+                self.assertIs(RawData(1), obs)
+            self.assertIs(RawData(1), obs)
+
+    def test_identity_map_unknown_id(self):
+        """Unknown ids are not cached"""
+        with identity_map():
+            with self.assertRaises(QiitaDBUnknownIDError):
+                RawData(10)
+            with self.assertRaises(QiitaDBUnknownIDError):
+                RawData(10)
+
+    def test_identity_map_delete(self):
+        """Deleted objects are removed from the identity map"""
+        with identity_map():
+            Collection(1)
+            Collection.delete(1)
+            with self.assertRaises(QiitaDBUnknownIDError):
+                Collection(1)
+
+    def test_from_ids(self):
+        """Constructs all the objects with a single query"""
+        with collect_queries() as collector:
+            obs = RawData.from_ids([2, 1, 2])
+        self.assertEqual(collector.count, 1)
+        self.assertEqual(obs, [RawData(2), RawData(1), RawData(2)])
+        self.assertEqual(RawData.from_ids([]), [])
+
+    def test_from_ids_identity_map(self):
+        """The objects are taken from and added to the identity map"""
+        with identity_map():
+            rd = RawData(1)
+            with collect_queries() as collector:
+                obs = RawData.from_ids([1])
+            self.assertEqual(collector.count, 0)
+            self.assertIs(obs[0], rd)
+            obs = RawData.from_ids([2])
+            self.assertIs(RawData(2), obs[0])
+
+    def test_from_ids_user_and_template(self):
+        """Works with the classes that do not follow the id convention"""
+        obs = User.from_ids(['test@foo.bar', 'shared@foo.bar'])
+        self.assertEqual(obs, [User('test@foo.bar'), User('shared@foo.bar')])
+        self.assertEqual(SampleTemplate.from_ids([1]), [SampleTemplate(1)])
+
+    def test_from_ids_error(self):
+        """Raises an error if any of the ids does not exist"""
+        with self.assertRaises(QiitaDBUnknownIDError):
+            RawData.from_ids([1, 10])
+        with self.assertRaises(IncompetentQiitaDeveloperError):
+            QiitaObject.from_ids([1])
+
+    def test_row_cache(self):
+        """The properties are read from a single query of the row"""
+        study = Study(1)
+        with collect_queries() as collector:
+            title = study.title
+            owner = study.owner
+            status = study.status
+            study.info
+        self.assertEqual(collector.count, 1)
+        self.assertEqual(owner, 'test@foo.bar')
+        self.assertEqual(status, 'private')
+        self.assertEqual(title, self.conn_handler.execute_fetchone(
+            "SELECT study_title FROM qiita.study WHERE study_id = 1")[0])
+
+    def test_row_cache_invalidated_by_setter(self):
+        """Setting a property discards the cached row"""
+        study = Study(1)
+        study.title
+        study.title = 'New title'
+        self.assertEqual(study.title, 'New title')
+
+        person = StudyPerson(1)
+        person.address
+        person.address = '123 fake st'
+        self.assertEqual(person.address, '123 fake st')
+
+    def test_row_cache_unknown_id(self):
+        """Raises an error if the row does not exist anymore"""
+        person = StudyPerson(1)
+        person._id = 1000
+        with self.assertRaises(QiitaDBUnknownIDError):
+            person.name
+
+    def test_prefetch(self):
+        """Loads the rows of all the objects at once"""
+        studies = [Study(1), StudyPerson(1), StudyPerson(2)]
+        with collect_queries() as collector:
+            prefetch(studies)
+            obs = [studies[0].title, studies[1].name, studies[2].name]
+        # one query per class
+        self.assertEqual(collector.count, 2)
+        self.assertEqual(obs[1:], ['LabDude', 'empDude'])
+
+    def test_prefetch_fields(self):
+        """Only the fields are loaded, the rest of the row is loaded later"""
+        people = [StudyPerson(1), StudyPerson(2)]
+        with collect_queries() as collector:
+            prefetch(people, ['name'])
+            obs = [p.name for p in people]
+        self.assertEqual(collector.count, 1)
+        self.assertEqual(obs, ['LabDude', 'empDude'])
+        with collect_queries() as collector:
+            obs = people[0].email
+        self.assertEqual(collector.count, 1)
+        self.assertEqual(obs, 'lab_dude@foo.bar')
+
+    def test_prefetch_joined_fields(self):
+        """The columns of the joined tables can be prefetched"""
+        studies = [Study(1)]
+        prefetch(studies, ['status'])
+        with collect_queries() as collector:
+            self.assertEqual(studies[0].status, 'private')
+        self.assertEqual(collector.count, 0)
+
 
 @qiita_test_checker()
 class QiitaStatusObjectTest(TestCase):
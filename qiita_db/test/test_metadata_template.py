@@ -13,9 +13,11 @@ from datetime import datetime
 from tempfile import mkstemp
 from time import strftime
 from os import close, remove
-from os.path import join, basename
+from os.path import join, basename, exists
 from collections import Iterable
+from gzip import open as gzopen
 
+import numpy as np
 import numpy.testing as npt
 import pandas as pd
 from pandas.util.testing import assert_frame_equal
@@ -29,6 +31,7 @@ from qiita_db.exceptions import (QiitaDBDuplicateError, QiitaDBUnknownIDError,
                                  QiitaDBColumnError, QiitaDBError,
                                  QiitaDBWarning)
 from qiita_db.study import Study, StudyPerson
+from qiita_db.sql_instrumentation import collect_queries
 from qiita_db.user import User
 from qiita_db.data import RawData
 from qiita_db.util import (exists_table, get_db_files_base_dir, get_mountpoint,
@@ -36,7 +39,8 @@ from qiita_db.util import (exists_table, get_db_files_base_dir, get_mountpoint,
 from qiita_db.metadata_template import (
     _get_datatypes, _as_python_types, MetadataTemplate, SampleTemplate,
     PrepTemplate, BaseSample, PrepSample, Sample, _prefix_sample_names_with_id,
-    load_template_to_dataframe, get_invalid_sample_names)
+    load_template_to_dataframe, get_invalid_sample_names, template_changeset,
+    read_template_backup)
 
 
 class TestUtilMetadataMap(TestCase):
@@ -275,6 +279,36 @@ class TestSample(TestCase):
         """get returns none if the sample id is not present"""
         self.assertTrue(self.tester.get('Not_a_Category') is None)
 
+    def test_row_buffer(self):
+        """The samples of a template share a single query for their metadata
+        """
+        sample_template = SampleTemplate(1)
+        sample_template.to_dataframe(columns=['ph'])
+        with collect_queries() as collector:
+            obs = {sample.id: (sample['ph'], len(sample))
+                   for sample in sample_template.values()}
+        # one query for the sample ids, one for the columns of the dynamic
+        # table, which are not cached, and another for all the metadata
+        self.assertEqual(collector.count, 3)
+        self.assertEqual(len(obs), 27)
+        self.assertEqual(obs[self.sample_id], (6.94, 30))
+
+    def test_row_buffer_invalidation(self):
+        """Writing a sample discards its metadata from the template buffer"""
+        other = self.sample_template['1.SKD8.640184']
+        self.assertEqual(self.tester['tot_nitro'], 1.41)
+        self.assertEqual(other['tot_nitro'], 1.51)
+        self.tester['tot_nitro'] = '12.5'
+        with collect_queries() as collector:
+            self.assertEqual(other['tot_nitro'], 1.51)
+        self.assertEqual(collector.count, 0)
+        self.assertEqual(self.tester['tot_nitro'], 12.5)
+
+        self.sample_template.update_category('tot_nitro',
+                                             {'1.SKD8.640184': 5.5})
+        self.assertEqual(other['tot_nitro'], 5.5)
+        self.assertEqual(self.tester['tot_nitro'], 12.5)
+
 
 @qiita_test_checker()
 class TestPrepSample(TestCase):
@@ -887,6 +921,42 @@ class TestSampleTemplate(TestCase):
         with self.assertRaises(QiitaDBColumnError):
             SampleTemplate.create(self.metadata, self.new_study)
 
+    def test_validate(self):
+        obs = SampleTemplate.validate(self.metadata, self.new_study.id)
+        self.assertEqual(len(obs), 0)
+        self.assertEqual(obs.messages(), [])
+        obs.raise_errors()
+
+    def test_validate_report(self):
+        """validate reports all the problems of the template at once"""
+        metadata = self.metadata.copy()
+        metadata.index = ['Sample.1', 'Sample 2', 'Sample.1']
+        metadata['latitude'] = ['42.42', 'north', 4.8]
+        metadata['has_physical_specimen'] = [True, 'maybe', 'False']
+        del metadata['sample_type']
+
+        obs = SampleTemplate.validate(metadata, self.new_study.id)
+        self.assertEqual(obs.invalid_sample_names, ['Sample 2'])
+        self.assertEqual(obs.duplicated_sample_names, ['Sample.1'])
+        self.assertEqual(obs.duplicated_columns, set())
+        self.assertEqual(obs.missing_columns, {'sample_type'})
+        self.assertEqual(obs.invalid_values,
+                         {'latitude': ['Sample 2'],
+                          'has_physical_specimen': ['Sample 2']})
+        self.assertEqual(len(obs), 5)
+        with self.assertRaises(QiitaDBColumnError):
+            obs.raise_errors()
+        # the template is not modified
+        self.assertIn('Description', metadata.columns)
+
+    def test_validate_duplicate_header(self):
+        self.metadata['STR_COLUMN'] = pd.Series(['', '', ''],
+                                                index=self.metadata.index)
+        obs = SampleTemplate.validate(self.metadata, self.new_study.id)
+        self.assertEqual(obs.duplicated_columns, {'str_column'})
+        with self.assertRaises(QiitaDBDuplicateHeaderError):
+            obs.raise_errors()
+
     def test_create_error_cleanup(self):
         """Create does not modify the database if an error happens"""
         metadata_dict = {
@@ -1188,12 +1258,56 @@ class TestSampleTemplate(TestCase):
         with self.assertRaises(ValueError):
             st.update_category('int_column', mapping)
 
+        # the samples are updated in a single transaction, so if one of them
+        # fails none of them is updated
+        mapping = {'2.Sample1': 5, '2.Sample2': "no_value"}
+        with self.assertRaises(ValueError):
+            st.update_category('int_column', mapping)
+        self.assertEqual(st['2.Sample1']['int_column'], 1)
+        self.assertEqual(st['2.Sample2']['int_column'], 2)
+
+    def test_update_category_single_statement(self):
+        mapping = {sid: 'country %s' % sid for sid in self.tester.keys()}
+        with collect_queries() as collector:
+            self.tester.update_category('country', mapping)
+        updates = [q for q in collector.summary()['top']
+                   if q['fingerprint'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(updates[0]['count'], 1)
+        self.assertEqual(updates[0]['rows'], 27)
+        self.assertEqual(self.tester['1.SKB1.640202']['country'],
+                         'country 1.SKB1.640202')
+
+    def test_update_category_mixed_types(self):
+        # values of different types are cast to the type of the column
+        mapping = {'1.SKB1.640202': 1, '1.SKB5.640181': '2.5',
+                   '1.SKD6.640190': 3.5}
+        self.tester.update_category('latitude', mapping)
+        self.assertEqual(self.tester['1.SKB1.640202']['latitude'], 1.0)
+        self.assertEqual(self.tester['1.SKB5.640181']['latitude'], 2.5)
+        self.assertEqual(self.tester['1.SKD6.640190']['latitude'], 3.5)
+
+    def test_update_category_int_column_float_values(self):
+        # pandas loads integer columns with missing values as floats
+        st = SampleTemplate.create(self.metadata, self.new_study)
+        mapping = {'2.Sample1': 7.0, '2.Sample2': np.float64(8.0)}
+        st.update_category('int_column', mapping)
+        self.assertEqual(st['2.Sample1']['int_column'], 7)
+        self.assertEqual(st['2.Sample2']['int_column'], 8)
+        self.assertEqual(st['2.Sample3']['int_column'], 3)
+
     def test_update(self):
         """Updates values in existing mapping file"""
         # creating a new sample template
         st = SampleTemplate.create(self.metadata, self.new_study)
         # updating the sample template
-        st.update(self.metadata_dict_updated)
+        changes = st.update(self.metadata_dict_updated)
+        self.assertEqual(set(changes.changed), {
+            ('2.Sample1', 'sample_type'), ('2.Sample2', 'sample_type'),
+            ('2.Sample2', 'host_subject_id'), ('2.Sample3', 'sample_type'),
+            ('2.Sample3', 'physical_location')})
+        self.assertEqual(changes.changed[('2.Sample3', 'physical_location')],
+                         ('location1', 'new location'))
 
         # validating values
         exp = self.metadata_dict_updated_dict['Sample1'].values()
@@ -1214,6 +1328,29 @@ class TestSampleTemplate(TestCase):
         with self.assertRaises(QiitaDBError):
             st.update(self.metadata_dict_updated_column_error)
 
+    def test_update_unchanged(self):
+        """Re-uploading the stored template doesn't change any cell"""
+        fd, fp = mkstemp()
+        close(fd)
+        self._clean_up_files.append(fp)
+        st = SampleTemplate.create(self.metadata, self.new_study)
+        st.to_file(fp)
+
+        changes = st.update(load_template_to_dataframe(fp))
+        self.assertEqual(len(changes), 0)
+
+    def test_update_numeric_hash_collision(self):
+        # hash(-1) == hash(-2), the change must not be skipped
+        st = SampleTemplate.create(self.metadata, self.new_study)
+        st.update_category('int_column', {'2.Sample1': -1})
+        md = self.metadata.copy()
+        md.loc['Sample1', 'int_column'] = -2
+
+        changes = st.update(md)
+        self.assertEqual(changes.changed,
+                         {('2.Sample1', 'int_column'): (-1, -2)})
+        self.assertEqual(st['2.Sample1']['int_column'], -2)
+
     def test_add_category(self):
         column = "new_column"
         dtype = "varchar"
@@ -1278,6 +1415,36 @@ class TestSampleTemplate(TestCase):
         for v in self.tester.values():
             self.assertNotIn('elevation', v)
 
+    def test_metadata_index(self):
+        sql = ("SELECT sample_id, column_name, value_varchar, value_float "
+               "FROM qiita.sample_metadata_index WHERE study_id = %s "
+               "ORDER BY sample_id, column_name")
+        st = SampleTemplate.create(self.metadata, self.new_study)
+        obs = self.conn_handler.execute_fetchall(sql, (2, ))
+        exp = [['2.Sample1', 'int_column', '1', 1],
+               ['2.Sample1', 'str_column', 'Value for sample 1', None],
+               ['2.Sample2', 'int_column', '2', 2],
+               ['2.Sample2', 'str_column', 'Value for sample 2', None],
+               ['2.Sample3', 'int_column', '3', 3],
+               ['2.Sample3', 'str_column', 'Value for sample 3', None]]
+        self.assertEqual(obs, exp)
+
+        st.update_category('int_column', {'2.Sample1': 10})
+        st['2.Sample2']['int_column'] = 20
+        st.add_category('new_column', {'2.Sample3': 'foo'}, 'varchar', 'bar')
+        st.remove_category('str_column')
+        obs = self.conn_handler.execute_fetchall(sql, (2, ))
+        exp = [['2.Sample1', 'int_column', '10', 10],
+               ['2.Sample1', 'new_column', 'bar', None],
+               ['2.Sample2', 'int_column', '20', 20],
+               ['2.Sample2', 'new_column', 'bar', None],
+               ['2.Sample3', 'int_column', '3', 3],
+               ['2.Sample3', 'new_column', 'foo', None]]
+        self.assertEqual(obs, exp)
+
+        SampleTemplate.delete(2)
+        self.assertEqual(self.conn_handler.execute_fetchall(sql, (2, )), [])
+
     def test_iter(self):
         """iter returns an iterator over the sample ids"""
         obs = self.tester.__iter__()
@@ -1292,6 +1459,22 @@ class TestSampleTemplate(TestCase):
         """contains returns false if the sample id does not exists"""
         self.assertFalse('Not_a_Sample' in self.tester)
 
+    def test_contains_point_lookup(self):
+        """contains only looks up the sample until the ids are loaded"""
+        with collect_queries() as collector:
+            self.assertTrue('1.SKM7.640188' in self.tester)
+        obs = collector.summary()['top'][0]
+        self.assertEqual(obs['count'], 1)
+        self.assertEqual(obs['rows'], 1)
+
+        self.assertEqual(len(self.tester), 27)
+        with collect_queries() as collector:
+            self.assertTrue('1.SKM7.640188' in self.tester)
+            self.assertFalse('Not_a_Sample' in self.tester)
+            self.assertEqual(set(self.tester.keys()), self.exp_sample_ids)
+            self.tester['1.SKM7.640188']
+        self.assertEqual(collector.count, 0)
+
     def test_keys(self):
         """keys returns an iterator over the sample ids"""
         obs = self.tester.keys()
@@ -1401,6 +1584,74 @@ class TestSampleTemplate(TestCase):
             obs = f.read()
         self.assertEqual(obs, EXP_SAMPLE_TEMPLATE_FEWER_SAMPLES)
 
+    def test_to_file_codepoint_order(self):
+        # the rows are sorted by codepoint, whatever the locale of the server
+        fd, fp = mkstemp()
+        close(fd)
+        self._clean_up_files.append(fp)
+        self.metadata.index = ['SampleA', 'Sample.b', 'Sample1']
+        st = SampleTemplate.create(self.metadata, self.new_study)
+        st.to_file(fp)
+        with open(fp, 'U') as f:
+            obs = [line.split('\t', 1)[0] for line in f][1:]
+        self.assertEqual(obs, ['2.Sample.b', '2.Sample1', '2.SampleA'])
+
+    def test_to_file_compress(self):
+        """to file writes a gzip compressed file if requested"""
+        fd, fp = mkstemp(suffix='.txt.gz')
+        close(fd)
+        st = SampleTemplate.create(self.metadata, self.new_study)
+        self._clean_up_files.append(fp)
+        st.to_dataframe()
+        with collect_queries() as collector:
+            st.to_file(fp, compress=True)
+        # the columns of the dynamic table and the metadata
+        self.assertEqual(collector.count, 2)
+        with gzopen(fp) as f:
+            obs = f.read()
+        self.assertEqual(obs, EXP_SAMPLE_TEMPLATE)
+
+    def test_to_dataframe(self):
+        st = SampleTemplate.create(self.metadata, self.new_study)
+        st.to_dataframe()
+        with collect_queries() as collector:
+            obs = st.to_dataframe()
+        # the columns of the dynamic table and the metadata
+        self.assertEqual(collector.count, 2)
+
+        self.assertEqual(list(obs.index),
+                         ['2.Sample1', '2.Sample2', '2.Sample3'])
+        exp = {'collection_timestamp', 'description', 'has_extracted_data',
+               'has_physical_specimen', 'host_subject_id', 'int_column',
+               'latitude', 'longitude', 'physical_location',
+               'required_sample_info_status', 'sample_type', 'str_column'}
+        self.assertEqual(set(obs.columns), exp)
+        self.assertEqual(list(obs['required_sample_info_status']),
+                         ['received', 'received', 'received'])
+        self.assertEqual(list(obs['int_column']), [1, 2, 3])
+        self.assertEqual(list(obs['latitude']), [42.42, 4.2, 4.8])
+        self.assertEqual(list(obs['str_column']),
+                         ['Value for sample 1', 'Value for sample 2',
+                          'Value for sample 3'])
+        self.assertEqual(obs['collection_timestamp'].dtype,
+                         'datetime64[ns]')
+        self.assertEqual(obs['collection_timestamp'][0],
+                         datetime(2014, 5, 29, 12, 24, 51))
+
+    def test_to_dataframe_samples_columns(self):
+        st = SampleTemplate.create(self.metadata, self.new_study)
+        obs = st.to_dataframe(samples={'2.Sample1', '2.Sample3', 'Foo'},
+                              columns=['str_column', 'Physical_Location'])
+        self.assertEqual(list(obs.index), ['2.Sample1', '2.Sample3'])
+        self.assertEqual(list(obs.columns),
+                         ['str_column', 'physical_location'])
+        self.assertEqual(list(obs['str_column']),
+                         ['Value for sample 1', 'Value for sample 3'])
+
+    def test_to_dataframe_error(self):
+        with self.assertRaises(QiitaDBColumnError):
+            self.tester.to_dataframe(columns=['season_environment', 'foo'])
+
     def test_get_filepath(self):
         # we will check that there is a new id only because the path will
         # change based on time and the same functionality is being tested
@@ -1417,11 +1668,62 @@ class TestSampleTemplate(TestCase):
         st = SampleTemplate.create(self.metadata, self.new_study)
         self.assertEqual(st.get_filepaths()[0][0], exp_id)
 
+    def test_backup(self):
+        st = SampleTemplate.create(self.metadata, self.new_study)
+        fps = st.get_filepaths()
+        self.assertEqual(len(fps), 1)
+        self._clean_up_files.append(fps[0][1])
+        with open(fps[0][1], 'U') as f:
+            snapshot = f.read()
+        self.assertEqual(read_template_backup(fps[0][1]), snapshot)
+
+        # the template has not changed, so there is nothing to store
+        self.assertTrue(st._backup() is None)
+        self.assertEqual(st.get_filepaths(), fps)
+
+        # the newest backup is always stored in full
+        st.update_category('str_column', {'2.Sample1': 'New value'})
+        fp = st._backup()
+        self.assertTrue(fp.endswith('.txt'))
+        obs = st.get_filepaths()
+        self.assertEqual(len(obs), 2)
+        self.assertEqual(obs[0][1], fp)
+        self.assertEqual(obs[1], fps[0])
+        fp_id = obs[0][0]
+        with open(fp, 'U') as f:
+            exp = f.read()
+
+        # and the previous one is then stored as a delta against the snapshot
+        st.update_category('str_column', {'2.Sample2': 'New value'})
+        new_fp = st._backup()
+        self._clean_up_files.append(new_fp)
+        self.assertTrue(new_fp.endswith('.txt'))
+        obs = st.get_filepaths()
+        self.assertEqual(len(obs), 3)
+        self.assertEqual(obs[0][1], new_fp)
+        self.assertEqual(obs[1][0], fp_id)
+        self.assertTrue(obs[1][1].endswith('.delta.gz'))
+        self.assertEqual(obs[2], fps[0])
+        self._clean_up_files.append(obs[1][1])
+        self.assertFalse(exists(fp))
+
+        fd, exp_fp = mkstemp()
+        close(fd)
+        self._clean_up_files.append(exp_fp)
+        st.to_file(exp_fp)
+        with open(exp_fp, 'U') as f:
+            self.assertEqual(read_template_backup(new_fp), f.read())
+        self.assertEqual(read_template_backup(obs[1][1]), exp)
+        self.assertEqual(read_template_backup(fps[0][1]), snapshot)
+
     def test_extend(self):
         # add new column and delete one that exists
         self.metadata['NEWCOL'] = pd.Series(['val1', 'val2', 'val3'],
                                             index=self.metadata.index)
+        self.assertEqual(len(self.tester), 27)
         self.tester.extend(self.metadata)
+        self.assertEqual(len(self.tester), 30)
+        self.assertTrue('1.Sample1' in self.tester)
 
         # test samples were appended successfully
         sql = ("SELECT sample_id FROM qiita.required_sample_info WHERE "
@@ -1890,18 +2192,18 @@ class TestPrepTemplate(TestCase):
 
     def test_create_qiime_mapping_file(self):
         pt = PrepTemplate(1)
-
-        # creating prep template file
         _id, fp = get_mountpoint('templates')[0]
-        fpp = join(fp, '%d_prep_%d_%s.txt' % (pt.study_id, pt.id,
-                   strftime("%Y%m%d-%H%M%S")))
-        pt.to_file(fpp)
-        pt.add_filepath(fpp)
-
-        _, filepath = pt.get_filepaths()[0]
-        obs_fp = pt.create_qiime_mapping_file(filepath)
         exp_fp = join(fp, '1_prep_1_qiime_19700101-000000.txt')
 
+        with collect_queries() as collector:
+            obs_fp = pt.create_qiime_mapping_file()
+        if obs_fp != exp_fp:
+            self._clean_up_files.append(obs_fp)
+        mapping_queries = [q for q in collector.summary()['top']
+                           if 'LEFT JOIN' in q['fingerprint']]
+        self.assertEqual(len(mapping_queries), 1)
+        self.assertEqual(mapping_queries[0]['count'], 1)
+
         obs = pd.read_csv(obs_fp, sep='\t', infer_datetime_format=True,
                           parse_dates=True, index_col=False, comment='\t')
         exp = pd.read_csv(exp_fp, sep='\t', infer_datetime_format=True,
@@ -1909,22 +2211,40 @@ class TestPrepTemplate(TestCase):
 
         assert_frame_equal(obs, exp)
 
-        # testing failure, first lest remove some lines of the prep template
-        with open(filepath, 'r') as filepath_fh:
-            data = filepath_fh.read().splitlines()
-        with open(filepath, 'w') as filepath_fh:
-            for i, d in enumerate(data):
-                if i == 4:
-                    # adding fake sample
-                    line = d.split('\t')
-                    line[0] = 'fake_sample'
-                    line = '\t'.join(line)
-                    filepath_fh.write(line + '\n')
-                    break
-                filepath_fh.write(d + '\n')
+        # the mapping has not changed, so no new file is stored
+        filepaths = pt.get_filepaths()
+        self.assertEqual(pt.create_qiime_mapping_file(), obs_fp)
+        self.assertEqual(pt.get_filepaths(), filepaths)
+
+        # but it is stored once the metadata changes
+        SampleTemplate(1).update_category('ph', {'1.SKB1.640202': 7.5})
+        new_fp = pt.create_qiime_mapping_file()
+        self._clean_up_files.append(new_fp)
+        self.assertNotEqual(new_fp, obs_fp)
+        self.assertEqual(pt.get_filepaths()[0][1], new_fp)
+        obs = pd.read_csv(new_fp, sep='\t', index_col=0, comment='\t')
+        self.assertEqual(obs['ph']['1.SKB1.640202'], 7.5)
+
+    def test_create_qiime_mapping_file_null_values(self):
+        self.conn_handler.execute(
+            "UPDATE qiita.sample_1 SET ph = NULL, season_environment = NULL "
+            "WHERE sample_id = '1.SKB1.640202'")
+        pt = PrepTemplate(1)
+        obs_fp = pt.create_qiime_mapping_file()
+        self._clean_up_files.append(obs_fp)
+        with open(obs_fp, 'U') as f:
+            self.assertFalse('None' in f.read())
 
-        with self.assertRaises(ValueError):
-            pt.create_qiime_mapping_file(filepath)
+        # the missing values are written as 'unknown', as pandas did with
+        # na_rep='unknown'
+        _id, fp = get_mountpoint('templates')[0]
+        exp_fp = join(fp, '1_prep_1_qiime_19700101-000000.txt')
+        obs = pd.read_csv(obs_fp, sep='\t', index_col=0, comment='\t',
+                          na_values=['unknown'], keep_default_na=False)
+        exp = pd.read_csv(exp_fp, sep='\t', index_col=0, comment='\t',
+                          na_values=['unknown'], keep_default_na=False)
+        exp.loc['1.SKB1.640202', ['ph', 'season_environment']] = np.nan
+        assert_frame_equal(obs, exp)
 
     def test_create_data_type_id(self):
         """Creates a new PrepTemplate passing the data_type_id"""
@@ -2231,6 +2551,22 @@ class TestPrepTemplate(TestCase):
             obs = f.read()
         self.assertEqual(obs, EXP_PREP_TEMPLATE)
 
+    def test_to_dataframe(self):
+        obs = self.tester.to_dataframe()
+        self.assertEqual(len(obs), 27)
+        self.assertEqual(obs.index[0], '1.SKB1.640202')
+        self.assertEqual(set(obs['emp_status']), {'EMP'})
+        self.assertNotIn('emp_status_id', obs)
+        self.assertNotIn('prep_template_id', obs)
+        self.assertEqual(obs['barcodesequence']['1.SKB1.640202'],
+                         'GTCCGCAAGTTA')
+
+        obs = self.tester.to_dataframe(samples=['1.SKB8.640193'],
+                                       columns=['run_prefix'])
+        exp = pd.DataFrame({'run_prefix': ['s_G1_L001_sequences']},
+                           index=['1.SKB8.640193'])
+        assert_frame_equal(obs, exp)
+
     def test_data_type(self):
         """data_type returns the string with the data_type"""
         self.assertTrue(self.tester.data_type(), "18S")
@@ -2304,6 +2640,65 @@ class TestPrepTemplate(TestCase):
 
 class TestUtilities(TestCase):
 
+    def test_template_changeset(self):
+        current = pd.DataFrame.from_dict(
+            {'S1': {'a': 1, 'b': 'x', 'c': 'old'},
+             'S2': {'a': 2, 'b': 'y', 'c': 'old'},
+             'S3': {'a': 3, 'b': 'z', 'c': 'old'}}, orient='index')
+        new = pd.DataFrame.from_dict(
+            {'S1': {'a': 1.0, 'b': 'x', 'd': 'new'},
+             'S2': {'a': 5.0, 'b': 'y', 'd': 'new'},
+             'S4': {'a': 4.0, 'b': 'w', 'd': 'new'}}, orient='index')
+        obs = template_changeset(current, new)
+
+        self.assertEqual(obs.changed, {('S2', 'a'): (2, 5)})
+        self.assertEqual(obs.added, {('S1', 'd'): 'new', ('S2', 'd'): 'new',
+                                     ('S4', 'a'): 4, ('S4', 'b'): 'w',
+                                     ('S4', 'd'): 'new'})
+        self.assertEqual(obs.removed, {('S1', 'c'): 'old', ('S2', 'c'): 'old',
+                                       ('S3', 'a'): 3, ('S3', 'b'): 'z',
+                                       ('S3', 'c'): 'old'})
+        self.assertEqual(len(obs), 11)
+        self.assertEqual(obs.samples, {'S1', 'S2', 'S3', 'S4'})
+        self.assertEqual(obs.categories, {'a', 'b', 'c', 'd'})
+        self.assertEqual(obs.changed_by_category(), {'a': {'S2': 5}})
+
+    def test_template_changeset_no_changes(self):
+        current = pd.DataFrame.from_dict(
+            {'S1': {'a': 1, 'b': None, 'c': datetime(2014, 5, 29)}},
+            orient='index')
+        new = pd.DataFrame.from_dict(
+            {'S1': {'a': 1.0, 'b': float('nan'),
+                    'c': pd.Timestamp('2014-05-29')}}, orient='index')
+        self.assertEqual(len(template_changeset(current, new)), 0)
+
+    def test_template_changeset_hash_collision(self):
+        # hash(-1) == hash(-2), the rows must not be compared by their hashes
+        current = pd.DataFrame.from_dict(
+            {'S1': {'a': -1, 'b': 'x'}, 'S2': {'a': 1, 'b': 'y'}},
+            orient='index')
+        new = pd.DataFrame.from_dict(
+            {'S1': {'a': -2, 'b': 'x'}, 'S2': {'a': 1, 'b': 'y'}},
+            orient='index')
+        obs = template_changeset(current, new)
+        self.assertEqual(obs.changed, {('S1', 'a'): (-1, -2)})
+
+    def test_template_changeset_strings(self):
+        # the DB holds datetimes and numbers, the uploaded file may hold
+        # strings
+        current = pd.DataFrame.from_dict(
+            {'S1': {'a': 1, 'b': 'x', 'c': datetime(2014, 5, 29, 12, 24, 51)},
+             'S2': {'a': 2, 'b': '2', 'c': datetime(2014, 5, 29, 12, 24, 51)}},
+            orient='index')
+        new = pd.DataFrame.from_dict(
+            {'S1': {'a': '1.0', 'b': 'x', 'c': '2014-05-29 12:24:51'},
+             'S2': {'a': 2.0, 'b': '2', 'c': '05/30/14 12:24:51'}},
+            orient='index')
+        obs = template_changeset(current, new)
+        self.assertEqual(obs.changed, {
+            ('S2', 'c'): (pd.Timestamp('2014-05-29 12:24:51'),
+                          '05/30/14 12:24:51')})
+
     def test_load_template_to_dataframe(self):
         obs = load_template_to_dataframe(StringIO(EXP_SAMPLE_TEMPLATE))
         exp = pd.DataFrame.from_dict(SAMPLE_TEMPLATE_DICT_FORM)
@@ -2392,6 +2787,67 @@ class TestUtilities(TestCase):
         exp.index.name = 'sample_name'
         assert_frame_equal(obs, exp)
 
+    def test_load_template_to_dataframe_chunks(self):
+        obs = load_template_to_dataframe(
+            StringIO(EXP_SAMPLE_TEMPLATE_WHITESPACE), chunksize=2)
+        exp = pd.DataFrame.from_dict(SAMPLE_TEMPLATE_DICT_FORM)
+        exp.index.name = 'sample_name'
+        assert_frame_equal(obs, exp)
+
+    def test_load_template_to_dataframe_chunks_mixed_types(self):
+        # the chunks hold values of different types in the same column
+        template = (
+            "sample_name\tmixed\tnumeric\tbools\tsparse\n"
+            "Sample1\t1\t1\tTrue\t1\n"
+            "Sample2\t2\t2\tFalse\t2\n"
+            "Sample3\tvalue\t3.5\t\t\n"
+            "Sample4\t4\t4\tTrue\t\n")
+        exp = load_template_to_dataframe(StringIO(template))
+        obs = load_template_to_dataframe(StringIO(template), chunksize=2)
+        assert_frame_equal(obs, exp)
+        self.assertEqual(obs['mixed'].tolist(), ['1', '2', 'value', '4'])
+        self.assertEqual(obs['numeric'].dtype, np.float64)
+        self.assertEqual(obs['bools'].tolist()[:2], [True, False])
+        self.assertEqual(obs['sparse'].dtype, np.float64)
+
+    def test_load_template_to_dataframe_padded_values(self):
+        # the numeric and boolean values with trailing whitespace are cast
+        # once they are stripped
+        template = EXP_SAMPLE_TEMPLATE.replace(
+            '\t42.42\t', '\t42.42  \t').replace('\tTrue\t', '\tTrue \t')
+        obs = load_template_to_dataframe(StringIO(template))
+        exp = pd.DataFrame.from_dict(SAMPLE_TEMPLATE_DICT_FORM)
+        exp.index.name = 'sample_name'
+        assert_frame_equal(obs, exp)
+
+    def test_load_template_to_dataframe_padded_bool_custom_column(self):
+        # the custom boolean columns are inferred as bool once stripped, as
+        # they are when they are not padded
+        template = (
+            "sample_name\thas_foo\n"
+            "Sample1\tTrue \n"
+            "Sample2\tFalse\n"
+            "Sample3\tTrue\n")
+        obs = load_template_to_dataframe(StringIO(template))
+        self.assertEqual(obs['has_foo'].dtype, np.bool)
+        self.assertEqual(obs['has_foo'].tolist(), [True, False, True])
+        exp = load_template_to_dataframe(
+            StringIO(template.replace('True ', 'True')))
+        assert_frame_equal(obs, exp)
+
+    def test_load_template_to_dataframe_filepath(self):
+        fd, fp = mkstemp()
+        close(fd)
+        with open(fp, 'w') as f:
+            f.write(EXP_SAMPLE_TEMPLATE_SPACES)
+        try:
+            obs = load_template_to_dataframe(fp)
+        finally:
+            remove(fp)
+        exp = pd.DataFrame.from_dict(SAMPLE_TEMPLATE_DICT_FORM)
+        exp.index.name = 'sample_name'
+        assert_frame_equal(obs, exp)
+
     def test_get_invalid_sample_names(self):
         all_valid = ['2.sample.1', 'foo.bar.baz', 'roses', 'are', 'red',
                      'v10l3t5', '4r3', '81u3']
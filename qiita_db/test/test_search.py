@@ -9,8 +9,10 @@
 from unittest import TestCase, main
 
 from qiita_db.user import User
+from qiita_db.sql_instrumentation import collect_queries
 from qiita_core.util import qiita_test_checker
-from qiita_db.search import QiitaStudySearch
+from qiita_db.search import (QiitaStudySearch, clear_search_cache,
+                             _normalize_search_string, _parsed_searches)
 
 
 @qiita_test_checker()
@@ -19,125 +21,193 @@ class SearchTest(TestCase):
 
     def setUp(self):
         self.search = QiitaStudySearch()
+        clear_search_cache()
+
+    def tearDown(self):
+        clear_search_cache()
+
+    def test_normalize_search_string(self):
+        obs = _normalize_search_string(
+            '  ph >  7\tand   name = "Billy   Bob" ')
+        self.assertEqual(obs, 'ph > 7 and name = "Billy   Bob"')
 
     def test_parse_study_search_string(self):
-        st_sql, samp_sql, meta = \
+        st_sql, st_args, samp_sql, samp_args, meta = \
             self.search._parse_study_search_string("altitude > 0")
         exp_st_sql = ("SELECT study_id FROM qiita.study_sample_columns WHERE "
-                      "lower(column_name) = lower('altitude') and column_type "
+                      "lower(column_name) = lower(%s) and column_type "
                       "in ('integer', 'float8')")
-        exp_samp_sql = ("SELECT r.sample_id,sa.altitude FROM "
-                        "qiita.required_sample_info r JOIN qiita.sample_{0} sa"
-                        " ON sa.sample_id = r.sample_id JOIN qiita.study st ON"
-                        " st.study_id = r.study_id WHERE sa.altitude > 0")
+        exp_samp_sql = ("SELECT r.study_id,r.sample_id,m0.value_float FROM "
+                        "qiita.required_sample_info r JOIN qiita.study st ON "
+                        "st.study_id = r.study_id LEFT JOIN "
+                        "qiita.sample_metadata_index m0 ON m0.sample_id = "
+                        "r.sample_id AND m0.column_name = %s WHERE "
+                        "m0.value_float > %s AND r.study_id IN ({0}) ORDER BY "
+                        "r.study_id,r.sample_id")
         self.assertEqual(st_sql, exp_st_sql)
+        self.assertEqual(st_args, ["altitude"])
         self.assertEqual(samp_sql, exp_samp_sql)
+        self.assertEqual(samp_args, ["altitude", 0])
         self.assertEqual(meta, ["altitude"])
 
         # test NOT
-        st_sql, samp_sql, meta = \
+        st_sql, st_args, samp_sql, samp_args, meta = \
             self.search._parse_study_search_string("NOT altitude > 0")
-        exp_st_sql = ("SELECT study_id FROM qiita.study_sample_columns WHERE "
-                      "lower(column_name) = lower('altitude') and column_type "
-                      "in ('integer', 'float8')")
-        exp_samp_sql = ("SELECT r.sample_id,sa.altitude FROM "
-                        "qiita.required_sample_info r JOIN qiita.sample_{0} sa"
-                        " ON sa.sample_id = r.sample_id JOIN qiita.study st ON"
-                        " st.study_id = r.study_id WHERE NOT "
-                        "sa.altitude > 0")
+        exp_samp_sql = ("SELECT r.study_id,r.sample_id,m0.value_float FROM "
+                        "qiita.required_sample_info r JOIN qiita.study st ON "
+                        "st.study_id = r.study_id LEFT JOIN "
+                        "qiita.sample_metadata_index m0 ON m0.sample_id = "
+                        "r.sample_id AND m0.column_name = %s WHERE NOT "
+                        "m0.value_float > %s AND r.study_id IN ({0}) ORDER BY "
+                        "r.study_id,r.sample_id")
         self.assertEqual(st_sql, exp_st_sql)
+        self.assertEqual(st_args, ["altitude"])
         self.assertEqual(samp_sql, exp_samp_sql)
+        self.assertEqual(samp_args, ["altitude", 0])
         self.assertEqual(meta, ["altitude"])
 
         # test AND
-        st_sql, samp_sql, meta = \
-            self.search._parse_study_search_string("ph > 7 and ph < 9")
+        st_sql, st_args, samp_sql, samp_args, meta = \
+            self.search._parse_study_search_string("ph > 7 and ph < 9.5")
         exp_st_sql = ("SELECT study_id FROM qiita.study_sample_columns WHERE "
-                      "lower(column_name) = lower('ph') and column_type in "
+                      "lower(column_name) = lower(%s) and column_type in "
                       "('integer', 'float8')")
-        exp_samp_sql = ("SELECT r.sample_id,sa.ph FROM "
-                        "qiita.required_sample_info r JOIN qiita.sample_{0} sa"
-                        " ON sa.sample_id = r.sample_id JOIN qiita.study st ON"
-                        " st.study_id = r.study_id WHERE (sa.ph > 7 AND "
-                        "sa.ph < 9)")
+        exp_samp_sql = ("SELECT r.study_id,r.sample_id,m0.value_float FROM "
+                        "qiita.required_sample_info r JOIN qiita.study st ON "
+                        "st.study_id = r.study_id LEFT JOIN "
+                        "qiita.sample_metadata_index m0 ON m0.sample_id = "
+                        "r.sample_id AND m0.column_name = %s WHERE "
+                        "(m0.value_float > %s AND m0.value_float < %s) AND "
+                        "r.study_id IN ({0}) ORDER BY r.study_id,r.sample_id")
         self.assertEqual(st_sql, exp_st_sql)
+        self.assertEqual(st_args, ["ph"])
         self.assertEqual(samp_sql, exp_samp_sql)
+        self.assertEqual(samp_args, ["ph", 7, 9.5])
         self.assertEqual(meta, ["ph"])
 
         # test OR
-        st_sql, samp_sql, meta = \
+        st_sql, st_args, samp_sql, samp_args, meta = \
             self.search._parse_study_search_string("ph > 7 or ph < 9")
-        exp_st_sql = ("SELECT study_id FROM qiita.study_sample_columns WHERE "
-                      "lower(column_name) = lower('ph') and column_type in "
-                      "('integer', 'float8')")
-        exp_samp_sql = ("SELECT r.sample_id,sa.ph FROM "
-                        "qiita.required_sample_info r JOIN qiita.sample_{0} sa"
-                        " ON sa.sample_id = r.sample_id JOIN qiita.study st ON"
-                        " st.study_id = r.study_id WHERE (sa.ph > 7 OR "
-                        "sa.ph < 9)")
+        exp_samp_sql = ("SELECT r.study_id,r.sample_id,m0.value_float FROM "
+                        "qiita.required_sample_info r JOIN qiita.study st ON "
+                        "st.study_id = r.study_id LEFT JOIN "
+                        "qiita.sample_metadata_index m0 ON m0.sample_id = "
+                        "r.sample_id AND m0.column_name = %s WHERE "
+                        "(m0.value_float > %s OR m0.value_float < %s) AND "
+                        "r.study_id IN ({0}) ORDER BY r.study_id,r.sample_id")
         self.assertEqual(st_sql, exp_st_sql)
+        self.assertEqual(st_args, ["ph"])
         self.assertEqual(samp_sql, exp_samp_sql)
+        self.assertEqual(samp_args, ["ph", 7, 9])
         self.assertEqual(meta, ["ph"])
 
         # test includes
-        st_sql, samp_sql, meta = \
+        st_sql, st_args, samp_sql, samp_args, meta = \
             self.search._parse_study_search_string(
-                'host_subject_id includes "Chicken little"')
+                'host_subject_id includes "Chicken_little 100%"')
         exp_st_sql = "SELECT study_id FROM qiita.study_sample_columns"
-        exp_samp_sql = ("SELECT r.sample_id,r.host_subject_id FROM "
-                        "qiita.required_sample_info r JOIN qiita.sample_{0} sa"
-                        " ON sa.sample_id = r.sample_id JOIN qiita.study st ON"
-                        " st.study_id = r.study_id WHERE "
-                        "LOWER(r.host_subject_id) LIKE '%chicken little%'")
+        exp_samp_sql = ("SELECT r.study_id,r.sample_id,r.host_subject_id FROM "
+                        "qiita.required_sample_info r JOIN qiita.study st ON "
+                        "st.study_id = r.study_id WHERE "
+                        "LOWER(r.host_subject_id) LIKE %s AND r.study_id IN "
+                        "({0}) ORDER BY r.study_id,r.sample_id")
         self.assertEqual(st_sql, exp_st_sql)
+        self.assertEqual(st_args, [])
         self.assertEqual(samp_sql, exp_samp_sql)
+        # the LIKE wildcards searched for are escaped
+        self.assertEqual(samp_args, ["%chicken\\_little 100\\%%"])
         self.assertEqual(meta, ["host_subject_id"])
 
+        # test startswith
+        st_sql, st_args, samp_sql, samp_args, meta = \
+            self.search._parse_study_search_string(
+                'Description_duplicate startswith "Diesel_R"')
+        exp_st_sql = ("SELECT study_id FROM qiita.study_sample_columns WHERE "
+                      "lower(column_name) = lower(%s) and column_type "
+                      "in ('varchar')")
+        exp_samp_sql = ("SELECT r.study_id,r.sample_id,m0.value_varchar FROM "
+                        "qiita.required_sample_info r JOIN qiita.study st ON "
+                        "st.study_id = r.study_id LEFT JOIN "
+                        "qiita.sample_metadata_index m0 ON m0.sample_id = "
+                        "r.sample_id AND m0.column_name = %s WHERE "
+                        "LOWER(m0.value_varchar) LIKE %s AND r.study_id IN "
+                        "({0}) ORDER BY r.study_id,r.sample_id")
+        self.assertEqual(st_sql, exp_st_sql)
+        self.assertEqual(st_args, ["Description_duplicate"])
+        self.assertEqual(samp_sql, exp_samp_sql)
+        self.assertEqual(samp_args, ["description_duplicate", "diesel\\_r%"])
+        self.assertEqual(meta, ["Description_duplicate"])
+
         # test complex query
-        st_sql, samp_sql, meta = \
+        st_sql, st_args, samp_sql, samp_args, meta = \
             self.search._parse_study_search_string(
-                'name = "Billy Bob" or name = "Timmy" or name=Jimbo and '
+                'name = "Billy Bob\'s" or name = "Timmy" or name=Jimbo and '
                 'name > 25 or name < 5')
         exp_st_sql = (
             "SELECT study_id FROM qiita.study_sample_columns WHERE "
-            "lower(column_name) = lower('name') and column_type in "
+            "lower(column_name) = lower(%s) and column_type in "
             "('varchar')")
         exp_samp_sql = (
-            "SELECT r.sample_id,sa.name FROM qiita.required_sample_info r JOIN"
-            " qiita.sample_{0} sa ON sa.sample_id = r.sample_id JOIN "
-            "qiita.study st ON st.study_id = r.study_id WHERE (sa.name = "
-            "'Billy Bob' OR sa.name = 'Timmy' OR (sa.name = 'Jimbo' AND "
-            "sa.name > 25) OR sa.name < 5)")
+            "SELECT r.study_id,r.sample_id,m0.value_varchar FROM "
+            "qiita.required_sample_info r JOIN qiita.study st ON st.study_id "
+            "= r.study_id LEFT JOIN qiita.sample_metadata_index m0 ON "
+            "m0.sample_id = r.sample_id AND m0.column_name = %s WHERE "
+            "(m0.value_varchar = %s OR m0.value_varchar = %s OR "
+            "(m0.value_varchar = %s AND m0.value_float > %s) OR "
+            "m0.value_float < %s) AND r.study_id IN ({0}) ORDER BY "
+            "r.study_id,r.sample_id")
         self.assertEqual(st_sql, exp_st_sql)
+        self.assertEqual(st_args, ["name"])
         self.assertEqual(samp_sql, exp_samp_sql)
+        # the values are passed as they are, not scrubbed
+        self.assertEqual(samp_args,
+                         ["name", "Billy Bob's", "Timmy", "Jimbo", 25, 5])
         self.assertEqual(meta, ['name'])
 
         # test case sensitivity
-        st_sql, samp_sql, meta = \
+        st_sql, st_args, samp_sql, samp_args, meta = \
             self.search._parse_study_search_string("ph > 7 or pH < 9")
         # need to split sql because set used to create so can't guarantee order
         st_sql = st_sql.split(" INTERSECT ")
-
-        exp_st_sql = ["SELECT study_id FROM qiita.study_sample_columns WHERE "
-                      "lower(column_name) = lower('pH') and column_type in "
-                      "('integer', 'float8')", "SELECT study_id FROM "
-                      "qiita.study_sample_columns WHERE lower(column_name) = "
-                      "lower('ph') and column_type in ('integer', 'float8')"]
-        exp_samp_sql = ("SELECT r.sample_id,sa.pH,sa.ph FROM "
-                        "qiita.required_sample_info r JOIN qiita.sample_{0} sa"
-                        " ON sa.sample_id = r.sample_id JOIN qiita.study st ON"
-                        " st.study_id = r.study_id WHERE (sa.ph > 7 OR "
-                        "sa.ph < 9)")
-        # use the split list to make sure the SQL is properly formed
-        self.assertEqual(len(st_sql), 2)
-        pos = exp_st_sql.index(st_sql[0])
-        del exp_st_sql[pos]
-        pos = exp_st_sql.index(st_sql[1])
+        exp_st_sql = ("SELECT study_id FROM qiita.study_sample_columns WHERE "
+                      "lower(column_name) = lower(%s) and column_type in "
+                      "('integer', 'float8')")
+        # both headers are the same column of the index
+        exp_samp_sql = ("SELECT r.study_id,r.sample_id,m0.value_float,"
+                        "m0.value_float FROM qiita.required_sample_info r "
+                        "JOIN qiita.study st ON st.study_id = r.study_id LEFT "
+                        "JOIN qiita.sample_metadata_index m0 ON m0.sample_id "
+                        "= r.sample_id AND m0.column_name = %s WHERE "
+                        "(m0.value_float > %s OR m0.value_float < %s) AND "
+                        "r.study_id IN ({0}) ORDER BY r.study_id,r.sample_id")
+        self.assertEqual(st_sql, [exp_st_sql, exp_st_sql])
+        self.assertEqual(sorted(st_args), ["pH", "ph"])
         self.assertEqual(samp_sql, exp_samp_sql)
+        self.assertEqual(samp_args, ["ph", 7, 9])
         self.assertEqual(len(meta), 2)
         assert "ph" in meta
         assert "pH" in meta
 
+    def test_parse_study_search_string_cache(self):
+        obs = self.search._parse_study_search_string("ph > 7 and  ph < 9")
+        self.assertEqual(len(_parsed_searches), 1)
+        # whitespace differences are served from the same parsed search
+        obs2 = self.search._parse_study_search_string(" ph > 7  and ph < 9")
+        self.assertEqual(obs2, obs)
+        self.assertEqual(len(_parsed_searches), 1)
+        # the metadata headers returned can be modified by the caller
+        obs2[4].append('foo')
+        obs2[3].append(10)
+        obs2 = self.search._parse_study_search_string("ph > 7 and ph < 9")
+        self.assertEqual(obs2[3], ["ph", 7, 9])
+        self.assertEqual(obs2[4], ["ph"])
+        # searching only studies with processed data is a different plan
+        obs2 = self.search._parse_study_search_string("ph > 7 and ph < 9",
+                                                      True)
+        self.assertTrue(obs2[0].endswith(
+            " INTERSECT SELECT study_id FROM qiita.study_processed_data"))
+        self.assertEqual(len(_parsed_searches), 2)
+
     def test_call(self):
         obs_res, obs_meta = self.search(
             '(sample_type = ENVO:soil AND COMMON_NAME = "rhizosphere '
@@ -145,21 +215,80 @@ class SearchTest(TestCase):
             User("test@foo.bar"))
         exp_meta = ["COMMON_NAME", "Description_duplicate", "sample_type"]
         exp_res = {1:
-                   [['1.SKM4.640180', 'rhizosphere metagenome', 'Bucu Rhizo',
-                     'ENVO:soil'],
-                    ['1.SKM5.640177', 'rhizosphere metagenome', 'Bucu Rhizo',
+                   [['1.SKD4.640185', 'rhizosphere metagenome', 'Diesel Rhizo',
                      'ENVO:soil'],
-                    ['1.SKD4.640185', 'rhizosphere metagenome', 'Diesel Rhizo',
+                    ['1.SKD5.640186', 'rhizosphere metagenome', 'Diesel Rhizo',
                      'ENVO:soil'],
                     ['1.SKD6.640190', 'rhizosphere metagenome', 'Diesel Rhizo',
-                    'ENVO:soil'],
-                    ['1.SKM6.640187', 'rhizosphere metagenome', 'Bucu Rhizo',
                      'ENVO:soil'],
-                    ['1.SKD5.640186', 'rhizosphere metagenome', 'Diesel Rhizo',
+                    ['1.SKM4.640180', 'rhizosphere metagenome', 'Bucu Rhizo',
+                     'ENVO:soil'],
+                    ['1.SKM5.640177', 'rhizosphere metagenome', 'Bucu Rhizo',
+                     'ENVO:soil'],
+                    ['1.SKM6.640187', 'rhizosphere metagenome', 'Bucu Rhizo',
                      'ENVO:soil']]}
         self.assertEqual(obs_res, exp_res)
         self.assertEqual(obs_meta, exp_meta)
 
+    def test_call_visibility(self):
+        search = ('(sample_type = ENVO:soil AND COMMON_NAME = "rhizosphere '
+                  'metagenome" ) AND NOT Description_duplicate includes '
+                  'Burmese')
+        # study 1 is shared with this user
+        obs_res, _ = self.search(search, User("shared@foo.bar"))
+        self.assertEqual(list(obs_res), [1])
+        self.assertEqual(len(obs_res[1]), 6)
+        # but is not public, so other users can't search it
+        obs_res, _ = self.search(search, User("demo@microbio.me"))
+        self.assertEqual(obs_res, {})
+        # while admins can search all studies
+        obs_res, _ = self.search(search, User("admin@foo.bar"))
+        self.assertEqual(list(obs_res), [1])
+
+    def test_iter_studies(self):
+        with collect_queries() as collector:
+            obs = list(self.search.iter_studies(
+                'sample_type = ENVO:soil AND COMMON_NAME = "rhizosphere '
+                'metagenome"', User("test@foo.bar")))
+        # a single query searches all the studies
+        self.assertEqual(collector.count, 1)
+        self.assertEqual(len(obs), 1)
+        sid, samples = obs[0]
+        self.assertEqual(sid, 1)
+        self.assertEqual(len(samples), 9)
+        self.assertEqual([s[0] for s in samples],
+                         sorted(s[0] for s in samples))
+        for sample in samples:
+            self.assertEqual(sorted(sample[1:]),
+                             ['ENVO:soil', 'rhizosphere metagenome'])
+
+    def test_call_numeric(self):
+        obs_res, obs_meta = self.search('ph > 6.81 AND tot_org_carb < 4',
+                                        User("test@foo.bar"))
+        self.assertEqual(sorted(obs_meta), ['ph', 'tot_org_carb'])
+        self.assertEqual(list(obs_res), [1])
+        self.assertEqual([s[0] for s in obs_res[1]],
+                         ['1.SKM1.640183', '1.SKM2.640199', '1.SKM3.640197',
+                          '1.SKM4.640180', '1.SKM5.640177', '1.SKM6.640187',
+                          '1.SKM7.640188', '1.SKM8.640201', '1.SKM9.640192'])
+        # the values of numeric columns are returned as numbers
+        exp = [6.82 if meta == 'ph' else 3.31 for meta in obs_meta]
+        for sample in obs_res[1]:
+            self.assertEqual(sample[1:], exp)
+
+    def test_call_startswith(self):
+        obs_res, obs_meta = self.search(
+            'Description_duplicate startswith "diesel r"',
+            User("test@foo.bar"))
+        self.assertEqual(obs_meta, ["Description_duplicate"])
+        exp_res = {1: [['1.SKD4.640185', 'Diesel Rhizo'],
+                       ['1.SKD5.640186', 'Diesel Rhizo'],
+                       ['1.SKD6.640190', 'Diesel Rhizo'],
+                       ['1.SKD7.640191', 'Diesel Root'],
+                       ['1.SKD8.640184', 'Diesel Root'],
+                       ['1.SKD9.640182', 'Diesel Root']]}
+        self.assertEqual(obs_res, exp_res)
+
     def test_call_bad_meta_category(self):
         obs_res, obs_meta = self.search(
             'BAD_NAME_THING = ENVO:soil', User("test@foo.bar"))
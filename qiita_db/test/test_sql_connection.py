@@ -1,8 +1,253 @@
 from unittest import TestCase, main
+from threading import Thread
+from time import sleep
+from datetime import datetime
 
-from qiita_db.sql_connection import SQLConnectionHandler
-from qiita_db.exceptions import QiitaDBExecutionError
+from mock import patch
+
+from psycopg2 import OperationalError
+from psycopg2.extensions import (STATUS_READY, STATUS_BEGIN,
+                                 ISOLATION_LEVEL_READ_COMMITTED)
+
+from qiita_db.sql_connection import (SQLConnectionHandler, _ConnectionPool,
+                                     pool_stats, _copy_text, _CopyRows,
+                                     _split_values, _fold_queue, transaction,
+                                     _positional_placeholders)
+from qiita_db.exceptions import QiitaDBExecutionError, QiitaDBConnectionError
 from qiita_core.util import qiita_test_checker
+from qiita_core.qiita_settings import qiita_config
+
+
+class FakeCursor(object):
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        if self.conn.broken:
+            raise OperationalError("server closed the connection")
+        self.conn.queries.append(sql)
+
+
+class FakeConnection(object):
+    """Mimics the parts of a psycopg2 connection used by the pool"""
+    def __init__(self):
+        self.closed = 0
+        self.status = STATUS_READY
+        self.isolation_level = None
+        self.rollbacks = 0
+        self.broken = False
+        self.queries = []
+
+    def close(self):
+        self.closed = 1
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = STATUS_READY
+
+    def set_isolation_level(self, level):
+        self.isolation_level = level
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class TestConnectionPool(TestCase):
+    def setUp(self):
+        self.opened = []
+
+    def factory(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def test_get_put_reuses_connection(self):
+        pool = _ConnectionPool(self.factory, 2, 300, 1)
+        conn = pool.get()
+        pool.put(conn)
+        self.assertTrue(pool.get() is conn)
+        self.assertEqual(len(self.opened), 1)
+
+        obs = pool.stats()
+        self.assertEqual(obs['borrows'], 2)
+        self.assertEqual(obs['opened'], 1)
+        self.assertEqual(obs['in_use'], 1)
+        self.assertEqual(obs['idle'], 0)
+        self.assertEqual(obs['size'], 1)
+        self.assertEqual(obs['max_size'], 2)
+
+    def test_put_resets_connection(self):
+        pool = _ConnectionPool(self.factory, 1, 300, 1)
+        conn = pool.get()
+        conn.status = STATUS_BEGIN
+        pool.put(conn)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(conn.isolation_level, ISOLATION_LEVEL_READ_COMMITTED)
+        self.assertFalse(conn.closed)
+
+    def test_get_timeout(self):
+        pool = _ConnectionPool(self.factory, 1, 300, 0.05)
+        pool.get()
+        with self.assertRaises(QiitaDBConnectionError):
+            pool.get()
+        obs = pool.stats()
+        self.assertEqual(obs['timeouts'], 1)
+        self.assertEqual(obs['waits'], 1)
+        self.assertEqual(obs['size'], 1)
+
+    def test_get_waits_for_release(self):
+        pool = _ConnectionPool(self.factory, 1, 300, 5)
+        conn = pool.get()
+
+        def release():
+            sleep(0.1)
+            pool.put(conn)
+
+        t = Thread(target=release)
+        t.start()
+        self.assertTrue(pool.get() is conn)
+        t.join()
+
+        obs = pool.stats()
+        self.assertEqual(obs['waits'], 1)
+        self.assertTrue(obs['wait_time'] > 0)
+        self.assertEqual(obs['max_wait_time'], obs['wait_time'])
+        self.assertEqual(len(self.opened), 1)
+
+    def test_idle_eviction(self):
+        pool = _ConnectionPool(self.factory, 2, 0, 1)
+        conn = pool.get()
+        pool.put(conn)
+        sleep(0.01)
+        self.assertFalse(pool.get() is conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['evicted'], 1)
+
+    def test_health_check(self):
+        pool = _ConnectionPool(self.factory, 2, 300, 1,
+                               health_check_interval=0)
+        conn = pool.get()
+        pool.put(conn)
+        conn.broken = True
+        sleep(0.01)
+        new_conn = pool.get()
+        self.assertFalse(new_conn is conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['health_check_failures'], 1)
+
+        pool.put(new_conn)
+        sleep(0.01)
+        self.assertTrue(pool.get() is new_conn)
+        self.assertEqual(new_conn.queries, ["SELECT 1"])
+
+    def test_closed_connection_not_reused(self):
+        pool = _ConnectionPool(self.factory, 1, 300, 1)
+        conn = pool.get()
+        conn.close()
+        pool.put(conn)
+        self.assertFalse(pool.get() is conn)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_close_all(self):
+        pool = _ConnectionPool(self.factory, 2, 300, 1)
+        idle = pool.get()
+        borrowed = pool.get()
+        pool.put(idle)
+
+        pool.close_all()
+        self.assertTrue(idle.closed)
+        self.assertFalse(borrowed.closed)
+
+        pool.put(borrowed)
+        self.assertTrue(borrowed.closed)
+        obs = pool.stats()
+        self.assertEqual(obs['size'], 0)
+        self.assertEqual(obs['closed'], 2)
+
+
+class TestCopyFormat(TestCase):
+    def test_copy_text(self):
+        self.assertEqual(_copy_text(None), u'\\N')
+        self.assertEqual(_copy_text(True), u'true')
+        self.assertEqual(_copy_text(False), u'false')
+        self.assertEqual(_copy_text(1), u'1')
+        self.assertEqual(_copy_text(0.1), u'0.1')
+        self.assertEqual(_copy_text(float('nan')), u'NaN')
+        self.assertEqual(_copy_text(float('-inf')), u'-Infinity')
+        self.assertEqual(_copy_text(datetime(2014, 5, 29, 12, 24, 51)),
+                         u'2014-05-29 12:24:51')
+        self.assertEqual(_copy_text('Value'), u'Value')
+        self.assertEqual(_copy_text(u'\xb5g'), u'\xb5g')
+        self.assertEqual(_copy_text('a\tb\nc\\d\re'),
+                         u'a\\tb\\nc\\\\d\\re')
+
+    def test_copy_rows_read(self):
+        rows = [('a', 1, None), (u'\xb5', 2.5, True)]
+        exp = b'a\t1\t\\N\n\xc2\xb5\t2.5\ttrue\n'
+        self.assertEqual(_CopyRows(iter(rows)).read(), exp)
+
+        # reading in chunks returns the same data
+        obs = _CopyRows(iter(rows))
+        chunks = []
+        chunk = obs.read(3)
+        while chunk:
+            self.assertTrue(len(chunk) <= 3)
+            chunks.append(chunk)
+            chunk = obs.read(3)
+        self.assertEqual(b''.join(chunks), exp)
+
+
+class TestValuesFolding(TestCase):
+    def test_split_values(self):
+        obs = _split_values("INSERT INTO qiita.foo (a, b) VALUES (%s, %s)")
+        self.assertEqual(obs, ("INSERT INTO qiita.foo (a, b) VALUES ",
+                               "(%s, %s)"))
+        obs = _split_values("insert into qiita.foo values (%s, DEFAULT);")
+        self.assertEqual(obs, ("insert into qiita.foo values ",
+                               "(%s, DEFAULT)"))
+
+    def test_split_values_not_foldable(self):
+        self.assertEqual(_split_values(
+            "INSERT INTO qiita.foo (a) VALUES (%s) RETURNING a"), None)
+        self.assertEqual(_split_values(
+            "INSERT INTO qiita.foo (a) SELECT a FROM qiita.bar"), None)
+        self.assertEqual(_split_values(
+            "INSERT INTO qiita.foo (a, b) VALUES (%s, now())"), None)
+        self.assertEqual(_split_values(
+            "UPDATE qiita.foo SET a = %s WHERE b = %s"), None)
+
+    def test_fold_queue(self):
+        ins = "INSERT INTO qiita.foo (a, b) VALUES (%s, %s)"
+        ret = "INSERT INTO qiita.foo (a, b) VALUES (%s, %s) RETURNING a"
+        upd = "UPDATE qiita.foo SET b = %s WHERE a = %s"
+        entries = [(ins, [1, 2]), (ins, [3, 4]), (ins, [5, 6]),
+                   (ret, [7, 8]), (ins, ['{0}', 9]), (ins, [10, 11]),
+                   (upd, [12, 13]), (ins, [14, 15])]
+        obs = list(_fold_queue(entries, 2))
+        exp = [(ins, [[1, 2], [3, 4]], True), (ins, [5, 6], False),
+               (ret, [7, 8], False), (ins, ['{0}', 9], False),
+               (ins, [10, 11], False), (upd, [12, 13], False),
+               (ins, [14, 15], False)]
+        self.assertEqual(obs, exp)
+
+        obs = list(_fold_queue(entries, 1))
+        self.assertEqual(obs, [(sql, args, False) for sql, args in entries])
+
+
+class TestPreparedStatements(TestCase):
+    def test_positional_placeholders(self):
+        obs = _positional_placeholders(
+            "SELECT a FROM qiita.foo WHERE b = %s AND c LIKE '10%%' AND "
+            "d = ANY(%s)")
+        exp = ("SELECT a FROM qiita.foo WHERE b = $1 AND c LIKE '10%' AND "
+               "d = ANY($2)")
+        self.assertEqual(obs, exp)
 
 
 @qiita_test_checker()
@@ -56,6 +301,62 @@ class TestConnHandler(TestCase):
                 None, None, None]]
         self.assertEqual(obs, exp)
 
+    def test_run_queue_folded(self):
+        sql = ("INSERT INTO qiita.qiita_user (email, name, password) "
+               "VALUES (%s, %s, %s)")
+        self.conn_handler.create_queue("toy_queue")
+        self.conn_handler.add_to_queue(
+            "toy_queue", sql, [('p%d@test.com' % i, 'p%d' % i, 'pass')
+                               for i in range(5)], many=True)
+        self.conn_handler.add_to_queue(
+            "toy_queue", "UPDATE qiita.qiita_user SET phone = '111-111' "
+            "WHERE email = %s RETURNING email, name", ['p4@test.com'])
+        # the placeholders are resolved although the statement can be folded
+        self.conn_handler.add_to_queue("toy_queue", sql,
+                                       ['x@test.com', '{1}', 'pass'])
+        self.conn_handler.add_to_queue("toy_queue", sql,
+                                       ['y@test.com', 'y', 'pass'])
+        obs = self.conn_handler.execute_queue("toy_queue", page_size=2)
+        self.assertEqual(obs, [])
+
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT email, name, phone FROM qiita.qiita_user WHERE email "
+            "LIKE %s ORDER BY email", ['%@test.com'])
+        exp = [['p0@test.com', 'p0', None], ['p1@test.com', 'p1', None],
+               ['p2@test.com', 'p2', None], ['p3@test.com', 'p3', None],
+               ['p4@test.com', 'p4', '111-111'], ['x@test.com', 'p4', None],
+               ['y@test.com', 'y', None]]
+        self.assertEqual(obs, exp)
+
+    def test_run_queue_folded_fail(self):
+        sql = ("INSERT INTO qiita.qiita_user (email, name, password) "
+               "VALUES (%s, %s, %s)")
+        self.conn_handler.create_queue("toy_queue")
+        # the last row is a duplicate, so the multi-row INSERT fails
+        self.conn_handler.add_to_queue(
+            "toy_queue", sql, [('p1@test.com', 'p1', 'pass'),
+                               ('p2@test.com', 'p2', 'pass'),
+                               ('p1@test.com', 'p1', 'pass')], many=True)
+        with self.assertRaises(QiitaDBExecutionError):
+            self.conn_handler.execute_queue("toy_queue")
+        self.assertEqual(self.conn_handler.list_queues(), [])
+
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT * FROM qiita.qiita_user WHERE email LIKE %s",
+            ['%@test.com'])
+        self.assertEqual(obs, [])
+
+    def test_executemany_pages(self):
+        sql = ("INSERT INTO qiita.qiita_user (email, name, password) "
+               "VALUES (%s, %s, %s)")
+        self.conn_handler.executemany(
+            sql, [('p%d@test.com' % i, 'p%d' % i, 'pass') for i in range(5)],
+            page_size=2)
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT email FROM qiita.qiita_user WHERE email LIKE %s "
+            "ORDER BY email", ['%@test.com'])
+        self.assertEqual(obs, [['p%d@test.com' % i] for i in range(5)])
+
     def test_run_queue_last_return(self):
         self.conn_handler.create_queue("toy_queue")
         self.conn_handler.add_to_queue(
@@ -147,5 +448,301 @@ class TestConnHandler(TestCase):
 
         self.assertTrue(my_queue not in self.conn_handler.list_queues())
 
+    def test_copy_rows(self):
+        rows = [('p1@test.com', 'p1', 'pass1', '111-111'),
+                ('p2@test.com', u'p\xb5\t2', 'pass2', None)]
+        self.conn_handler.copy_rows(
+            "qiita.qiita_user", ['email', 'name', 'password', 'phone'],
+            iter(rows))
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT email, name, phone FROM qiita.qiita_user WHERE email IN "
+            "%s ORDER BY email", [('p1@test.com', 'p2@test.com')])
+        exp = [['p1@test.com', 'p1', '111-111'],
+               ['p2@test.com', u'p\xb5\t2'.encode('utf-8'), None]]
+        self.assertEqual(obs, exp)
+
+    def test_copy_rows_queue(self):
+        self.conn_handler.create_queue("toy_queue")
+        self.conn_handler.copy_rows(
+            "qiita.qiita_user", ['email', 'name', 'password'],
+            [('p1@test.com', 'p1', 'pass1'), ('p2@test.com', 'p2', 'pass2')],
+            queue="toy_queue")
+        self.conn_handler.add_to_queue(
+            "toy_queue", "UPDATE qiita.qiita_user SET phone = '111-111' "
+            "WHERE email = %s RETURNING name", ['p2@test.com'])
+        obs = self.conn_handler.execute_queue("toy_queue")
+        self.assertEqual(obs, ['p2'])
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT email, phone FROM qiita.qiita_user WHERE email IN %s "
+            "ORDER BY email", [('p1@test.com', 'p2@test.com')])
+        self.assertEqual(obs, [['p1@test.com', None],
+                               ['p2@test.com', '111-111']])
+
+    def test_copy_rows_queue_fail(self):
+        self.conn_handler.create_queue("toy_queue")
+        self.conn_handler.add_to_queue(
+            "toy_queue",
+            "INSERT INTO qiita.qiita_user (email, name, password) VALUES "
+            "(%s, %s, %s)", ['somebody@foo.bar', 'Toy', 'pass'])
+        # the email is duplicated, so the COPY fails
+        self.conn_handler.copy_rows(
+            "qiita.qiita_user", ['email', 'name', 'password'],
+            [('p1@test.com', 'p1', 'pass1'), ('p1@test.com', 'p1', 'pass1')],
+            queue="toy_queue")
+        with self.assertRaises(QiitaDBExecutionError):
+            self.conn_handler.execute_queue("toy_queue")
+
+        # make sure roll back correctly
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT * from qiita.qiita_user WHERE email IN %s",
+            [('somebody@foo.bar', 'p1@test.com')])
+        self.assertEqual(obs, [])
+
+    def test_copy_rows_fail(self):
+        with self.assertRaises(QiitaDBExecutionError):
+            self.conn_handler.copy_rows(
+                "qiita.qiita_user", ['email', 'name', 'password'],
+                [('admin@foo.bar', 'p1', 'pass1')])
+        obs = self.conn_handler.execute_fetchone("SELECT 42")[0]
+        self.assertEqual(obs, 42)
+
+    def test_execute_iter(self):
+        sql = ("SELECT email, name FROM qiita.qiita_user WHERE email IN "
+               "%s ORDER BY email")
+        emails = ('admin@foo.bar', 'shared@foo.bar', 'test@foo.bar')
+        obs = self.conn_handler.execute_iter(sql, [emails], batch_size=2)
+        # It is a generator, so nothing is fetched until we iterate
+        self.assertFalse(isinstance(obs, list))
+        obs = list(obs)
+        exp = [['admin@foo.bar', 'Admin'], ['shared@foo.bar', 'Shared'],
+               ['test@foo.bar', 'Dude']]
+        self.assertEqual(obs, exp)
+        self.assertEqual(obs[0]['name'], 'Admin')
+
+    def test_execute_iter_tuple(self):
+        sql = ("SELECT email FROM qiita.qiita_user WHERE email IN %s "
+               "ORDER BY email")
+        emails = ('admin@foo.bar', 'shared@foo.bar')
+        obs = list(self.conn_handler.execute_iter(
+            sql, [emails], batch_size=1, row_factory='tuple'))
+        self.assertEqual(obs, [('admin@foo.bar',), ('shared@foo.bar',)])
+
+    def test_execute_iter_stop_early(self):
+        gen = self.conn_handler.execute_iter(
+            "SELECT email FROM qiita.qiita_user", batch_size=1)
+        next(gen)
+        gen.close()
+        # The handler can be used normally afterwards
+        obs = self.conn_handler.execute_fetchone("SELECT 42")[0]
+        self.assertEqual(obs, 42)
+
+    def test_execute_iter_error(self):
+        with self.assertRaises(ValueError):
+            list(self.conn_handler.execute_iter("SELECT 42",
+                                                row_factory='foo'))
+        with self.assertRaises(QiitaDBExecutionError):
+            list(self.conn_handler.execute_iter(
+                "SELECT * FROM qiita.NOT_A_TABLE"))
+        obs = self.conn_handler.execute_fetchone("SELECT 42")[0]
+        self.assertEqual(obs, 42)
+
+    def test_execute_iter_cursor_error(self):
+        # the error creating the cursor is not hidden by the cleanup
+        with transaction():
+            connection = self.conn_handler._get_connection()
+            with patch.object(connection, 'cursor',
+                              side_effect=OperationalError('no cursor')):
+                with self.assertRaises(OperationalError):
+                    list(self.conn_handler.execute_iter("SELECT 42"))
+
+    def test_execute_prepared(self):
+        sql = ("SELECT email, name FROM qiita.qiita_user WHERE email = "
+               "ANY(%s) ORDER BY email")
+        obs = self.conn_handler.execute_prepared(
+            sql, [['admin@foo.bar', 'shared@foo.bar']])
+        exp = [['admin@foo.bar', 'Admin'], ['shared@foo.bar', 'Shared']]
+        self.assertEqual(obs, exp)
+        self.assertEqual(obs[0]['name'], 'Admin')
+        prepared = self.conn_handler._get_connection().prepared_statements
+        self.assertEqual(list(prepared), [sql])
+        name = prepared[sql]
+
+        # the statement is reused with different arguments
+        obs = self.conn_handler.execute_prepared(sql, [['test@foo.bar']])
+        self.assertEqual(obs, [['test@foo.bar', 'Dude']])
+        self.assertEqual(dict(prepared), {sql: name})
+
+        obs = self.conn_handler.execute_prepared("SELECT 42")
+        self.assertEqual(obs, [[42]])
+        self.assertEqual(len(prepared), 2)
+
+    def test_execute_prepared_error(self):
+        with self.assertRaises(TypeError):
+            self.conn_handler.execute_prepared("SELECT %(a)s", {'a': 1})
+        sql = "SELECT * FROM qiita.NOT_A_TABLE WHERE a = %s"
+        with self.assertRaises(QiitaDBExecutionError):
+            self.conn_handler.execute_prepared(sql, [1])
+        prepared = self.conn_handler._get_connection().prepared_statements
+        self.assertNotIn(sql, prepared)
+        obs = self.conn_handler.execute_prepared("SELECT 42")
+        self.assertEqual(obs, [[42]])
+
+    def test_execute_prepared_execution_error(self):
+        sql = "SELECT 10 / %s"
+        self.assertEqual(self.conn_handler.execute_prepared(sql, [2]), [[5]])
+        prepared = self.conn_handler._get_connection().prepared_statements
+        name = prepared[sql]
+
+        with self.assertRaises(QiitaDBExecutionError):
+            self.conn_handler.execute_prepared(sql, [0])
+        # the statement is deallocated from the server, not only forgotten
+        self.assertNotIn(sql, prepared)
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT name FROM pg_prepared_statements WHERE name = %s",
+            [name])
+        self.assertEqual(obs, [])
+        self.assertEqual(self.conn_handler.execute_prepared(sql, [5]), [[2]])
+
+        # inside a transaction it is kept, as it can't be deallocated
+        with transaction():
+            self.conn_handler.execute_prepared(sql, [2])
+            tx_prepared = self.conn_handler._get_connection(
+                ).prepared_statements
+            name = tx_prepared[sql]
+            with self.assertRaises(QiitaDBExecutionError):
+                with transaction():
+                    self.conn_handler.execute_prepared(sql, [0])
+            self.assertEqual(tx_prepared[sql], name)
+            obs = self.conn_handler.execute_prepared(sql, [5])
+            self.assertEqual(obs, [[2]])
+
+    def test_transaction(self):
+        sql = ("INSERT INTO qiita.qiita_user (email, name, password) VALUES "
+               "(%s, %s, %s)")
+        # the handler can be created before the transaction starts
+        conn_handler = SQLConnectionHandler()
+        with transaction():
+            txid = conn_handler.execute_fetchone("SELECT txid_current()")[0]
+            conn_handler.execute(sql, ['p1@test.com', 'p1', 'pass'])
+            other = SQLConnectionHandler()
+            other.execute(sql, ['p2@test.com', 'p2', 'pass'])
+            # all the statements run in the same transaction
+            self.assertEqual(
+                other.execute_fetchone("SELECT txid_current()")[0], txid)
+
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT email FROM qiita.qiita_user WHERE email LIKE %s "
+            "ORDER BY email", ['%@test.com'])
+        self.assertEqual(obs, [['p1@test.com'], ['p2@test.com']])
+        # outside of the transaction the handlers commit again
+        self.assertNotEqual(
+            conn_handler.execute_fetchone("SELECT txid_current()")[0], txid)
+
+    def test_transaction_rollback(self):
+        sql = ("INSERT INTO qiita.qiita_user (email, name, password) VALUES "
+               "(%s, %s, %s)")
+        with self.assertRaises(ValueError):
+            with transaction():
+                self.conn_handler.execute(sql, ['p1@test.com', 'p1', 'pass'])
+                raise ValueError()
+
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT email FROM qiita.qiita_user WHERE email LIKE %s",
+            ['%@test.com'])
+        self.assertEqual(obs, [])
+
+    def test_transaction_nested(self):
+        sql = ("INSERT INTO qiita.qiita_user (email, name, password) VALUES "
+               "(%s, %s, %s)")
+        with transaction():
+            self.conn_handler.execute(sql, ['p1@test.com', 'p1', 'pass'])
+            # a failing statement only rolls back its nested block
+            with self.assertRaises(QiitaDBExecutionError):
+                with transaction():
+                    self.conn_handler.execute(sql, ['p2@test.com', 'p2',
+                                                    'pass'])
+                    self.conn_handler.execute(sql, ['p1@test.com', 'p1',
+                                                    'pass'])
+            with transaction():
+                self.conn_handler.execute(sql, ['p3@test.com', 'p3', 'pass'])
+
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT email FROM qiita.qiita_user WHERE email LIKE %s "
+            "ORDER BY email", ['%@test.com'])
+        self.assertEqual(obs, [['p1@test.com'], ['p3@test.com']])
+
+    def test_transaction_queue(self):
+        sql = ("INSERT INTO qiita.qiita_user (email, name, password) VALUES "
+               "(%s, %s, %s)")
+        with transaction():
+            self.conn_handler.execute(sql, ['p1@test.com', 'p1', 'pass'])
+            # the queue runs in its own savepoint
+            self.conn_handler.create_queue("toy_queue")
+            self.conn_handler.add_to_queue(
+                "toy_queue", sql, ['p2@test.com', 'p2', 'pass'])
+            self.conn_handler.add_to_queue(
+                "toy_queue", sql, ['p1@test.com', 'p1', 'pass'])
+            with self.assertRaises(QiitaDBExecutionError):
+                self.conn_handler.execute_queue("toy_queue")
+            self.conn_handler.execute(sql, ['p3@test.com', 'p3', 'pass'])
+
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT email FROM qiita.qiita_user WHERE email LIKE %s "
+            "ORDER BY email", ['%@test.com'])
+        self.assertEqual(obs, [['p1@test.com'], ['p3@test.com']])
+
+    def test_transaction_set_autocommit(self):
+        sql = ("INSERT INTO qiita.qiita_user (email, name, password) VALUES "
+               "(%s, %s, %s)")
+        conn_handler = SQLConnectionHandler()
+        with self.assertRaises(ValueError):
+            with transaction():
+                conn_handler.execute(sql, ['p1@test.com', 'p1', 'pass'])
+                with self.assertRaises(RuntimeError):
+                    conn_handler.set_autocommit('on')
+                raise ValueError()
+
+        # the transaction was not committed by set_autocommit
+        obs = self.conn_handler.execute_fetchall(
+            "SELECT email FROM qiita.qiita_user WHERE email LIKE %s",
+            ['%@test.com'])
+        self.assertEqual(obs, [])
+
+    def test_close(self):
+        self.conn_handler.close()
+        # the handler reconnects if it is used after being closed
+        obs = self.conn_handler.execute_fetchone("SELECT 42")[0]
+        self.assertEqual(obs, 42)
+
+    def test_pooled_connection_reused(self):
+        if qiita_config.pool_size <= 0:
+            return
+        sql = "SELECT pg_backend_pid()"
+        self.conn_handler.close()
+        conn_handler = SQLConnectionHandler()
+        pid = conn_handler.execute_fetchone(sql)[0]
+        conn_handler.close()
+
+        conn_handler = SQLConnectionHandler()
+        self.assertEqual(conn_handler.execute_fetchone(sql)[0], pid)
+
+        obs = pool_stats()['no_admin']
+        self.assertTrue(obs['in_use'] >= 1)
+        self.assertTrue(obs['size'] <= qiita_config.pool_size)
+
+    def test_pooled_connection_autocommit_reset(self):
+        if qiita_config.pool_size <= 0:
+            return
+        sql = "SELECT pg_backend_pid()"
+        self.conn_handler.close()
+        conn_handler = SQLConnectionHandler()
+        pid = conn_handler.execute_fetchone(sql)[0]
+        conn_handler.set_autocommit('on')
+        del conn_handler
+
+        conn_handler = SQLConnectionHandler()
+        self.assertEqual(conn_handler.execute_fetchone(sql)[0], pid)
+        self.assertFalse(conn_handler._connection.autocommit)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,161 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import TestCase, main
+from logging import Handler
+
+from qiita_core.util import qiita_test_checker
+from qiita_core.qiita_settings import qiita_config
+from qiita_db.sql_instrumentation import (
+    fingerprint, args_shape, record_query, collect_queries, query_stats,
+    reset_query_stats, record_collector, run_collecting_queries,
+    QueryCollector, _slow_logger)
+
+
+class ListHandler(Handler):
+    def __init__(self):
+        Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class TestSQLInstrumentation(TestCase):
+    def setUp(self):
+        reset_query_stats()
+
+    def tearDown(self):
+        reset_query_stats()
+
+    def test_fingerprint(self):
+        obs = fingerprint("SELECT *\n  FROM qiita.sample_1 WHERE a = %s AND "
+                          "b = 'it''s' AND c IN (1, 2, 3) AND d > 4.5")
+        exp = ("SELECT * FROM qiita.sample_1 WHERE a = ? AND b = ? AND c IN "
+               "(...) AND d > ?")
+        self.assertEqual(obs, exp)
+
+        obs = fingerprint("INSERT INTO qiita.foo (a, b) VALUES (%s, %s)")
+        self.assertEqual(obs, "INSERT INTO qiita.foo (a, b) VALUES (...)")
+        obs = fingerprint("INSERT INTO qiita.foo (a, b) VALUES (1, 'a'), "
+                          "(2, 'b')")
+        self.assertEqual(obs, "INSERT INTO qiita.foo (a, b) VALUES (...)")
+
+    def test_args_shape(self):
+        self.assertEqual(args_shape(None), 'none')
+        self.assertEqual(args_shape([1, 2]), 'list[2]')
+        self.assertEqual(args_shape((1, )), 'tuple[1]')
+        self.assertEqual(args_shape({'a': 1}), 'dict[1]')
+        self.assertEqual(args_shape([(1, 2)] * 5, many=True), '5x tuple[2]')
+        self.assertEqual(args_shape([], many=True), '0x none')
+
+    def test_record_query(self):
+        with collect_queries() as collector:
+            record_query("SELECT a FROM qiita.foo WHERE b = %s", [1], 0.002,
+                         3)
+            record_query("SELECT a FROM qiita.foo WHERE b = %s", [2], 0.2, 1)
+        # not collected, the collector is not active anymore
+        record_query("SELECT 1", None, 0.0001, 1)
+
+        fp = "SELECT a FROM qiita.foo WHERE b = ?"
+        self.assertEqual(collector.count, 2)
+        self.assertAlmostEqual(collector.duration, 0.202)
+        obs = collector.summary()
+        self.assertEqual(obs['count'], 2)
+        self.assertEqual(len(obs['top']), 1)
+        self.assertEqual(obs['top'][0]['fingerprint'], fp)
+        self.assertEqual(obs['top'][0]['count'], 2)
+        self.assertEqual(obs['top'][0]['rows'], 4)
+        self.assertEqual(obs['top'][0]['shapes'], ['list[1]'])
+        self.assertAlmostEqual(obs['top'][0]['max_duration'], 0.2)
+
+        obs = query_stats()
+        self.assertEqual(set(obs['queries']), {fp, "SELECT ?"})
+        self.assertEqual(obs['queries'][fp]['count'], 2)
+        exp = [0, 1, 0, 0, 0, 1, 0, 0, 0]
+        self.assertEqual(obs['queries'][fp]['histogram'], exp)
+        self.assertEqual(len(obs['buckets']) + 1, len(exp))
+
+    def test_record_collector(self):
+        collector = QueryCollector()
+        collector.add("SELECT ?", 'none', 0.1, 1, None)
+        collector.add("SELECT ?", 'none', 0.1, 1, None)
+        record_collector('FooHandler.GET', collector)
+        record_collector('FooHandler.GET', QueryCollector())
+        obs = query_stats()['collectors']
+        exp = {'FooHandler.GET': {'runs': 2, 'queries': 2, 'max_queries': 2,
+                                  'duration': 0.2}}
+        self.assertEqual(obs, exp)
+
+    def test_slow_query_log(self):
+        handler = ListHandler()
+        _slow_logger.addHandler(handler)
+        threshold = qiita_config.slow_query_threshold
+        qiita_config.slow_query_threshold = 0.5
+        try:
+            record_query("SELECT 1", None, 0.1, 1)
+            record_query("SELECT 2", None, 0.6, 1)
+        finally:
+            qiita_config.slow_query_threshold = threshold
+            _slow_logger.removeHandler(handler)
+        self.assertEqual(len(handler.messages), 1)
+        self.assertTrue(handler.messages[0].startswith("Slow query (0.600s"))
+        self.assertTrue(handler.messages[0].endswith("SELECT ?"))
+
+
+@qiita_test_checker()
+class TestSQLInstrumentationDB(TestCase):
+    def setUp(self):
+        reset_query_stats()
+
+    def tearDown(self):
+        reset_query_stats()
+
+    def test_handler_queries_collected(self):
+        with collect_queries() as collector:
+            self.conn_handler.execute_fetchall(
+                "SELECT email FROM qiita.qiita_user WHERE email = %s",
+                ['test@foo.bar'])
+            self.conn_handler.executemany(
+                "INSERT INTO qiita.qiita_user (email, name, password) VALUES "
+                "(%s, %s, %s)", [('p1@test.com', 'p1', 'pass'),
+                                 ('p2@test.com', 'p2', 'pass')])
+        obs = collector.summary()
+        self.assertEqual(obs['count'], 2)
+        obs = {q['fingerprint']: q for q in obs['top']}
+        fp = "SELECT email FROM qiita.qiita_user WHERE email = ?"
+        self.assertEqual(obs[fp]['rows'], 1)
+        self.assertEqual(obs[fp]['shapes'], ['list[1]'])
+        fp = ("INSERT INTO qiita.qiita_user (email, name, password) VALUES "
+              "(...)")
+        self.assertEqual(obs[fp]['rows'], 2)
+        self.assertEqual(obs[fp]['shapes'], ['2x tuple[3]'])
+
+    def test_queue_queries_collected(self):
+        with collect_queries() as collector:
+            self.conn_handler.create_queue("toy_queue")
+            self.conn_handler.add_to_queue(
+                "toy_queue", "SELECT email FROM qiita.qiita_user")
+            self.conn_handler.add_to_queue(
+                "toy_queue", "SELECT name FROM qiita.qiita_user")
+            self.conn_handler.execute_queue("toy_queue")
+        self.assertEqual(collector.count, 2)
+
+    def test_run_collecting_queries(self):
+        def job(conn_handler):
+            return conn_handler.execute_fetchone("SELECT 42")[0]
+
+        obs = run_collecting_queries(job, 'test_job', self.conn_handler)
+        self.assertEqual(obs, 42)
+        obs = query_stats()['collectors']['job:job']
+        self.assertEqual(obs['runs'], 1)
+        self.assertEqual(obs['queries'], 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,9 +18,13 @@ from qiita_db.exceptions import QiitaDBColumnError, QiitaDBError
 from qiita_db.data import RawData
 from qiita_db.study import Study
 from qiita_db.reference import Reference
+from qiita_db.sql_instrumentation import collect_queries
+from qiita_db import util
 from qiita_db.util import (exists_table, exists_dynamic_table, scrub_data,
                            compute_checksum, check_table_cols,
                            check_required_columns, convert_to_id,
+                           convert_from_id, get_lookup_table,
+                           clear_lookup_tables, clear_table_cols,
                            get_table_cols, get_table_cols_w_type,
                            get_filetypes, get_filepath_types, get_count,
                            check_count, get_processed_params_tables,
@@ -120,6 +124,42 @@ class DBUtilTests(TestCase):
                "pass_reset_timestamp"}
         self.assertEqual(set(obs), exp)
 
+    def test_get_table_cols_cached(self):
+        get_table_cols("qiita_user", self.conn_handler)
+        with collect_queries() as collector:
+            obs = get_table_cols("qiita_user", self.conn_handler)
+            check_table_cols(self.conn_handler, ['email'], "qiita_user")
+            self.assertTrue(exists_table("qiita_user", self.conn_handler))
+        self.assertEqual(collector.count, 0)
+        self.assertIn("email", obs)
+
+    def test_clear_table_cols(self):
+        get_table_cols("qiita_user", self.conn_handler)
+        self.conn_handler.execute(
+            "ALTER TABLE qiita.qiita_user ADD COLUMN new_col varchar")
+        # The cached columns are returned until the cache is cleared...
+        self.assertNotIn("new_col",
+                         get_table_cols("qiita_user", self.conn_handler))
+        # ...but the checks reload the table if a column is missing
+        check_table_cols(self.conn_handler, ['new_col'], "qiita_user")
+        self.assertIn("new_col",
+                      get_table_cols("qiita_user", self.conn_handler))
+
+        self.conn_handler.execute(
+            "ALTER TABLE qiita.qiita_user DROP COLUMN new_col")
+        clear_table_cols("qiita_user")
+        self.assertNotIn("new_col",
+                         get_table_cols("qiita_user", self.conn_handler))
+
+    def test_get_table_cols_dynamic_not_cached(self):
+        self.assertNotIn("new_col",
+                         get_table_cols("sample_1", self.conn_handler))
+        # another process adds a category to the template
+        self.conn_handler.execute(
+            "ALTER TABLE qiita.sample_1 ADD COLUMN new_col varchar")
+        self.assertIn("new_col",
+                      get_table_cols("sample_1", self.conn_handler))
+
     def test_get_table_cols_w_type(self):
         obs = get_table_cols_w_type("preprocessed_sequence_illumina_params",
                                     self.conn_handler)
@@ -186,6 +226,70 @@ class DBUtilTests(TestCase):
         with self.assertRaises(IncompetentQiitaDeveloperError):
             convert_to_id("FAKE", "filepath_type")
 
+    def test_convert_from_id(self):
+        """Tests that strings are returned correctly"""
+        self.assertEqual(convert_from_id(8, "filepath_type"), "directory")
+        with self.assertRaises(ValueError):
+            convert_from_id(1000, "filepath_type")
+
+    def test_convert_to_id_cached(self):
+        """Tests that the lookup table is only queried once"""
+        convert_to_id("directory", "filepath_type")
+        with collect_queries() as collector:
+            convert_to_id("biom", "filepath_type")
+            convert_from_id(8, "filepath_type")
+        self.assertEqual(collector.count, 0)
+
+    def test_convert_to_id_new_value(self):
+        """Tests that values added after caching the table are found"""
+        convert_to_id("directory", "filepath_type")
+        self.conn_handler.execute(
+            "INSERT INTO qiita.filepath_type (filepath_type) VALUES ('new')")
+        exp = self.conn_handler.execute_fetchone(
+            "SELECT filepath_type_id FROM qiita.filepath_type WHERE "
+            "filepath_type = 'new'")[0]
+        self.assertEqual(convert_to_id("new", "filepath_type"), exp)
+        self.assertEqual(convert_from_id(exp, "filepath_type"), "new")
+
+    def test_get_lookup_table(self):
+        """Tests that the lookup tables are returned and cached"""
+        obs = get_lookup_table('study_status', 'status')
+        self.assertEqual(set(obs), {'awaiting_approval', 'public', 'private',
+                                    'sandbox'})
+        obs['private'] = 1000
+        self.assertNotEqual(
+            get_lookup_table('study_status', 'status')['private'], 1000)
+        obs = get_lookup_table('data_type', by_id=True)
+        self.assertEqual(obs[1], '16S')
+
+    def test_clear_lookup_tables(self):
+        """Tests that the lookup tables are loaded again once cleared"""
+        get_data_types()
+        self.conn_handler.execute(
+            "UPDATE qiita.data_type SET data_type = 'newtype' WHERE "
+            "data_type_id = 1")
+        self.assertEqual(get_data_types()['16S'], 1)
+        clear_lookup_tables()
+        obs = get_data_types()
+        self.assertNotIn('16S', obs)
+        self.assertEqual(obs['newtype'], 1)
+
+    def test_lookup_tables_patch_level(self):
+        """Tests that the lookup tables are loaded again once the database is
+        patched by another process"""
+        get_data_types()
+        self.conn_handler.execute(
+            "UPDATE qiita.data_type SET data_type = 'newtype' WHERE "
+            "data_type_id = 1")
+        self.conn_handler.execute(
+            "UPDATE settings SET current_patch = 'new_patch.sql'")
+        # the patch level is not checked on every call
+        self.assertEqual(get_data_types()['16S'], 1)
+        util._lookup_patch['checked'] -= util._LOOKUP_PATCH_INTERVAL
+        obs = get_data_types()
+        self.assertNotIn('16S', obs)
+        self.assertEqual(obs['newtype'], 1)
+
     def test_get_filetypes(self):
         """Tests that get_filetypes works with valid arguments"""
 
@@ -87,6 +87,31 @@ class User(QiitaObject):
             "SELECT EXISTS(SELECT * FROM qiita.qiita_user WHERE "
             "email = %s)", (id_, ))[0]
 
+    @classmethod
+    def _row_query(cls):
+        r"""Loads the name of the user level with the row of the user"""
+        columns = "qiita.{0}.*, qiita.user_level.name AS user_level"
+        tables = "qiita.{0} JOIN qiita.user_level USING (user_level_id)"
+        return columns.format(cls._table), tables.format(cls._table)
+
+    @classmethod
+    def _row_id_column(cls):
+        r"""The users are identified by their email"""
+        return "email"
+
+    @classmethod
+    def _existing_ids(cls, ids, conn_handler):
+        r"""Returns which of the provided emails exist in the database
+
+        Notes
+        -----
+        This function overwrites the base function, as sql layout doesn't
+        follow the same conventions done in the other classes.
+        """
+        return {r[0] for r in conn_handler.execute_fetchall(
+            "SELECT email FROM qiita.qiita_user WHERE email = ANY(%s)",
+            (ids, ))}
+
     @classmethod
     def iter(cls):
         """Iterates over all users, sorted by their email addresses
@@ -271,6 +296,8 @@ class User(QiitaObject):
             sql = ("UPDATE qiita.{} SET user_level_id = %s WHERE "
                    "email = %s".format(cls._table))
             conn_handler.execute(sql, (level, email))
+            # The user level is cached with the row of the user object
+            cls._forget(email)
         return db_code == code
 
     # ---properties---
@@ -282,22 +309,16 @@ class User(QiitaObject):
     @property
     def level(self):
         """The level of privileges of the user"""
-        conn_handler = SQLConnectionHandler()
-        sql = ("SELECT ul.name from qiita.user_level ul JOIN qiita.{0} u ON "
-               "ul.user_level_id = u.user_level_id WHERE "
-               "u.email = %s".format(self._table))
-        return conn_handler.execute_fetchone(sql, (self._id, ))[0]
+        return self._row_value('user_level')
 
     @property
     def info(self):
         """Dict with any other information attached to the user"""
-        conn_handler = SQLConnectionHandler()
-        sql = "SELECT * from qiita.{0} WHERE email = %s".format(self._table)
-        # Need direct typecast from psycopg2 dict to standard dict
-        info = dict(conn_handler.execute_fetchone(sql, (self._id, )))
-        # Remove non-info columns
+        info = dict(self._get_row())
+        # Remove non-info columns, and the level name loaded with the row
         for col in self._non_info:
             info.pop(col)
+        info.pop('user_level')
         return info
 
     @info.setter
@@ -408,6 +429,7 @@ class User(QiitaObject):
                    self._table))
         conn_handler = SQLConnectionHandler()
         conn_handler.execute(sql, (reset_code, self._id))
+        self._invalidate_row()
 
     def change_forgot_password(self, code, newpass):
         """Changes the password if the code is valid
@@ -437,6 +459,7 @@ class User(QiitaObject):
                "email = %s".format(self._table))
         conn_handler = conn_handler if conn_handler else SQLConnectionHandler()
         conn_handler.execute(sql, (hash_password(newpass), self._id))
+        self._invalidate_row()
 
 
 def validate_email(email):
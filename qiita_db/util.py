@@ -25,6 +25,11 @@ Methods
     check_required_columns
     convert_from_id
     convert_to_id
+    get_lookup_table
+    clear_lookup_tables
+    get_table_cols
+    get_table_cols_w_type
+    clear_table_cols
     get_lat_longs
     get_environmental_packages
     purge_filepaths
@@ -47,15 +52,139 @@ from binascii import crc32
 from bcrypt import hashpw, gensalt
 from functools import partial
 from os.path import join, basename, isdir, relpath, exists
+import re
 from os import walk, remove, listdir, makedirs, rename
 from shutil import move, rmtree
 from json import dumps
+from threading import Lock
+from time import time
 
 from qiita_core.exceptions import IncompetentQiitaDeveloperError
 from .exceptions import QiitaDBColumnError, QiitaDBError
 from .sql_connection import SQLConnectionHandler
 
 
+# Process-level cache of the lookup tables, the small and almost static tables
+# that map names to ids (e.g. data_type or filepath_type). Each table is loaded
+# whole on first use, and keyed by (table, name column, id column) holds the
+# {name: id} and {id: name} dicts. It is cleared when the patch level of the
+# database changes, which is checked at most every _LOOKUP_PATCH_INTERVAL
+# seconds so a patch applied by another process is noticed, or by
+# clear_lookup_tables
+_lookup_tables = {}
+_lookup_patch = {'current_patch': None, 'checked': 0}
+_lookup_lock = Lock()
+_LOOKUP_PATCH_INTERVAL = 60
+
+# Process-level cache of the schema of the tables, keyed by table name, with
+# the (column_name, data_type, is_nullable, column_default) of their columns.
+# The cached tables only change through the database patches, which clear it,
+# see clear_table_cols. The dynamic tables of the metadata templates are not
+# cached, as their columns are added and removed by any process (e.g. an
+# IPython engine or another tornado worker) and this one would not notice
+_table_cols = {}
+_DYNAMIC_TABLE_RE = re.compile(r"^(sample|prep)_\d+$")
+
+
+def _load_lookup_table(table, column, id_column, conn_handler=None,
+                       reload=False):
+    """Returns the cached {name: id} and {id: name} dicts of a lookup table
+
+    Parameters
+    ----------
+    table : str
+        The lookup table
+    column : str
+        The column holding the names
+    id_column : str
+        The column holding the ids
+    conn_handler : SQLConnectionHandler, optional
+        The sql connection object
+    reload : bool, optional
+        Whether to load the table again even if it is cached, e.g. because a
+        value was not found on it. Default: False
+
+    Returns
+    -------
+    tuple of (dict, dict)
+        The {name: id} and the {id: name} dicts. They must not be modified
+    """
+    cache_key = (table, column, id_column)
+    cached = None if reload else _lookup_tables.get(cache_key)
+    if (cached is not None and
+            time() - _lookup_patch['checked'] < _LOOKUP_PATCH_INTERVAL):
+        return cached
+
+    conn_handler = conn_handler if conn_handler else SQLConnectionHandler()
+    with _lookup_lock:
+        # The tables are loaded again if the database has been patched
+        # since they were cached
+        patch = conn_handler.execute_fetchone(
+            "SELECT current_patch FROM settings")[0]
+        _lookup_patch['checked'] = time()
+        if patch != _lookup_patch['current_patch']:
+            _lookup_tables.clear()
+            _lookup_patch['current_patch'] = patch
+
+        cached = None if reload else _lookup_tables.get(cache_key)
+        if cached is None:
+            rows = conn_handler.execute_fetchall(
+                "SELECT {1}, {2} FROM qiita.{0}".format(table, column,
+                                                        id_column))
+            by_name = {name: id_ for name, id_ in rows}
+            by_id = {id_: name for name, id_ in rows}
+            cached = _lookup_tables[cache_key] = (by_name, by_id)
+    return cached
+
+
+def get_lookup_table(table, column=None, by_id=False, conn_handler=None):
+    """Gets the contents of a lookup table
+
+    Parameters
+    ----------
+    table : str
+        The lookup table, e.g. 'data_type' or 'study_status'
+    column : str, optional
+        The column holding the names. Defaults to `table`
+    by_id : bool, optional
+        Defaults to False. Determines the format of the returned dict
+    conn_handler : SQLConnectionHandler, optional
+        The sql connection object
+
+    Returns
+    -------
+    dict
+        - If `by_id` is False, dict is of the form {name: id}
+        - If `by_id` is True, dict is of the form {id: name}
+
+    Notes
+    -----
+    The id column of the table must be named as the table plus "_id". The
+    table is cached for the whole process, and loaded again once the patch
+    level of the database changes, which is checked at most once a minute.
+    See `clear_lookup_tables`
+    """
+    column = column if column else table
+    by_name, by_id_ = _load_lookup_table(table, column, "%s_id" % table,
+                                         conn_handler)
+    return dict(by_id_ if by_id else by_name)
+
+
+def clear_lookup_tables():
+    """Clears the lookup tables cached by the process
+
+    Notes
+    -----
+    This must be called after modifying any lookup table, as qiita_db only
+    reloads them by itself when the database is patched or when a value is
+    not found on them
+    """
+    with _lookup_lock:
+        _lookup_tables.clear()
+        _lookup_patch['current_patch'] = None
+        _lookup_patch['checked'] = 0
+
+
 def params_dict_to_json(options):
     """Convert a dict of parameter key-value pairs to JSON string
 
@@ -129,16 +258,10 @@ def get_filetypes(key='type'):
         If `key` is "type", dict is of the form {type: filetype_id}
         If `key` is "filetype_id", dict is of the form {filetype_id: type}
     """
-    con = SQLConnectionHandler()
-    if key == 'type':
-        cols = 'type, filetype_id'
-    elif key == 'filetype_id':
-        cols = 'filetype_id, type'
-    else:
+    if key not in ('type', 'filetype_id'):
         raise QiitaDBColumnError("Unknown key. Pass either 'type' or "
                                  "'filetype_id'.")
-    sql = 'select {} from qiita.filetype'.format(cols)
-    return dict(con.execute_fetchall(sql))
+    return get_lookup_table('filetype', 'type', by_id=(key == 'filetype_id'))
 
 
 def get_filepath_types(key='filepath_type'):
@@ -158,16 +281,10 @@ def get_filepath_types(key='filepath_type'):
         - If `key` is "filepath_type_id", dict is of the form
           {filepath_type_id: filepath_type}
     """
-    con = SQLConnectionHandler()
-    if key == 'filepath_type':
-        cols = 'filepath_type, filepath_type_id'
-    elif key == 'filepath_type_id':
-        cols = 'filepath_type_id, filepath_type'
-    else:
+    if key not in ('filepath_type', 'filepath_type_id'):
         raise QiitaDBColumnError("Unknown key. Pass either 'filepath_type' or "
                                  "'filepath_type_id'.")
-    sql = 'select {} from qiita.filepath_type'.format(cols)
-    return dict(con.execute_fetchall(sql))
+    return get_lookup_table('filepath_type', by_id=(key == 'filepath_type_id'))
 
 
 def get_data_types(key='data_type'):
@@ -186,16 +303,10 @@ def get_data_types(key='data_type'):
         - If `key` is "data_type_id", dict is of the form
           {data_type_id: data_type}
     """
-    con = SQLConnectionHandler()
-    if key == 'data_type':
-        cols = 'data_type, data_type_id'
-    elif key == 'data_type_id':
-        cols = 'data_type_id, data_type'
-    else:
+    if key not in ('data_type', 'data_type_id'):
         raise QiitaDBColumnError("Unknown key. Pass either 'data_type_id' or "
                                  "'data_type'.")
-    sql = 'select {} from qiita.data_type'.format(cols)
-    return dict(con.execute_fetchall(sql))
+    return get_lookup_table('data_type', by_id=(key == 'data_type_id'))
 
 
 def get_required_sample_info_status(key='status'):
@@ -214,16 +325,11 @@ def get_required_sample_info_status(key='status'):
         - If `key` is "required_sample_info_status_id", dict is of the form
           {required_sample_info_status_id: status}
     """
-    con = SQLConnectionHandler()
-    if key == 'status':
-        cols = 'status, required_sample_info_status_id'
-    elif key == 'required_sample_info_status_id':
-        cols = 'required_sample_info_status_id, status'
-    else:
+    if key not in ('status', 'required_sample_info_status_id'):
         raise QiitaDBColumnError("Unknown key. Pass either 'status' or "
                                  "'required_sample_info_status_id'")
-    sql = 'select {} from qiita.required_sample_info_status'.format(cols)
-    return dict(con.execute_fetchall(sql))
+    return get_lookup_table('required_sample_info_status', 'status',
+                            by_id=(key == 'required_sample_info_status_id'))
 
 
 def get_emp_status(key='emp_status'):
@@ -242,16 +348,10 @@ def get_emp_status(key='emp_status'):
         - If `key` is "emp_status_id", dict is of the form
           {emp_status_id: emp_status}
     """
-    con = SQLConnectionHandler()
-    if key == 'emp_status':
-        cols = 'emp_status, emp_status_id'
-    elif key == 'emp_status_id':
-        cols = 'emp_status_id, emp_status'
-    else:
+    if key not in ('emp_status', 'emp_status_id'):
         raise QiitaDBColumnError("Unknown key. Pass either 'emp_status' or "
                                  "'emp_status_id'")
-    sql = 'select {} from qiita.emp_status'.format(cols)
-    return dict(con.execute_fetchall(sql))
+    return get_lookup_table('emp_status', by_id=(key == 'emp_status_id'))
 
 
 def create_rand_string(length, punct=True):
@@ -304,6 +404,65 @@ def hash_password(password, hashedpw=None):
         return output
 
 
+def _get_table_schema(table, conn_handler=None, reload=False):
+    """Returns the cached columns of `table`
+
+    Parameters
+    ----------
+    table : str
+        The table name
+    conn_handler : SQLConnectionHandler, optional
+        The connection handler object connected to the DB
+    reload : bool, optional
+        Whether to query the columns again even if they are cached. Default:
+        False
+
+    Returns
+    -------
+    list of tuples of (str, str, str, str)
+        The column_name, data_type, is_nullable and column_default of each
+        column of the table, in order. Empty if the table does not exist,
+        which is not cached
+
+    Notes
+    -----
+    The columns of the dynamic tables of the metadata templates
+    (qiita.sample_N and qiita.prep_N) are always queried, as other processes
+    can alter them
+    """
+    cols = None if reload else _table_cols.get(table)
+    if cols is None:
+        conn_handler = conn_handler if conn_handler else SQLConnectionHandler()
+        cols = [tuple(c) for c in conn_handler.execute_fetchall(
+            "SELECT column_name, data_type, is_nullable, column_default "
+            "FROM information_schema.columns WHERE table_name = %s "
+            "ORDER BY ordinal_position", (table, ))]
+        if cols and not _DYNAMIC_TABLE_RE.match(table):
+            _table_cols[table] = cols
+    return cols
+
+
+def clear_table_cols(table=None):
+    """Clears the cached columns of `table`
+
+    Parameters
+    ----------
+    table : str, optional
+        The table name. Default: clear the columns of all the tables
+
+    Notes
+    -----
+    qiita_db calls it whenever it patches the database. It must also be
+    called after modifying the schema of a table by any other means. The
+    dynamic tables of the metadata templates are never cached, so they don't
+    need it
+    """
+    if table is None:
+        _table_cols.clear()
+    else:
+        _table_cols.pop(table, None)
+
+
 def check_required_columns(conn_handler, keys, table):
     """Makes sure all required columns in database table are in keys
 
@@ -323,15 +482,17 @@ def check_required_columns(conn_handler, keys, table):
     RuntimeError
         Unable to get columns from database
     """
-    sql = ("SELECT is_nullable, column_name, column_default "
-           "FROM information_schema.columns "
-           "WHERE table_name = %s")
-    cols = conn_handler.execute_fetchall(sql, (table, ))
+    keys = set(keys)
+    cols = _get_table_schema(table, conn_handler)
+    required = set(x[0] for x in cols if x[2] == 'NO' and x[3] is None)
+    if required.difference(keys):
+        # The columns may have changed since they were cached
+        cols = _get_table_schema(table, conn_handler, reload=True)
+        required = set(x[0] for x in cols if x[2] == 'NO' and x[3] is None)
     # Test needed because a user with certain permissions can query without
     # error but be unable to get the column names
     if len(cols) == 0:
         raise RuntimeError("Unable to fetch column names for table %s" % table)
-    required = set(x[1] for x in cols if x[0] == 'NO' and x[2] is None)
     if len(required.difference(keys)) > 0:
         raise QiitaDBColumnError("Required keys missing: %s" %
                                  required.difference(keys))
@@ -356,16 +517,19 @@ def check_table_cols(conn_handler, keys, table):
     RuntimeError
         Unable to get columns from database
     """
-    sql = ("SELECT column_name FROM information_schema.columns WHERE "
-           "table_name = %s")
-    cols = [x[0] for x in conn_handler.execute_fetchall(sql, (table, ))]
+    keys = set(keys)
+    cols = [x[0] for x in _get_table_schema(table, conn_handler)]
+    if keys.difference(cols):
+        # The columns may have changed since they were cached
+        cols = [x[0] for x in _get_table_schema(table, conn_handler,
+                                                reload=True)]
     # Test needed because a user with certain permissions can query without
     # error but be unable to get the column names
     if len(cols) == 0:
         raise RuntimeError("Unable to fetch column names for table %s" % table)
-    if len(set(keys).difference(cols)) > 0:
+    if len(keys.difference(cols)) > 0:
         raise QiitaDBColumnError("Non-database keys found: %s" %
-                                 set(keys).difference(cols))
+                                 keys.difference(cols))
 
 
 def get_table_cols(table, conn_handler=None):
@@ -382,12 +546,13 @@ def get_table_cols(table, conn_handler=None):
     -------
     list of str
         The column headers of `table`
+
+    Notes
+    -----
+    The columns are cached for the whole process, except for the dynamic
+    tables of the metadata templates, see `clear_table_cols`
     """
-    conn_handler = conn_handler if conn_handler else SQLConnectionHandler()
-    headers = conn_handler.execute_fetchall(
-        "SELECT column_name FROM information_schema.columns WHERE "
-        "table_name=%s", (table, ))
-    return [h[0] for h in headers]
+    return [c[0] for c in _get_table_schema(table, conn_handler)]
 
 
 def get_table_cols_w_type(table, conn_handler=None):
@@ -402,13 +567,15 @@ def get_table_cols_w_type(table, conn_handler=None):
 
     Returns
     -------
-    list of tuples of (str, str)
+    list of lists of [str, str]
         The column headers and data type of `table`
+
+    Notes
+    -----
+    The columns are cached for the whole process, except for the dynamic
+    tables of the metadata templates, see `clear_table_cols`
     """
-    conn_handler = conn_handler if conn_handler else SQLConnectionHandler()
-    return conn_handler.execute_fetchall(
-        "SELECT column_name, data_type FROM information_schema.columns WHERE "
-        "table_name=%s", (table,))
+    return [[c[0], c[1]] for c in _get_table_schema(table, conn_handler)]
 
 
 def exists_table(table, conn_handler):
@@ -421,7 +588,14 @@ def exists_table(table, conn_handler):
         The table name to check if exists
     conn_handler : SQLConnectionHandler
         The connection handler object connected to the DB
+
+    Notes
+    -----
+    The tables whose columns are cached are known to exist, so the database
+    is only queried for the rest
     """
+    if table in _table_cols:
+        return True
     return conn_handler.execute_fetchone(
         "SELECT exists(SELECT * FROM information_schema.tables WHERE "
         "table_name=%s)", (table,))[0]
@@ -889,15 +1063,21 @@ def convert_to_id(value, table, conn_handler=None):
         ------
         IncompetentQiitaDeveloperError
             The passed string has no associated id
+
+        Notes
+        -----
+        The table is cached for the whole process, see `get_lookup_table`
         """
-        conn_handler = conn_handler if conn_handler else SQLConnectionHandler()
-        _id = conn_handler.execute_fetchone(
-            "SELECT {0}_id FROM qiita.{0} WHERE {0} = %s".format(table),
-            (value, ))
-        if _id is None:
+        id_column = "%s_id" % table
+        by_name, _ = _load_lookup_table(table, table, id_column, conn_handler)
+        if value not in by_name:
+            # It may have been added since the table was cached
+            by_name, _ = _load_lookup_table(table, table, id_column,
+                                            conn_handler, reload=True)
+        if value not in by_name:
             raise IncompetentQiitaDeveloperError("%s not valid for table %s"
                                                  % (value, table))
-        return _id[0]
+        return by_name[value]
 
 
 def convert_from_id(value, table, conn_handler=None):
@@ -921,14 +1101,20 @@ def convert_from_id(value, table, conn_handler=None):
         ------
         ValueError
             The passed id has no associated string
+
+        Notes
+        -----
+        The table is cached for the whole process, see `get_lookup_table`
         """
-        conn_handler = conn_handler if conn_handler else SQLConnectionHandler()
-        string = conn_handler.execute_fetchone(
-            "SELECT {0} FROM qiita.{0} WHERE {0}_id = %s".format(table),
-            (value, ))
-        if string is None:
+        id_column = "%s_id" % table
+        _, by_id = _load_lookup_table(table, table, id_column, conn_handler)
+        if value not in by_id:
+            # It may have been added since the table was cached
+            _, by_id = _load_lookup_table(table, table, id_column,
+                                          conn_handler, reload=True)
+        if value not in by_id:
             raise ValueError("%s not valid for table %s" % (value, table))
-        return string[0]
+        return by_id[value]
 
 
 def get_count(table):
@@ -94,9 +94,11 @@ class SearchStudiesHandler(BaseHandler):
         """builds dictionaries of selected samples from analysis object"""
         selsamples = {}
         selproc_data = defaultdict(list)
-        for proc_data_id, samps in viewitems(analysis.samples):
-            study = ProcessedData(proc_data_id).study
-            selproc_data[study].append(proc_data_id)
+        analysis_samples = analysis.samples
+        proc_datas = ProcessedData.from_ids(analysis_samples)
+        for proc_data, samps in zip(proc_datas, analysis_samples.values()):
+            study = proc_data.study
+            selproc_data[study].append(proc_data.id)
             selsamples[study] = set(samps)
         return selproc_data, selsamples
 
@@ -1,9 +1,29 @@
 from tornado.web import RequestHandler
+from qiita_db.base import open_identity_map, close_identity_map
 from qiita_db.logger import LogEntry
 from qiita_db.user import User
+from qiita_db.sql_instrumentation import (start_collecting, stop_collecting,
+                                          record_collector)
 
 
 class BaseHandler(RequestHandler):
+    def prepare(self):
+        '''Starts collecting the SQL statements executed by the request and
+        caching the qiita_db objects it constructs'''
+        self._sql_collector = start_collecting()
+        self._identity_map = open_identity_map()
+
+    def on_finish(self):
+        '''Aggregates the SQL statements executed by the request'''
+        close_identity_map(getattr(self, '_identity_map', None))
+        self._identity_map = None
+        collector = getattr(self, '_sql_collector', None)
+        if collector is not None:
+            stop_collecting(collector)
+            record_collector('%s.%s' % (self.__class__.__name__,
+                                        self.request.method), collector)
+            self._sql_collector = None
+
     def get_current_user(self):
         '''Overrides default method of returning user curently connected'''
         username = self.get_secure_cookie("user")
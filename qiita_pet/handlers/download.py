@@ -1,10 +1,11 @@
 from tornado.web import authenticated
 
-from os.path import basename
+from os.path import basename, join
 
 from .base_handlers import BaseHandler
 from qiita_pet.exceptions import QiitaPetAuthorizationError
-from qiita_db.util import filepath_id_to_rel_path
+from qiita_db.util import filepath_id_to_rel_path, get_db_files_base_dir
+from qiita_db.metadata_template import is_template_delta, read_template_backup
 from qiita_db.meta_util import get_accessible_filepath_ids
 
 
@@ -22,6 +23,18 @@ class DownloadHandler(BaseHandler):
         relpath = filepath_id_to_rel_path(filepath_id)
         fname = basename(relpath)
 
+        # The template backups stored as deltas are rebuilt here, as nginx
+        # can only serve the files as they are stored
+        if is_template_delta(relpath):
+            self.set_header('Content-Type', 'text/plain')
+            self.set_header('Content-Disposition',
+                            'attachment; filename=%s.txt'
+                            % fname.split('.', 1)[0])
+            self.write(read_template_backup(
+                join(get_db_files_base_dir(), relpath)))
+            self.finish()
+            return
+
         # If we don't have nginx, write a file that indicates this
         self.write("This installation of Qiita was not equipped with nginx, "
                    "so it is incapable of serving files. The file you "
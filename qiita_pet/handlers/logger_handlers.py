@@ -4,6 +4,7 @@ from tornado.web import authenticated
 
 from .base_handlers import BaseHandler
 from qiita_db.logger import LogEntry
+from qiita_db.sql_instrumentation import query_stats
 from tornado.web import HTTPError
 
 
@@ -27,3 +28,21 @@ class LogEntryViewerHandler(BaseHandler):
             numentries = 100
         logentries = LogEntry.newest_records(numentries)
         self.render("error_log.html", logentries=logentries)
+
+
+class SQLStatsHandler(BaseHandler):
+    def check_access(self):
+        if self.current_user.level not in {'admin', 'dev'}:
+            raise HTTPError(405, "User %s doesn't have sufficient privileges "
+                            "to view the SQL statistics" % self.current_user)
+
+    @authenticated
+    def get(self):
+        """Returns the SQL statements executed by this server process as JSON
+
+        The statements are aggregated by fingerprint, with their counts and
+        latency histograms, and by request handler, so the handlers issuing
+        many statements per request stand out
+        """
+        self.check_access()
+        self.write(query_stats())
@@ -13,6 +13,7 @@ from tornado.web import authenticated, HTTPError
 from tornado.gen import coroutine, Task
 
 from qiita_core.exceptions import IncompetentQiitaDeveloperError
+from qiita_db.base import prefetch
 from qiita_db.user import User
 from qiita_db.study import Study, StudyPerson
 from qiita_pet.handlers.base_handlers import BaseHandler
@@ -51,15 +52,20 @@ def _build_study_info(studytype, user=None):
                             'num_samples_collected shared num_raw_data pi '
                             'pmids owner status')
 
+    studies = Study.from_ids(studylist)
+    prefetch(studies)
+    pis = {pi.id: pi for pi in StudyPerson.from_ids(
+        {study.info['principal_investigator_id'] for study in studies})}
+    prefetch(pis.values(), ['name', 'email'])
+
     infolist = []
-    for s_id in studylist:
-        study = Study(s_id)
+    for study in studies:
         status = study.status
         # Just passing the email address as the name here, since
         # name is not a required field in qiita.qiita_user
         owner = study_person_linkifier((study.owner, study.owner))
         info = study.info
-        PI = StudyPerson(info['principal_investigator_id'])
+        PI = pis[info['principal_investigator_id']]
         PI = study_person_linkifier((PI.email, PI.name))
         pmids = ", ".join([pubmed_linkifier([pmid])
                            for pmid in study.pmids])
@@ -0,0 +1,60 @@
+from unittest import main
+from os import remove
+from os.path import basename, exists
+
+from qiita_pet.test.tornado_test_base import TestHandlerBase
+from qiita_db.metadata_template import SampleTemplate, read_template_backup
+
+
+class TestDownloadHandler(TestHandlerBase):
+    database = True
+
+    def setUp(self):
+        super(TestDownloadHandler, self).setUp()
+        st = SampleTemplate(1)
+        self._clean_up_files = []
+        for value in ('summer', 'autumn'):
+            st.update_category('season_environment',
+                               {'1.SKB8.640193': value})
+            st._backup()
+        # newest first: a full backup, a delta and the original backup
+        fps = st.get_filepaths()
+        self._clean_up_files.extend(fp for _, fp in fps[:2])
+        self.full_id, self.full_fp = fps[0]
+        self.delta_id, self.delta_fp = fps[1]
+
+    def tearDown(self):
+        for fp in self._clean_up_files:
+            if exists(fp):
+                remove(fp)
+        super(TestDownloadHandler, self).tearDown()
+
+    def test_get_template_delta(self):
+        self.assertTrue(self.delta_fp.endswith('.delta.gz'))
+        response = self.get('/download/%d' % self.delta_id)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, read_template_backup(self.delta_fp))
+        self.assertEqual(
+            response.headers['Content-Disposition'],
+            'attachment; filename=%s.txt'
+            % basename(self.delta_fp)[:-len('.delta.gz')])
+        self.assertFalse('X-Accel-Redirect' in response.headers)
+
+    def test_get_template_full(self):
+        response = self.get('/download/%d' % self.full_id)
+        self.assertEqual(response.code, 200)
+        self.assertTrue(response.headers['X-Accel-Redirect'].endswith(
+            basename(self.full_fp)))
+
+    def test_sample_template_tab(self):
+        response = self.get('/study/description/1')
+        self.assertEqual(response.code, 200)
+        # all the backups are listed, the local path is only shown for the
+        # ones stored in full
+        self.assertIn(basename(self.full_fp), response.body)
+        self.assertNotIn(basename(self.delta_fp), response.body)
+        self.assertIn('href="/download/%d"' % self.delta_id, response.body)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,12 @@
 from unittest import main
+from json import loads
+
+from mock import Mock
+
 from qiita_pet.test.tornado_test_base import TestHandlerBase
+from qiita_pet.handlers.base_handlers import BaseHandler
+from qiita_db.sql_connection import SQLConnectionHandler
+from qiita_db.user import User
 
 
 class TestLogEntryViewerHandler(TestHandlerBase):
@@ -14,5 +21,35 @@ class TestLogEntryViewerHandler(TestHandlerBase):
         response = self.post('/admin/error/', {'numrecords': 20})
         self.assertEqual(response.code, 405)
 
+
+class TestSQLStatsHandler(TestHandlerBase):
+    def setUp(self):
+        super(TestSQLStatsHandler, self).setUp()
+        self.get_current_user = BaseHandler.get_current_user
+
+    def tearDown(self):
+        BaseHandler.get_current_user = self.get_current_user
+        super(TestSQLStatsHandler, self).tearDown()
+
+    def test_get(self):
+        BaseHandler.get_current_user = Mock(
+            return_value=User("admin@foo.bar"))
+        SQLConnectionHandler().execute_fetchone("SELECT 1")
+
+        response = self.get('/admin/sql_stats/')
+        self.assertEqual(response.code, 200)
+        obs = loads(response.body)
+        self.assertEqual(set(obs), {'buckets', 'queries', 'collectors'})
+        self.assertTrue(obs['buckets'])
+        self.assertTrue(obs['queries'])
+        for stats in obs['queries'].values():
+            self.assertTrue(stats['count'] > 0)
+            self.assertEqual(len(stats['histogram']),
+                             len(obs['buckets']) + 1)
+
+    def test_get_no_access(self):
+        response = self.get('/admin/sql_stats/')
+        self.assertEqual(response.code, 405)
+
 if __name__ == "__main__":
     main()
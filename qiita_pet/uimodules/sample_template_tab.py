@@ -6,7 +6,7 @@
 # The full license is in the file LICENSE, distributed with this software.
 # -----------------------------------------------------------------------------
 
-from qiita_db.metadata_template import SampleTemplate
+from qiita_db.metadata_template import SampleTemplate, is_template_delta
 from qiita_db.util import get_files_from_uploads_folders
 from .base_uimodule import BaseUIModule
 
@@ -17,16 +17,20 @@ class SampleTemplateTab(BaseUIModule):
         # the sample template of the study
         files = [f for _, f in get_files_from_uploads_folders(str(study.id))]
 
-        # If the sample template exists, retrieve all its filepaths
+        # Check if the request came from a local source
+        is_local_request = self._is_local()
+
+        # If the sample template exists, retrieve all its filepaths. The
+        # backups stored as deltas can't be read as they are, so they are
+        # always served through the download link, which rebuilds them
         if SampleTemplate.exists(study.id):
-            sample_templates = SampleTemplate(study.id).get_filepaths()
+            sample_templates = [
+                (fp_id, fp, is_local_request and not is_template_delta(fp))
+                for fp_id, fp in SampleTemplate(study.id).get_filepaths()]
         else:
             # If the sample template does not exist, just pass an empty list
             sample_templates = []
 
-        # Check if the request came from a local source
-        is_local_request = self._is_local()
-
         # The user can choose the sample template only if the study is
         # sandboxed or the current user is an admin
         show_select_sample = (
@@ -37,5 +41,4 @@ class SampleTemplateTab(BaseUIModule):
             show_select_sample=show_select_sample,
             files=files,
             study_id=study.id,
-            sample_templates=sample_templates,
-            is_local_request=is_local_request)
+            sample_templates=sample_templates)
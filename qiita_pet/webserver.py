@@ -23,7 +23,8 @@ from qiita_pet.handlers.study_handlers import (
     CreateStudyAJAX, ShareStudyAJAX, StudyApprovalList,
     PreprocessingSummaryHandler, VAMPSHandler)
 from qiita_pet.handlers.websocket_handlers import MessageHandler
-from qiita_pet.handlers.logger_handlers import LogEntryViewerHandler
+from qiita_pet.handlers.logger_handlers import (LogEntryViewerHandler,
+                                                SQLStatsHandler)
 from qiita_pet.handlers.upload import UploadFileHandler, StudyUploadFileHandler
 from qiita_pet.handlers.compute import (
     ComputeCompleteHandler, AddFilesToRawData, UnlinkAllFiles)
@@ -66,6 +67,7 @@ class Application(tornado.web.Application):
             (r"/moi-ws/", MOIMessageHandler),
             (r"/consumer/", MessageHandler),
             (r"/admin/error/", LogEntryViewerHandler),
+            (r"/admin/sql_stats/", SQLStatsHandler),
             (r"/admin/approval/", StudyApprovalList),
             (r"/metadata_summary/(.*)", MetadataSummaryHandler),
             (r"/preprocessing_summary/(.*)", PreprocessingSummaryHandler),
@@ -188,10 +188,14 @@ def dataframe_from_template(t):
     pd.DataFrame
         A DataFrame object where the index values are the sample identifiers
         and the column names are the metadata categories.
+
+    Notes
+    -----
+    All the values are cast to string, as a datetime object can be returned
+    by the template. Missing values are represented as 'None'.
     """
-    t = template_to_dict(t)
-    df = pd.DataFrame.from_dict(t, orient='index')
-    return df
+    df = t.to_dataframe()
+    return df.applymap(lambda x: 'None' if pd.isnull(x) else str(x))
 
 
 def template_to_dict(t):
@@ -209,13 +213,7 @@ def template_to_dict(t):
         the values are dictionaries with each column name as the keys.
 
     """
-    out = {}
-    for sample_id, metadata in viewitems(t):
-        out[sample_id] = {}
-        for column_name, column_value in viewitems(metadata):
-            # cast to string as a datetime object can be returned here
-            out[sample_id][column_name] = str(column_value)
-    return out
+    return dataframe_from_template(t).T.to_dict()
 
 
 def _get_filehandle(filepath_or, *args, **kwargs):
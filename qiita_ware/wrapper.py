@@ -9,6 +9,7 @@ import networkx as nx
 from moi.job import system_call, submit, ctxs, ctx_default
 
 from qiita_db.job import Job
+from qiita_db.sql_instrumentation import run_collecting_queries
 
 
 def system_call_from_job(job_id, **kwargs):
@@ -178,8 +179,11 @@ class ParallelWrapper(object):
         parent_id = self._group
         url = None
 
+        # The job runs collecting the SQL statements it executes, so they are
+        # accounted (and logged) per job in the engine that runs it
         with self._context.bv.temp_flags(after=deps, block=False):
-            _, _, ar = submit(self._context, parent_id, name, url, func,
+            _, _, ar = submit(self._context, parent_id, name, url,
+                              run_collecting_queries, func, name,
                               *args, **kwargs)
         return ar
 